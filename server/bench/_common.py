@@ -0,0 +1,85 @@
+"""
+Shared Benchmark Setup
+======================
+Helpers for the scripts in server/bench/. Each script runs against a scratch
+SQLite database in a temp directory, never payouts.db:
+
+    from _common import scratch_database, quiet, report
+
+    import payout_server
+    scratch_database(payout_server)
+    with quiet():
+        ...            # the server prints a line per payout/webhook
+    report(f"{n / elapsed:,.0f} payouts/s")
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+from typing import Dict, List
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+
+def scratch_database(*modules, name: str = "payouts.db") -> str:
+    """Point the modules' DATABASE_FILE at a fresh database and create the schema."""
+    import payout_server
+    path = os.path.join(tempfile.mkdtemp(prefix="payout-bench-"), name)
+    for module in modules:
+        module.DATABASE_FILE = path
+    payout_server.DATABASE_FILE = path
+    with quiet():
+        payout_server.init_database()
+    return path
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow stdout (all threads) - the server logs every payout and webhook."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def report(line: str = ""):
+    """Print a result line, even inside quiet()."""
+    sys.__stdout__.write(line + "\n")
+    sys.__stdout__.flush()
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def latency_summary(seconds: List[float]) -> str:
+    values = sorted(seconds)
+    return (f"p50 {percentile(values, 0.5) * 1000:.2f} ms, p99 {percentile(values, 0.99) * 1000:.2f} ms, "
+            f"max {values[-1] * 1000:.1f} ms")
+
+
+def recipient_data(claim_id: str) -> Dict:
+    """A valid POST /api/recipients body for the claim."""
+    return {
+        "claimId": claim_id,
+        "customerId": "bench-customer",
+        "firstName": "Ana",
+        "lastName": "Garcia",
+        "email": "ana@example.com",
+        "country": "ES",
+        "addressStreet": "Calle Mayor 1",
+        "addressCity": "Madrid",
+        "addressPostal": "28013",
+        "documentType": "DNI",
+        "documentNumber": "12345678Z",
+        "iban": "ES9121000418450200051332",
+        "accountHolderName": "Ana Garcia"
+    }
+
+
+def start_server(server) -> int:
+    """Serve in a daemon thread; returns the bound port."""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
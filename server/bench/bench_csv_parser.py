@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+CSV Statement Parser Benchmark
+==============================
+Parses a synthetic --rows CSV statement (1M by default) with
+reconciliation_job.parse_csv_statement() and with the csv.DictReader parser
+it replaced, which looked up each column under three spellings per row.
+
+Run:
+    python3 server/bench/bench_csv_parser.py [--rows 1000000]
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from _common import report
+
+import reconciliation_job
+
+
+def dict_reader_parse(filepath: str) -> List[Dict]:
+    """The previous parser: DictReader, per-row header fallbacks, string dates."""
+    transactions = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            credit = row.get('Credit', row.get('credit', row.get('CREDIT', '')))
+            if credit and float(credit.replace(',', '').replace(' ', '') or 0) > 0:
+                transactions.append({
+                    'date': row.get('Date', row.get('date', row.get('DATE', ''))),
+                    'description': row.get('Description', row.get('description', row.get('DESCRIPTION', ''))),
+                    'amount': float(credit.replace(',', '').replace(' ', '')),
+                    'reference': row.get('Reference', row.get('reference', row.get('REFERENCE', '')))
+                })
+    return transactions
+
+
+def write_statement(path: str, rows: int):
+    with open(path, "w") as f:
+        f.write("Date,Description,Credit,Debit,Reference\n")
+        for i in range(rows):
+            if i % 10 == 9:
+                f.write(f"2024-01-{i % 28 + 1:02d},BANK FEE,,1.50,FEE{i}\n")
+            else:
+                f.write(f"2024-01-{i % 28 + 1:02d},AESA COMPENSATION,\"1,{i % 1000:03d}.00\",,AESA-2024-C{i:07d}X\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="payout-bench-"), "statement.csv")
+    write_statement(path, args.rows)
+    report(f"{args.rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB")
+
+    results = {}
+    for label, parse in (
+        ("DictReader", dict_reader_parse),
+        ("parse_csv_statement", lambda p: list(reconciliation_job.parse_csv_statement(p))),
+    ):
+        start = time.perf_counter()
+        results[label] = parse(path)
+        elapsed = time.perf_counter() - start
+        report(f"{label:<20} {len(results[label]):,} credits in {elapsed:.2f}s = {args.rows / elapsed:,.0f} rows/s")
+
+    old, new = results.values()
+    assert [(t['amount'], t['reference']) for t in old] == [(t['amount'], t['reference']) for t in new]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+SQLite Connection Reuse Microbenchmark
+======================================
+Runs the DB side of a webhook delivery (payout lookup by dLocal ID,
+save_payout, log_webhook_event) over and over, from several threads:
+
+- "connect per call": every helper call opens and closes its connection,
+  as the helpers did before db.py
+- "per-thread": db.py's reused per-thread connections
+
+Run:
+    python3 server/bench/bench_db_connections.py [--requests 3000] [--threads 1 4]
+"""
+
+import argparse
+import threading
+import time
+
+from _common import scratch_database, quiet, report
+
+import db
+import payout_server
+
+
+def webhook_requests(count: int, provider_id: str, reuse: bool):
+    for i in range(count):
+        payout = payout_server.get_payout_by_provider_id(provider_id)
+        if not reuse:
+            db.close_connections()
+        payout.status = "sent"
+        payout_server.save_payout(payout)
+        if not reuse:
+            db.close_connections()
+        payout_server.log_webhook_event("payout.completed", payout.id, provider_id, {"i": i})
+        if not reuse:
+            db.close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000, help="per measurement, split across threads")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    scratch_database()
+    with quiet():
+        for threads in args.threads:
+            for reuse in (False, True):
+                provider_ids = [f"DL-BENCH-{threads}-{reuse}-{t}" for t in range(threads)]
+                for provider_id in provider_ids:
+                    payout_server.save_payout(payout_server.Payout({
+                        "claimId": provider_id, "recipientId": "bench", "amountEUR": 400.0,
+                        "providerPayoutId": provider_id,
+                    }))
+                per_thread = args.requests // threads
+                workers = [
+                    threading.Thread(target=webhook_requests, args=(per_thread, provider_id, reuse))
+                    for provider_id in provider_ids
+                ]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - start
+                label = "per-thread" if reuse else "connect per call"
+                report(f"threads={threads:<2} {label:<17} {per_thread * threads / elapsed:8,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
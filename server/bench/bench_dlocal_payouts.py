@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+dLocal Payout Submission Benchmark
+==================================
+Submits --payouts payouts through DLocalClient.create_payouts() to the fake
+dLocal server (fake_dlocal.py) at several pool sizes, i.e. concurrency
+levels, and reports payouts/s and the connections the fake server accepted.
+Every request waits --latency-ms at the fake server, so throughput should
+scale with the pool size until the client is CPU-bound.
+
+Run:
+    python3 server/bench/bench_dlocal_payouts.py [--payouts 500] [--latency-ms 20] [--concurrency 1 4 16 32]
+"""
+
+import argparse
+import time
+
+from _common import quiet, report, recipient_data
+
+import fake_dlocal
+import payout_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payouts", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    server = fake_dlocal.start(latency=args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    recipient = payout_server.Recipient(recipient_data("BENCH-1"))
+
+    for concurrency in args.concurrency:
+        client = payout_server.DLocalClient(base_url=url, api_key="bench", secret_key="bench",
+                                            pool_size=concurrency)
+        batch = [(recipient, 400.0, "EUR", f"BENCH-{concurrency}-{i}") for i in range(args.payouts)]
+        connections = server.connections
+        start = time.perf_counter()
+        with quiet():
+            results = client.create_payouts(batch)
+        elapsed = time.perf_counter() - start
+        client.pool.close()
+
+        failed = [r for r in results if isinstance(r, Exception)]
+        report(f"concurrency={concurrency:<3} {args.payouts / elapsed:8,.0f} payouts/s  "
+               f"({len(failed)} failed, {server.connections - connections} connections)")
+
+
+if __name__ == "__main__":
+    main()
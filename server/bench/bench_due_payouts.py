@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Due Payout Creation Benchmark
+=============================
+Seeds --due matched reconciliations (100k by default) older than the 48h
+window, each with a verified recipient, and times
+reconciliation_job.trigger_due_payouts().
+
+For comparison it also runs the previous row-by-row flow on --baseline
+rows: two existence queries, a payout insert and a status update per
+reconciliation, each committed on its own. The old per-row HTTP call for
+the recipient is left out, so the baseline is a best case.
+
+Run:
+    python3 server/bench/bench_due_payouts.py [--due 100000] [--baseline 10000]
+"""
+
+import argparse
+import time
+import uuid
+from datetime import datetime
+
+from _common import scratch_database, quiet, report
+
+import db
+import reconciliation_job
+
+
+def seed(path: str, count: int):
+    with db.transaction(path) as conn:
+        conn.executemany("""
+            INSERT INTO recipients (id, claim_id, customer_id, first_name, last_name, email, country,
+                                    address_street, address_city, address_postal, document_type,
+                                    document_number, status, created_at, updated_at)
+            VALUES (?, ?, 'c', 'Ana', 'Garcia', 'ana@example.com', 'ES', 's', 'Madrid', '28013',
+                    'DNI', 'X', 'verified', '2024-01-01', '2024-01-01')
+        """, ((f"R{i}", f"C{i}") for i in range(count)))
+        conn.executemany("""
+            INSERT INTO bank_reconciliations (id, bank_ref, amount_eur, received_at, matched_claim_id,
+                                              status, created_at)
+            VALUES (?, ?, 400.0, '2024-01-01T00:00:00', ?, 'matched', '2024-01-01')
+        """, ((f"B{i}", f"REF{i}", f"C{i}") for i in range(count)))
+
+
+def row_by_row():
+    """The previous trigger_due_payouts() loop, minus its HTTP call per row."""
+    for rec in reconciliation_job.get_pending_reconciliations():
+        claim_id = rec['matched_claim_id']
+        if reconciliation_job.payout_exists_for_claim(claim_id):
+            reconciliation_job.update_reconciliation_status(rec['id'], 'payout_created')
+            continue
+        if not reconciliation_job.recipient_exists_for_claim(claim_id):
+            continue
+        payout_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        with db.transaction(reconciliation_job.DATABASE_FILE) as conn:
+            conn.execute("""
+                INSERT INTO payouts (id, claim_id, recipient_id, amount_eur, currency_destination,
+                                     provider, status, created_at, queued_at)
+                VALUES (?, ?, ?, ?, 'EUR', 'dlocal', 'queued', ?, ?)
+            """, (payout_id, claim_id, f"R{claim_id[1:]}", rec['amount_eur'], now, now))
+        reconciliation_job.update_reconciliation_status(rec['id'], 'payout_created', f'Payout ID: {payout_id}')
+
+
+def run(label: str, trigger, count: int):
+    path = scratch_database(reconciliation_job)
+    seed(path, count)
+    start = time.perf_counter()
+    with quiet():
+        trigger()
+    elapsed = time.perf_counter() - start
+    with db.connection(path) as conn:
+        created = conn.execute("SELECT COUNT(*) FROM payouts").fetchone()[0]
+    report(f"{label:<20} {created:,} payouts in {elapsed:.2f}s = {created / elapsed:,.0f} payouts/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--due", type=int, default=100_000)
+    parser.add_argument("--baseline", type=int, default=10_000, help="rows for the row-by-row run (0 = skip)")
+    args = parser.parse_args()
+
+    if args.baseline:
+        run("row by row", row_by_row, args.baseline)
+    run("trigger_due_payouts", reconciliation_job.trigger_due_payouts, args.due)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Sustained Webhook Throughput on SQLite
+======================================
+Stores --webhooks webhook events in the inbox, then times how fast
+WebhookProcessor applies them (payout status update, webhook_events row,
+notification outbox row). It runs twice:
+
+- "commit per event": without the group-commit writer, so every event is
+  its own transaction and fsync
+- "group commit": through payout_server.status_writer, which shares one
+  commit between many events
+
+Run:
+    python3 server/bench/bench_group_commit.py [--webhooks 20000] [--workers 16]
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from _common import scratch_database, quiet, report
+
+import db
+import payout_server
+
+EVENTS = ["payout.pending", "payout.completed", "payout.paid"]
+
+
+def seed(path: str, webhooks: int, payouts: int):
+    with db.transaction(path) as conn:
+        conn.executemany("""
+            INSERT INTO payouts (id, claim_id, recipient_id, amount_eur, currency_destination, provider,
+                                 provider_payout_id, status, created_at)
+            VALUES (?, ?, 'bench', 400.0, 'EUR', 'dlocal', ?, 'processing', '2024-01-01T00:00:00')
+        """, ((str(uuid.uuid4()), f"C{i}", f"DL-{i}") for i in range(payouts)))
+        conn.executemany("""
+            INSERT INTO webhook_inbox (event_type, provider_payout_id, payload, received_at)
+            VALUES (?, ?, ?, '2024-01-01T00:00:00')
+        """, (
+            (EVENTS[i % 3], f"DL-{i % payouts}",
+             json.dumps({"id": f"EV-{i}", "type": EVENTS[i % 3], "data": {"id": f"DL-{i % payouts}"}}))
+            for i in range(webhooks)
+        ))
+
+
+def drain(label: str, path: str, webhooks: int, workers: int):
+    processor = payout_server.WebhookProcessor(workers=workers)
+    batches, items = payout_server.status_writer.batches, payout_server.status_writer.items
+    start = time.perf_counter()
+    processor.start()
+    with db.connection(path) as conn:
+        while conn.execute("SELECT COUNT(*) FROM webhook_inbox WHERE processed_at IS NULL").fetchone()[0]:
+            time.sleep(0.02)
+    elapsed = time.perf_counter() - start
+    processor.stop()
+    batches = payout_server.status_writer.batches - batches
+    shared = f", {(payout_server.status_writer.items - items) / batches:.1f} writes/commit" if batches else ""
+    report(f"{label:<17} sync={db.DB_SYNCHRONOUS} workers={workers}: {webhooks:,} webhooks in {elapsed:.2f}s = "
+           f"{webhooks / elapsed:,.0f}/s{shared}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhooks", type=int, default=20_000)
+    parser.add_argument("--payouts", type=int, default=2000, help="distinct payouts the webhooks refer to")
+    parser.add_argument("--workers", type=int, default=payout_server.WEBHOOK_WORKERS)
+    args = parser.parse_args()
+
+    with quiet():
+        path = scratch_database()
+        seed(path, args.webhooks, args.payouts)
+        drain("commit per event", path, args.webhooks, args.workers)
+
+        path = scratch_database()
+        seed(path, args.webhooks, args.payouts)
+        payout_server.status_writer.start(path)
+        drain("group commit", path, args.webhooks, args.workers)
+        payout_server.status_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Payout Lookup Latency With and Without Indexes
+==============================================
+Seeds --payouts rows (1M by default) into a database at migration 1 (base
+tables, no secondary indexes) and times the lookups the webhook handler and
+the app's status polls make. Then it applies the remaining migrations and
+times the same lookups again.
+
+Run:
+    python3 server/bench/bench_indexes.py [--payouts 1000000] [--lookups 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import quiet, report
+
+import db
+import payout_server
+
+
+def time_lookups(label: str, count: int, lookups: int):
+    sample = [random.randrange(count) for _ in range(lookups)]
+    timings = {}
+    for name, lookup in (
+        ("by dLocal ID", lambda i: payout_server.get_payout_by_provider_id(f"DL-{i}")),
+        ("by claim ID", lambda i: payout_server.get_payout_by_claim_id(f"CLAIM{i:08d}")),
+    ):
+        start = time.perf_counter()
+        for i in sample:
+            assert lookup(i) is not None
+        timings[name] = (time.perf_counter() - start) / lookups * 1000
+    report(f"{label:<12} " + ", ".join(f"{name} {ms:.3f} ms" for name, ms in timings.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payouts", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="payout-bench-"), "payouts.db")
+    payout_server.DATABASE_FILE = path
+    with quiet():
+        db.migrate(path, payout_server.MIGRATIONS[:1])
+
+    start = time.perf_counter()
+    with db.transaction(path) as conn:
+        conn.executemany("""
+            INSERT INTO payouts (id, claim_id, recipient_id, amount_eur, currency_destination,
+                                 provider_payout_id, status, created_at)
+            VALUES (?, ?, 'bench', 400.0, 'EUR', ?, 'sent', ?)
+        """, ((f"P{i}", f"CLAIM{i:08d}", f"DL-{i}", f"2024-01-01T00:00:{i % 60:02d}") for i in range(args.payouts)))
+    report(f"seeded {args.payouts:,} payouts in {time.perf_counter() - start:.1f}s")
+
+    time_lookups("no indexes", args.payouts, args.lookups)
+
+    start = time.perf_counter()
+    with quiet():
+        db.migrate(path, payout_server.MIGRATIONS)
+    report(f"migrated to version {payout_server.MIGRATIONS[-1][0]} in {time.perf_counter() - start:.1f}s")
+
+    time_lookups("indexes", args.payouts, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
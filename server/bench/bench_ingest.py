@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Statement Ingestion Benchmark
+=============================
+Writes a large synthetic CSV statement (AESA credits, a share of them
+referencing verified claims), split over --files files, and times
+reconciliation_job.ingest_bank_statements() on a fresh database for each
+--workers value.
+
+Run:
+    python3 server/bench/bench_ingest.py [--rows 500000] [--files 1] [--workers 1 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _common import scratch_database, quiet, report
+
+import db
+import reconciliation_job
+
+
+def write_statements(directory: str, rows: int, files: int):
+    per_file = rows // files
+    for n in range(files):
+        with open(os.path.join(directory, f"statement_{n:03d}.csv"), "w") as f:
+            f.write("Date,Description,Credit,Debit,Reference\n")
+            for i in range(n * per_file, (n + 1) * per_file):
+                f.write(f"2024-01-{i % 28 + 1:02d},AESA COMPENSATION,{250 + i % 3 * 150}.00,,AESA-2024-C{i:07d}X\n")
+
+
+def seed_claims(path: str, rows: int, matched_share: float):
+    with db.transaction(path) as conn:
+        conn.executemany("""
+            INSERT INTO recipients (id, claim_id, customer_id, first_name, last_name, email, country,
+                                    address_street, address_city, address_postal, document_type,
+                                    document_number, status, created_at, updated_at)
+            VALUES (?, ?, 'c', 'Ana', 'Garcia', 'ana@example.com', 'ES', 's', 'Madrid', '28013',
+                    'DNI', 'X', 'verified', '2024-01-01', '2024-01-01')
+        """, ((f"R{i}", f"C{i:07d}X") for i in range(0, rows, max(1, round(1 / matched_share)))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--matched", type=float, default=0.1, help="share of rows with a verified claim")
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        path = scratch_database(reconciliation_job)
+        seed_claims(path, args.rows, args.matched)
+        reconciliation_job.STATEMENTS_DIR = tempfile.mkdtemp(prefix="payout-bench-statements-")
+        write_statements(reconciliation_job.STATEMENTS_DIR, args.rows, args.files)
+
+        start = time.perf_counter()
+        with quiet():
+            reconciliation_job.ingest_bank_statements(workers)
+        elapsed = time.perf_counter() - start
+
+        with db.connection(path) as conn:
+            imported, matched = conn.execute(
+                "SELECT COUNT(*), COUNT(matched_claim_id) FROM bank_reconciliations"
+            ).fetchone()
+        report(f"workers={workers:<2} files={args.files:<3} {imported:,} rows ({matched:,} matched) in "
+               f"{elapsed:.2f}s = {imported / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+HTTP Keep-Alive Latency Benchmark
+=================================
+One client sends --requests sequential status polls, first opening a new
+connection per request and then reusing one keep-alive connection, against:
+
+- payout_server: GET /api/payouts/{id}
+- email_server:  GET /send-email/{id}
+
+Run:
+    python3 server/bench/bench_keepalive.py [--requests 2000]
+"""
+
+import argparse
+import http.client
+import os
+import tempfile
+import time
+from http.server import ThreadingHTTPServer
+
+from _common import scratch_database, quiet, report, latency_summary, recipient_data, start_server
+
+import db
+import email_server
+import payout_server
+
+
+def sequential(port: int, path: str, requests: int, reuse: bool) -> list:
+    latencies = []
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    for _ in range(requests):
+        start = time.perf_counter()
+        if not reuse:
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+        if not reuse:
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies
+
+
+def payout_status_path() -> tuple:
+    scratch_database()
+    recipient = payout_server.Recipient(recipient_data("BENCH-1"))
+    payout_server.save_recipient(recipient)
+    payout = payout_server.Payout({"claimId": "BENCH-1", "recipientId": recipient.id, "amountEUR": 400.0})
+    payout_server.save_payout(payout)
+    return start_server(payout_server.create_server(0)), f"/api/payouts/{payout.id}"
+
+
+def email_status_path() -> tuple:
+    email_server.QUEUE_FILE = os.path.join(tempfile.mkdtemp(prefix="payout-bench-"), "email_queue.db")
+    db.migrate(email_server.QUEUE_FILE, email_server.MIGRATIONS)
+    job_id = email_server.enqueue_email({"to": "ana@example.com", "subject": "Hi", "body": "Hello"})
+    return start_server(ThreadingHTTPServer(("127.0.0.1", 0), email_server.EmailHandler)), f"/send-email/{job_id}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, setup in (("payout_server", payout_status_path), ("email_server", email_status_path)):
+        with quiet():
+            port, path = setup()
+        for reuse in (False, True):
+            latencies = sequential(port, path, args.requests, reuse)
+            label = "keep-alive" if reuse else "new connection"
+            report(f"{name:<14} {label:<15} {args.requests / sum(latencies):7,.0f} req/s  "
+                   f"{latency_summary(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Poll-Heavy Cache Benchmark
+==========================
+--pollers clients poll GET /api/payouts/claim/{id} and
+GET /api/recipients/claim/{id} over keep-alive connections for --seconds,
+like the app's status screens, while one writer keeps updating payouts.
+It runs once with the recipient/payout caches switched off (size 0) and
+once with them on. It reports polls/s, latency, SQLite SELECTs per poll,
+and how many reads right after a write still saw the old row (should be 0).
+
+Run:
+    python3 server/bench/bench_model_cache.py [--claims 500] [--pollers 8] [--seconds 5]
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+
+from _common import scratch_database, quiet, report, latency_summary, recipient_data, start_server
+
+import db
+import payout_server
+
+
+class SelectCounter:
+    """Counts SELECTs on every SQLite connection opened from now on."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        open_connection = db._open_connection
+
+        def traced(path):
+            conn = open_connection(path)
+            conn.set_trace_callback(self._trace)
+            return conn
+        db._open_connection = traced
+
+    def _trace(self, sql: str):
+        if sql.lstrip()[:6].upper() == "SELECT":
+            with self._lock:
+                self.count += 1
+
+
+def seed(claims: int) -> list:
+    payouts = []
+    with db.transaction(payout_server.DATABASE_FILE):
+        for i in range(claims):
+            recipient = payout_server.Recipient(recipient_data(f"BENCH-{i}"))
+            payout_server.save_recipient(recipient)
+            payout = payout_server.Payout({"claimId": f"BENCH-{i}", "recipientId": recipient.id,
+                                           "amountEUR": 400.0, "status": "processing"})
+            payout_server.save_payout(payout)
+            payouts.append(payout)
+    return payouts
+
+
+def run(label: str, port: int, payouts: list, args, selects: SelectCounter):
+    stop = threading.Event()
+    latencies: list = []
+    counts = {"updates": 0, "stale": 0}
+
+    def poller():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        mine = []
+        while not stop.is_set():
+            kind = random.choice(("payouts", "recipients"))
+            start = time.perf_counter()
+            conn.request("GET", f"/api/{kind}/claim/BENCH-{random.randrange(len(payouts))}")
+            conn.getresponse().read()
+            mine.append(time.perf_counter() - start)
+        latencies.extend(mine)
+
+    def writer():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        while not stop.is_set():
+            payout = random.choice(payouts)
+            payout.webhook_last_event_at = str(time.time())
+
+            def apply(c):
+                c.execute("UPDATE payouts SET webhook_last_event_at = ? WHERE id = ?",
+                          (payout.webhook_last_event_at, payout.id))
+                payout_server._invalidate_payout_on_commit(payout.id, payout.claim_id)
+            payout_server.write_status(apply)
+            counts["updates"] += 1
+            conn.request("GET", f"/api/payouts/claim/{payout.claim_id}")
+            if json.loads(conn.getresponse().read())["webhookLastEventAt"] != payout.webhook_last_event_at:
+                counts["stale"] += 1
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=poller) for _ in range(args.pollers)] + [threading.Thread(target=writer)]
+    before = selects.count
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    report(f"{label:<10} {len(latencies) / elapsed:7,.0f} polls/s  {latency_summary(latencies)}  "
+           f"{(selects.count - before) / len(latencies):.2f} SELECTs/poll, {counts['updates']} updates, "
+           f"{counts['stale']} stale reads after write")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=500)
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with quiet():
+        path = scratch_database()
+        payouts = seed(args.claims)
+        selects = SelectCounter()
+        db.close_connections()  # Reopen through the counter
+        payout_server.status_writer.start(path)
+        port = start_server(payout_server.create_server(0))
+
+        for label, size in (("no cache", 0), ("cache", payout_server.MODEL_CACHE_SIZE)):
+            for cache in (payout_server.payout_cache, payout_server.recipient_cache):
+                cache.__init__(size=size)
+            run(label, port, payouts, args, selects)
+        report(f"payout cache {payout_server.payout_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
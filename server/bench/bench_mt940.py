@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+MT940 Statement Ingestion Benchmark
+===================================
+Writes a synthetic MT940 file of about --mb megabytes holding --statements
+statements ({4: ... -} blocks with :20:/:25:/:60F:/:62F:). Every transaction
+is a :61: line with a multi-line :86: narrative, and a tenth of them are
+debits. It then times two things:
+
+- "parse": reconciliation_job.parse_mt940_statement() alone
+- "ingest": reconciliation_job.ingest_bank_statements() on a fresh database,
+  while a probe thread opens a small write transaction every 50 ms. The
+  longest probe wait is how long other writers (the payout server) were
+  locked out.
+
+Reports rows/s and the process's peak RSS (resource.getrusage ru_maxrss)
+after each phase.
+
+Run:
+    python3 server/bench/bench_mt940.py [--mb 300] [--statements 20] [--matched 0.1]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from _common import scratch_database, quiet, report
+
+import db
+import reconciliation_job
+from bench_ingest import seed_claims
+
+NARRATIVE = "/REMI/AESA COMPENSATION FLIGHT DELAY EU261 CLAIM C{i:07d}X\n/ORDP/AGENCIA ESTATAL DE SEGURIDAD AEREA\n"
+
+
+def write_statement(path: str, mb: float, statements: int) -> int:
+    """Write the file; returns how many :61: lines it holds."""
+    target = int(mb * 1e6)
+    per_statement = target // statements
+    lines = 0
+    with open(path, "w") as f:
+        for n in range(statements):
+            start = f.tell()
+            f.write(f"{{1:F01BANKESMMAXXX0000000000}}{{2:O940}}{{4:\n:20:STMT{n:05d}\n"
+                    f":25:ES9121000418450200051332\n:28C:{n + 1}/1\n:60F:C240101EUR0,00\n")
+            while f.tell() - start < per_statement:
+                i = lines
+                mark = "D" if i % 10 == 9 else "C"
+                f.write(f":61:2401{i % 28 + 1:02d}{mark}{250 + i % 3 * 150},00NTRFAESA-2024-C{i:07d}X\n"
+                        f":86:{NARRATIVE.format(i=i)}")
+                lines += 1
+            f.write(":62F:C240131EUR0,00\n-}\n")
+    return lines
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class WriteProbe(threading.Thread):
+    """Opens an empty write transaction every `interval` seconds and keeps the longest wait."""
+
+    def __init__(self, path: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.longest = 0.0
+        self.failed = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            start = time.perf_counter()
+            try:
+                with db.transaction(self.path):
+                    pass
+            except Exception:
+                self.failed += 1  # Gave up after DB_BUSY_TIMEOUT_MS
+            self.longest = max(self.longest, time.perf_counter() - start)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=300)
+    parser.add_argument("--statements", type=int, default=20)
+    parser.add_argument("--matched", type=float, default=0.1, help="share of rows with a verified claim")
+    args = parser.parse_args()
+
+    reconciliation_job.STATEMENTS_DIR = tempfile.mkdtemp(prefix="payout-bench-statements-")
+    path = os.path.join(reconciliation_job.STATEMENTS_DIR, "statement.sta")
+    lines = write_statement(path, args.mb, args.statements)
+    report(f"{os.path.getsize(path) / 1e6:,.0f} MB, {args.statements} statements, {lines:,} :61: lines; "
+           f"peak RSS {peak_rss_mb():,.0f} MB")
+
+    start = time.perf_counter()
+    credits = sum(1 for _ in reconciliation_job.parse_mt940_statement(path))
+    elapsed = time.perf_counter() - start
+    report(f"parse   {credits:,} credits in {elapsed:.2f}s = {credits / elapsed:,.0f} rows/s; "
+           f"peak RSS {peak_rss_mb():,.0f} MB")
+
+    db_path = scratch_database(reconciliation_job)
+    seed_claims(db_path, lines, args.matched)
+    probe = WriteProbe(db_path)
+    probe.start()
+    start = time.perf_counter()
+    with quiet():
+        reconciliation_job.ingest_bank_statements()
+    elapsed = time.perf_counter() - start
+    probe.stop()
+
+    with db.connection(db_path) as conn:
+        imported, matched = conn.execute(
+            "SELECT COUNT(*), COUNT(matched_claim_id) FROM bank_reconciliations"
+        ).fetchone()
+    report(f"ingest  {imported:,} rows ({matched:,} matched) in {elapsed:.2f}s = {imported / elapsed:,.0f} rows/s; "
+           f"peak RSS {peak_rss_mb():,.0f} MB")
+    report(f"other writers waited up to {probe.longest * 1000:,.0f} ms"
+           + (f", {probe.failed} gave up" if probe.failed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Claim Reference Matcher Benchmark
+=================================
+Matches --references synthetic bank references (2M by default; FC-, AESA-,
+CLAIM and UUID-prefix formats plus references with no claim) with:
+
+- the previous per-pattern re.search loop (unverified)
+- ClaimReferenceMatcher without known claims (unverified)
+- ClaimReferenceMatcher verifying against --claims known claim IDs
+
+Run:
+    python3 server/bench/bench_reference_matcher.py [--references 2000000] [--claims 100000]
+"""
+
+import argparse
+import random
+import re
+import time
+import uuid
+from typing import Dict, Optional
+
+from _common import report
+
+import reconciliation_job
+
+PATTERNS = [
+    r'FC-([A-Z0-9]+)-COMPENSATION',
+    r'AESA-\d{4}-([A-Z0-9]+)',
+    r'CLAIM([A-Z0-9]+)',
+    r'([A-F0-9]{8})',
+]
+
+
+def search_loop_match(reference: str) -> Optional[Dict]:
+    """The previous matcher: one re.search per pattern, in priority order."""
+    for pattern in PATTERNS:
+        match = re.search(pattern, reference.upper())
+        if match:
+            return {"id": match.group(1), "reference": reference}
+    return None
+
+
+def make_references(count: int, claim_ids: list) -> list:
+    formats = [
+        lambda c: f"TRANSFER FC-{c}-COMPENSATION AESA",
+        lambda c: f"AESA-2024-{c} RESOLUCION EXPEDIENTE",
+        lambda c: f"PAGO CLAIM{c}",
+        lambda c: f"REF {c[:8]} COMPENSACION VUELO",
+        lambda c: "NOMINA ENERO TRANSFERENCIA 2024-01-31",
+    ]
+    return [random.choice(formats)(random.choice(claim_ids)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--references", type=int, default=2_000_000)
+    parser.add_argument("--claims", type=int, default=100_000)
+    args = parser.parse_args()
+
+    claim_ids = [uuid.uuid4().hex.upper() for _ in range(args.claims)]
+    references = make_references(args.references, claim_ids)
+    start = time.perf_counter()
+    verifying = reconciliation_job.ClaimReferenceMatcher(claim_ids)
+    report(f"indexed {args.claims:,} claim IDs in {time.perf_counter() - start:.2f}s")
+
+    for label, match in (
+        ("re.search loop", search_loop_match),
+        ("matcher, unverified", reconciliation_job.ClaimReferenceMatcher().match),
+        ("matcher, verified", verifying.match),
+    ):
+        start = time.perf_counter()
+        found = sum(1 for reference in references if match(reference))
+        elapsed = time.perf_counter() - start
+        report(f"{label:<20} {found:,} of {len(references):,} matched in {elapsed:.2f}s = "
+               f"{len(references) / elapsed:,.0f} matches/s")
+
+
+if __name__ == "__main__":
+    main()
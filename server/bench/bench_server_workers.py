@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Server Load Test: Worker Pool vs Single Thread
+==============================================
+Concurrent clients poll GET /api/payouts/{id}. Each request blocks its
+handler for --handler-ms, standing in for a slow dLocal call or a locked
+database. A single-threaded server serves them one after another; with the
+worker pool, throughput should grow with the number of clients up to the
+worker count.
+
+Run:
+    python3 server/bench/bench_server_workers.py [--workers 16] [--seconds 3] [--handler-ms 20]
+"""
+
+import argparse
+import http.client
+import threading
+import time
+
+from _common import scratch_database, quiet, report, latency_summary, recipient_data, start_server
+
+import payout_server
+
+
+def poll(port: int, payout_id: str, deadline: float, latencies: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("GET", f"/api/payouts/{payout_id}", headers={"Connection": "close"})
+        conn.getresponse().read()
+        conn.close()
+        latencies.append(time.perf_counter() - start)
+
+
+def slow_handler(handler_seconds: float):
+    """Make every GET /api/payouts/{id} block like a handler waiting on I/O."""
+    handle = payout_server.PayoutHandler._handle_get_payout
+
+    def blocked(self, payout_id):
+        time.sleep(handler_seconds)
+        handle(self, payout_id)
+    payout_server.PayoutHandler._handle_get_payout = blocked
+
+
+def run(workers: int, clients: int, payout_id: str, args) -> None:
+    server = payout_server.create_server(0, workers)
+    port = start_server(server)
+    latencies: list = []
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    threads = [
+        threading.Thread(target=poll, args=(port, payout_id, deadline, latencies))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start  # Requests in flight at the deadline still finish
+    server.shutdown()
+    server.server_close()
+    report(f"workers={workers:<3} clients={clients:<3} {len(latencies) / elapsed:8,.0f} req/s  "
+           f"{latency_summary(latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=payout_server.SERVER_WORKERS)
+    parser.add_argument("--seconds", type=float, default=3.0, help="per measurement")
+    parser.add_argument("--handler-ms", type=float, default=20.0, help="time each request blocks its worker")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    scratch_database()
+    with quiet():
+        recipient = payout_server.Recipient(recipient_data("BENCH-1"))
+        payout_server.save_recipient(recipient)
+        payout = payout_server.Payout({"claimId": "BENCH-1", "recipientId": recipient.id, "amountEUR": 400.0})
+        payout_server.save_payout(payout)
+        slow_handler(args.handler_ms / 1000)
+
+        for workers in (1, args.workers):
+            for clients in args.clients:
+                run(workers, clients, payout.id, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+SMTP Session Pool Benchmark
+===========================
+Sends --messages messages to a local SMTP stand-in (threaded, no external
+dependencies) that waits --rtt-ms before every reply, like a remote server:
+
+- "session per message": connect, EHLO, AUTH, send, QUIT for each message,
+  as email_server.py and email_bot.py did before smtp_pool
+- "pooled": smtp_pool.SMTPSessionPool, reusing logged-in sessions
+
+Both run without STARTTLS (the stand-in has no certificate); against Gmail
+the TLS handshake per session widens the gap further.
+
+Run:
+    python3 server/bench/bench_smtp_pool.py [--messages 200] [--rtt-ms 20] [--threads 2]
+"""
+
+import argparse
+import smtplib
+import socketserver
+import threading
+import time
+from email.mime.text import MIMEText
+
+from _common import report
+
+import smtp_pool
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+    rtt = 0.02
+
+    def reply(self, *lines: str):
+        time.sleep(self.rtt)
+        self.wfile.write("".join(line + "\r\n" for line in lines).encode())
+        self.wfile.flush()
+
+    def handle(self):
+        with self.server.lock:
+            self.server.sessions += 1
+        self.reply("220 localhost ESMTP stand-in")
+        for line in self.rfile:
+            verb = line[:4].decode(errors="replace").upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost", "250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                self.reply("235 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def start_stand_in(rtt: float) -> socketserver.ThreadingTCPServer:
+    handler = type("StandIn", (StandInSMTPHandler,), {"rtt": rtt})
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.sessions = 0
+    server.messages = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def session_per_message(port: int, message: str):
+    with smtplib.SMTP("127.0.0.1", port) as smtp:
+        smtp.login("bot@example.com", "secret")
+        smtp.sendmail("bot@example.com", ["ana@example.com"], message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--threads", type=int, default=smtp_pool.SMTP_POOL_SIZE, help="senders (and pool size)")
+    args = parser.parse_args()
+
+    server = start_stand_in(args.rtt_ms / 1000)
+    port = server.server_address[1]
+    msg = MIMEText("Your compensation has been sent. " * 20)
+    msg["Subject"] = "Your compensation is on its way"
+    message = msg.as_string()
+    pool = smtp_pool.SMTPSessionPool("127.0.0.1", port, "bot@example.com", "secret",
+                                     size=args.threads, starttls=False)
+
+    for label, send in (
+        ("session per message", lambda: session_per_message(port, message)),
+        ("pooled", lambda: pool.send("bot@example.com", ["ana@example.com"], message)),
+    ):
+        sessions, messages = server.sessions, server.messages
+        per_thread = args.messages // args.threads
+
+        def sender():
+            for _ in range(per_thread):
+                send()
+
+        threads = [threading.Thread(target=sender) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        sent = server.messages - messages
+        report(f"{label:<20} rtt={args.rtt_ms:.0f}ms threads={args.threads}: {sent} messages in {elapsed:.2f}s = "
+               f"{sent / elapsed:,.1f} msg/s over {server.sessions - sessions} sessions")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Webhook Burst Benchmark
+=======================
+Sends --webhooks dLocal webhooks (10k by default) to POST /webhooks/dlocal,
+paced evenly over --seconds from --clients threads, each webhook on a new
+connection like dLocal's deliveries. Reports the ack latency dLocal would
+see and how long the inbox took to drain afterwards.
+
+Run:
+    python3 server/bench/bench_webhook_burst.py [--webhooks 10000] [--seconds 10] [--clients 32]
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+
+from _common import scratch_database, quiet, report, latency_summary, start_server
+
+import db
+import payout_server
+
+EVENTS = ["payout.pending", "payout.completed", "payout.paid"]
+
+
+def seed_payouts(path: str, count: int):
+    with db.transaction(path) as conn:
+        conn.executemany("""
+            INSERT INTO payouts (id, claim_id, recipient_id, amount_eur, currency_destination, provider,
+                                 provider_payout_id, status, created_at)
+            VALUES (?, ?, 'bench', 400.0, 'EUR', 'dlocal', ?, 'processing', '2024-01-01T00:00:00')
+        """, ((str(uuid.uuid4()), f"C{i}", f"DL-{i}") for i in range(count)))
+
+
+def deliver(port: int, indexes: range, payouts: int, start: float, interval: float, latencies: list):
+    mine = []
+    for i in indexes:
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        body = json.dumps({"id": f"EV-{i}", "type": EVENTS[i % 3], "data": {"id": f"DL-{i % payouts}"}})
+        sent = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        conn.request("POST", "/webhooks/dlocal", body, {"Content-Type": "application/json"})
+        conn.getresponse().read()
+        conn.close()
+        mine.append(time.perf_counter() - sent)
+    latencies.extend(mine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhooks", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--payouts", type=int, default=1000, help="distinct payouts the webhooks refer to")
+    args = parser.parse_args()
+
+    path = scratch_database()
+    seed_payouts(path, args.payouts)
+
+    with quiet():
+        payout_server.status_writer.start(path)
+        payout_server.webhook_processor.start()
+        port = start_server(payout_server.create_server(0))
+
+        latencies: list = []
+        start = time.perf_counter() + 0.2
+        threads = [
+            threading.Thread(target=deliver, args=(
+                port, range(k, args.webhooks, args.clients), args.payouts, start,
+                args.seconds / args.webhooks, latencies
+            ))
+            for k in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sent = time.perf_counter() - start
+        report(f"{args.webhooks:,} webhooks sent in {sent:.1f}s; ack {latency_summary(latencies)}")
+
+        with db.connection(path) as conn:
+            while conn.execute("SELECT COUNT(*) FROM webhook_inbox WHERE processed_at IS NULL").fetchone()[0]:
+                time.sleep(0.05)
+            logged = conn.execute("SELECT COUNT(*) FROM webhook_events").fetchone()[0]
+        report(f"inbox drained {time.perf_counter() - start:.1f}s after the first webhook ({logged:,} events logged)")
+
+
+if __name__ == "__main__":
+    main()
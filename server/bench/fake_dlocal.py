@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Fake dLocal Payouts API
+=======================
+Local stand-in for the dLocal endpoints DLocalClient calls, with a fixed
+delay per response to emulate the network round trip and dLocal's own
+processing time:
+
+    POST /payouts          -> {"id": "DL-...", "status": "PENDING", "external_id": ...}
+    GET  /payouts/{id}     -> the payout with that id or external_id, else 404
+
+Requests without X-Login / X-Trans-Key get 401. A repeated external_id
+returns the payout created the first time. Connections are kept alive, and
+the server counts how many it accepted.
+
+Run standalone and point the payout server at it:
+    python3 server/bench/fake_dlocal.py [--port 8090] [--latency-ms 50]
+    DLOCAL_API_URL=http://localhost:8090 DLOCAL_API_KEY=x DLOCAL_SECRET_KEY=x python3 server/payout_server.py
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer
+from typing import Dict
+
+import _common  # noqa: F401 - puts server/ on sys.path
+from keepalive import KeepAliveHandler
+
+
+class FakeDLocalHandler(KeepAliveHandler):
+    latency = 0.05  # Seconds per response
+    timeout = 30
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/payouts":
+            self._reply(404, {"error": "Not found"})
+            return
+        request = json.loads(self.read_body() or b"{}")
+        external_id = request.get("external_id") or uuid.uuid4().hex
+        with self.server.lock:
+            payout = self.server.payouts.get(external_id)
+            if payout is None:
+                payout = self.server.payouts[external_id] = {
+                    "id": f"DL-{uuid.uuid4().hex[:12].upper()}",
+                    "status": "PENDING",
+                    "amount": request.get("amount"),
+                    "currency": request.get("currency"),
+                    "external_id": external_id,
+                }
+        self._reply(200, payout)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if not self.path.startswith("/payouts/"):
+            self._reply(404, {"error": "Not found"})
+            return
+        key = self.path.rsplit("/", 1)[-1]
+        with self.server.lock:
+            payout = self.server.payouts.get(key) or next(
+                (p for p in self.server.payouts.values() if p["id"] == key), None
+            )
+        if payout is None:
+            self._reply(404, {"error": "Payout not found"})
+            return
+        self._reply(200, payout)
+
+    def _authorized(self) -> bool:
+        if self.headers.get("X-Login") and self.headers.get("X-Trans-Key"):
+            return True
+        self._reply(401, {"error": "Missing credentials"})
+        return False
+
+    def _reply(self, status: int, data: Dict):
+        time.sleep(self.latency)
+        with self.server.lock:
+            self.server.requests += 1
+        self.send_body(status, json.dumps(data).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, latency: float = FakeDLocalHandler.latency) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; the URL is http://127.0.0.1:{server.server_address[1]}."""
+    handler = type("FakeDLocal", (FakeDLocalHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.payouts = {}
+    server.requests = 0
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = start(args.port, args.latency_ms / 1000)
+    print(f"🧪 Fake dLocal on http://localhost:{args.port} ({args.latency_ms:.0f} ms per response)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
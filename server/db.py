@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite Connection Manager
+================================
+Per-thread connection reuse for payout_server.py, reconciliation_job.py and
+email_server.py (its background send queue).
+
+Each thread keeps one open connection per database file. Connections are
+configured once when opened (WAL journal, synchronous level, busy timeout)
+and then reused by every helper, instead of a connect/close cycle per query.
+
+Usage:
+    with db.connection(DATABASE_FILE) as conn:      # reads / single statements
+        conn.execute("SELECT ...")
+
+    with db.transaction(DATABASE_FILE) as conn:     # atomic multi-statement writes
+        conn.execute("INSERT ...")
+        conn.execute("UPDATE ...")
+
+Schema changes are applied with db.migrate(), which tracks the applied
+version in SQLite's PRAGMA user_version.
+
+Many small writes from several threads can share commits through a
+GroupCommitWriter instead of committing one by one.
+
+db.after_commit() defers a callback until the surrounding transaction has
+committed (e.g. invalidating a cache entry for the rows it wrote).
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# === Configuration ===
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")  # OFF, NORMAL, FULL
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+
+_local = threading.local()
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """Open and configure a new connection (autocommit, transactions are explicit)."""
+    conn = sqlite3.connect(path, isolation_level=None, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def _thread_connections() -> Dict[str, sqlite3.Connection]:
+    conns = getattr(_local, "connections", None)
+    if conns is None:
+        conns = _local.connections = {}
+    return conns
+
+
+def get_connection(path: str) -> sqlite3.Connection:
+    """Return this thread's connection to the given database, opening it if needed."""
+    conns = _thread_connections()
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open_connection(path)
+    return conn
+
+
+@contextmanager
+def connection(path: str) -> Iterator[sqlite3.Connection]:
+    """Borrow this thread's connection. Statements outside a transaction autocommit."""
+    yield get_connection(path)
+
+
+@contextmanager
+def transaction(path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Run a block inside a single transaction: committed on success, rolled back
+    on error. Nested calls join the outermost transaction.
+    """
+    conn = get_connection(path)
+    depth = getattr(_local, "depth", {})
+    _local.depth = depth
+
+    if depth.get(path, 0) > 0:
+        depth[path] += 1
+        try:
+            yield conn
+        finally:
+            depth[path] -= 1
+        return
+
+    callbacks = _pending_callbacks(path)
+    callbacks.clear()
+    conn.execute("BEGIN IMMEDIATE")  # If this fails (busy) nothing has changed yet
+    depth[path] = 1
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        callbacks.clear()
+        if conn.in_transaction:  # Also after a failed COMMIT, which leaves it open
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        depth[path] = 0
+
+    pending = list(callbacks)
+    callbacks.clear()
+    for fn in pending:
+        fn()
+
+
+def _pending_callbacks(path: str) -> List[Callable[[], None]]:
+    pending = getattr(_local, "after_commit", None)
+    if pending is None:
+        pending = _local.after_commit = {}
+    return pending.setdefault(path, [])
+
+
+def after_commit(path: str, fn: Callable[[], None]):
+    """
+    Run fn() once the calling thread's transaction on `path` has committed
+    (dropped if it rolls back), or right away outside a transaction. For
+    things like cache invalidation that must not run before other
+    connections can see the write.
+    """
+    if getattr(_local, "depth", {}).get(path, 0) > 0:
+        _pending_callbacks(path).append(fn)
+    else:
+        fn()
+
+
+def close_connections():
+    """Close every connection held by the calling thread."""
+    conns = _thread_connections()
+    for conn in conns.values():
+        conn.close()
+    conns.clear()
+
+
+# === Group Commit ===
+
+class GroupCommitWriter:
+    """
+    Single writer thread that applies queued write functions in batches,
+    one transaction (and one commit/fsync) per batch instead of per write.
+    A batch is flushed once it holds `max_batch` items or `max_delay_ms`
+    after its first item arrived, whichever comes first. With
+    max_delay_ms=0 it takes whatever queued up while the previous batch
+    was committing and never lingers, which suits callers that block on
+    their result (lingering would only add latency to each of them).
+
+    submit(fn) queues fn(conn) and returns a Future that resolves with fn's
+    return value once the batch is committed, so a caller that waits on it
+    keeps the usual durability guarantee. Each item runs in its own
+    savepoint: an item that raises is rolled back alone and its Future
+    gets the exception, while the rest of the batch commits. Items are
+    applied in submission order.
+
+    An item runs after whatever was queued before it, possibly long after
+    the caller looked at the data. So fn must read the rows it depends on
+    through `conn` and change only the columns it means to, with a WHERE
+    clause that re-checks the state it decided on. It must never write back
+    a whole row read before submit(): that undoes writes made in between.
+    """
+
+    def __init__(self, max_batch: int = 64, max_delay_ms: float = 0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.path: Optional[str] = None
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[sqlite3.Connection], Any], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, path: str):
+        self.path = path
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """Flush everything submitted so far, then stop the writer thread."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def _next_batch(self) -> Tuple[list, bool]:
+        """Block for the first item, then collect more until full or the delay is up."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+        close_connections()
+
+    def _commit(self, batch: list):
+        results = []
+        try:
+            with transaction(self.path) as conn:
+                for fn, future in batch:
+                    conn.execute("SAVEPOINT group_item")
+                    try:
+                        results.append((future, fn(conn), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO group_item")
+                        results.append((future, None, e))
+                    conn.execute("RELEASE group_item")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+# === Schema Migrations ===
+
+# (version, description, statements) - versions must be strictly increasing
+Migration = Tuple[int, str, List[str]]
+
+
+def schema_version(path: str) -> int:
+    """Return the schema version recorded in the database header."""
+    with connection(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path: str, migrations: List[Migration]) -> int:
+    """
+    Apply pending migrations in order, each in its own transaction together
+    with its user_version bump. Safe to run on every startup and from several
+    processes at once: the version is re-checked under the write lock.
+    Returns the resulting schema version.
+    """
+    for version, description, statements in migrations:
+        with transaction(path) as conn:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version <= current:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        print(f"🗄️  Applied migration {version}: {description}")
+
+    return schema_version(path)
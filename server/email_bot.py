@@ -13,27 +13,50 @@ Setup:
    - GMAIL_ADDRESS=your_email@gmail.com
    - GMAIL_APP_PASSWORD=your_16_char_app_password
 
+New files are picked up as soon as they appear when the `watchdog` package
+is installed (pip install watchdog); otherwise the folder is polled.
+Each file is claimed by renaming it into OutgoingEmails/Processing/, so
+several bots can share one folder without sending an email twice.
+
 Run:
     python3 email_bot.py
 """
 
 import os
 import json
+import threading
 import time
-import smtplib
-import ssl
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from pathlib import Path
 from datetime import datetime
 
+import smtp_pool
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional - falls back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
 # === Configuration ===
 WATCH_DIR = Path("/Users/fabiano/Documents/FlightyClaims/OutgoingEmails")
 LEGAL_AUTHS_DIR = Path("/Users/fabiano/Documents/FlightyClaims/Legal_Authorizations")
 COMPLAINTS_DIR = Path("/Users/fabiano/Documents/FlightyClaims/Airline_Complaints")
 SENT_DIR = WATCH_DIR / "Sent"
 FAILED_DIR = WATCH_DIR / "Failed"
+PROCESSING_DIR = WATCH_DIR / "Processing"  # Files claimed by a bot, being sent
+
+# Watching
+WORKERS = int(os.environ.get("EMAIL_BOT_WORKERS", "4"))  # Emails sent in parallel
+POLL_SECONDS = 1.0  # Folder scan interval without watchdog
+RESCAN_SECONDS = 30.0  # With watchdog: safety-net scan for anything the watcher missed
+SETTLE_SECONDS = 2.0  # A file that isn't valid JSON yet may still be being written
+STALE_CLAIM_SECONDS = 600  # Claims older than this were left by a bot that died
+CLAIM_CHECK_SECONDS = 60.0  # How often the watch loop looks for stale claims
 
 # Gmail SMTP settings
 SMTP_SERVER = "smtp.gmail.com"
@@ -46,7 +69,7 @@ GMAIL_APP_PASSWORD = os.environ.get("GMAIL_APP_PASSWORD", "")
 
 def setup_dirs():
     """Ensure all required directories exist."""
-    for d in [WATCH_DIR, SENT_DIR, FAILED_DIR]:
+    for d in [WATCH_DIR, SENT_DIR, FAILED_DIR, PROCESSING_DIR]:
         d.mkdir(parents=True, exist_ok=True)
 
 
@@ -98,11 +121,10 @@ def send_email(metadata: dict) -> bool:
         if metadata.get("cc"):
             recipients.append(metadata["cc"])
         
-        context = ssl.create_default_context()
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls(context=context)
-            server.login(GMAIL_ADDRESS, GMAIL_APP_PASSWORD)
-            server.sendmail(GMAIL_ADDRESS, recipients, msg.as_string())
+        # Reuses a logged-in session instead of connecting, STARTTLS and login per email
+        smtp_pool.get_pool(SMTP_SERVER, SMTP_PORT, GMAIL_ADDRESS, GMAIL_APP_PASSWORD).send(
+            GMAIL_ADDRESS, recipients, msg.as_string()
+        )
         
         print(f"✅ Email sent to {metadata['to']}")
         return True
@@ -112,17 +134,70 @@ def send_email(metadata: dict) -> bool:
         return False
 
 
+def is_email_file(path: Path) -> bool:
+    """A pending email file - directly in WATCH_DIR, not in Processing/Sent/Failed."""
+    return path.parent == WATCH_DIR and path.name.startswith("email_") and path.name.endswith(".json")
+
+
+def claim_email_file(json_path: Path) -> Path | None:
+    """
+    Take a pending file by renaming it into PROCESSING_DIR. The rename is
+    atomic, so of several workers or bots racing for one file exactly one
+    gets it; the others get None.
+    """
+    claimed = PROCESSING_DIR / json_path.name
+    try:
+        os.rename(json_path, claimed)
+        os.utime(claimed)  # A rename keeps the old mtime; release_stale_claims() ages claims from now
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def release_stale_claims(in_flight: set[str] = frozenset()):
+    """
+    Put files claimed by a bot that died mid-send back into the watch folder.
+    Files this bot is still working on (`in_flight`) are left alone.
+    """
+    now = time.time()
+    for entry in os.scandir(PROCESSING_DIR):
+        if not entry.is_file() or entry.name in in_flight:
+            continue
+        try:
+            if now - entry.stat().st_mtime > STALE_CLAIM_SECONDS:
+                os.rename(entry.path, WATCH_DIR / entry.name)
+                print(f"♻️ Released stale claim: {entry.name}")
+        except FileNotFoundError:
+            pass  # Finished or released by its bot meanwhile
+
+
+def load_metadata(path: Path) -> dict:
+    """Read an email file, giving a writer that is still busy with it a moment to finish."""
+    while True:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            if time.time() - path.stat().st_mtime > SETTLE_SECONDS:
+                raise
+            time.sleep(SETTLE_SECONDS)
+
+
 def process_email_file(json_path: Path):
-    """Process a single email metadata file."""
+    """Claim and process a single email metadata file."""
+    claimed = claim_email_file(json_path)
+    if claimed is None:
+        return  # Another worker or bot got it first
+    
     print(f"\n📨 Processing: {json_path.name}")
     
     try:
-        with open(json_path, "r") as f:
-            metadata = json.load(f)
+        metadata = load_metadata(claimed)
         
         # Check if already processed
         if metadata.get("status") == "sent":
             print("   Already sent, skipping.")
+            os.rename(claimed, SENT_DIR / json_path.name)
             return
         
         # Send email
@@ -138,21 +213,85 @@ def process_email_file(json_path: Path):
         with open(dest_path, "w") as f:
             json.dump(metadata, f, indent=2)
         
-        json_path.unlink()  # Remove from watch folder
+        claimed.unlink()  # Remove the claim
         
         print(f"   Moved to: {dest_dir.name}/")
         
     except Exception as e:
         print(f"❌ Error processing {json_path.name}: {e}")
+        os.rename(claimed, FAILED_DIR / json_path.name)
+
+
+class OutboxWorkers:
+    """
+    Bounded pool that processes email files. At most WORKERS files are in
+    flight; submit() blocks beyond that, and skips files already queued.
+    """
+    
+    def __init__(self, workers: int = WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+    
+    def submit(self, path: Path):
+        if not is_email_file(path):
+            return
+        with self._lock:
+            if path.name in self._queued:
+                return
+            self._queued.add(path.name)
+        self._slots.acquire()
+        self._executor.submit(self._process, path)
+    
+    def in_flight(self) -> set[str]:
+        """Names of the files submitted and not finished yet."""
+        with self._lock:
+            return set(self._queued)
+    
+    def _process(self, path: Path):
+        try:
+            process_email_file(path)
+        finally:
+            with self._lock:
+                self._queued.discard(path.name)
+            self._slots.release()
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class OutboxEventHandler(FileSystemEventHandler):
+    """Hands new email files to the workers as soon as the OS reports them."""
+    
+    def __init__(self, workers: OutboxWorkers):
+        self.workers = workers
+    
+    def on_created(self, event):
+        if not event.is_directory:
+            self.workers.submit(Path(event.src_path))
+    
+    def on_moved(self, event):
+        # Apps often write to a temp file and rename it into place
+        if not event.is_directory:
+            self.workers.submit(Path(event.dest_path))
+
+
+def scan_outbox(workers: OutboxWorkers):
+    """Submit every pending email file (os.scandir - no stat or glob per file)."""
+    for entry in os.scandir(WATCH_DIR):
+        if entry.is_file():
+            workers.submit(Path(entry.path))
 
 
 def watch_loop():
-    """Main watch loop - polls for new email files."""
+    """Main loop - sends new email files as they appear."""
     print("=" * 50)
     print("🚀 Flighty Compensation Email Bot")
     print("=" * 50)
     print(f"📂 Watching: {WATCH_DIR}")
     print(f"📧 Sending from: {GMAIL_ADDRESS or '(not configured)'}")
+    print(f"👀 Mode: {'file events (watchdog)' if Observer else f'polling every {POLL_SECONDS:g}s (pip install watchdog for instant pickup)'}")
     print("\nPress Ctrl+C to stop.\n")
     
     if not GMAIL_ADDRESS or not GMAIL_APP_PASSWORD:
@@ -164,20 +303,34 @@ def watch_loop():
     
     setup_dirs()
     
-    while True:
-        try:
-            # Find all pending email files
-            json_files = list(WATCH_DIR.glob("email_*.json"))
-            
-            for json_path in json_files:
-                process_email_file(json_path)
-            
-            # Sleep before next poll
-            time.sleep(5)
+    workers = OutboxWorkers()
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(OutboxEventHandler(workers), str(WATCH_DIR), recursive=False)
+        observer.start()
+    
+    next_claim_check = 0.0
+    try:
+        while True:
+            # Claims of a bot that died (on this machine or another) go back
+            # into the folder, where the scan below picks them up
+            if time.monotonic() >= next_claim_check:
+                release_stale_claims(workers.in_flight())
+                next_claim_check = time.monotonic() + CLAIM_CHECK_SECONDS
             
-        except KeyboardInterrupt:
-            print("\n\n👋 Shutting down email bot.")
-            break
+            # Picks up files that existed before we started (and, with
+            # watchdog, any event that was missed)
+            scan_outbox(workers)
+            time.sleep(RESCAN_SECONDS if observer else POLL_SECONDS)
+    except KeyboardInterrupt:
+        print("\n\n👋 Shutting down email bot.")
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
+        workers.shutdown()
+        smtp_pool.close_pools()
 
 
 if __name__ == "__main__":
@@ -4,20 +4,31 @@ Flighty Compensation Email Server
 =================================
 HTTP server that receives email requests from the iOS app and sends them via Gmail.
 
+POST /send-email validates the request, stores it in a local SQLite queue
+and answers 202 with a job id at once; worker threads send it in the
+background. GET /send-email/{id} reports the job's status.
+
 Run:
     python3 email_server.py
 """
 
 import os
 import json
-import smtplib
-import ssl
 import base64
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import binascii
+import threading
+import uuid
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+from typing import List, Optional
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 
+import db
+import smtp_pool
+from keepalive import KeepAliveHandler
+
 # === Configuration ===
 PORT = 8080
 SMTP_SERVER = "smtp.gmail.com"
@@ -27,6 +38,37 @@ SMTP_PORT = 587
 GMAIL_ADDRESS = os.environ.get("GMAIL_ADDRESS", "")
 GMAIL_APP_PASSWORD = os.environ.get("GMAIL_APP_PASSWORD", "")
 
+# Background sending
+QUEUE_FILE = "email_queue.db"
+WORKERS = int(os.environ.get("EMAIL_WORKERS", "2"))  # Matches smtp_pool's default session count
+MAX_ATTEMPTS = 3  # Then the job is marked 'failed'
+RETRY_BASE_SECONDS = 30  # Doubles per attempt
+LEASE_SECONDS = 300  # A job being sent is retried after this if the server dies
+POLL_SECONDS = 2.0
+
+MIGRATIONS: List[db.Migration] = [
+    (
+        1,
+        "email job queue",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS email_jobs (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                error TEXT,
+                message TEXT,
+                created_at TEXT NOT NULL,
+                sent_at TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_email_jobs_due ON email_jobs (status, next_attempt_at)",
+        ],
+    ),
+]
+
 
 def send_email(data: dict) -> tuple[bool, str]:
     """Send an email using Gmail SMTP."""
@@ -57,11 +99,10 @@ def send_email(data: dict) -> tuple[bool, str]:
         if data.get("cc"):
             recipients.append(data["cc"])
         
-        context = ssl.create_default_context()
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls(context=context)
-            server.login(GMAIL_ADDRESS, GMAIL_APP_PASSWORD)
-            server.sendmail(GMAIL_ADDRESS, recipients, msg.as_string())
+        # Reuses a logged-in session instead of connecting, STARTTLS and login per email
+        smtp_pool.get_pool(SMTP_SERVER, SMTP_PORT, GMAIL_ADDRESS, GMAIL_APP_PASSWORD).send(
+            GMAIL_ADDRESS, recipients, msg.as_string()
+        )
         
         return True, f"Email sent to {data['to']}"
         
@@ -69,52 +110,187 @@ def send_email(data: dict) -> tuple[bool, str]:
         return False, str(e)
 
 
-class EmailHandler(BaseHTTPRequestHandler):
+def validate_email_request(data: dict) -> Optional[str]:
+    """Return what's wrong with an email request, or None if it can be sent."""
+    for field in ("to", "subject", "body"):
+        if not isinstance(data.get(field), str) or not data[field]:
+            return f"Missing field: {field}"
+    for attachment in data.get("attachments", []):
+        if not attachment.get("filename"):
+            return "Attachment without filename"
+        encoded = attachment.get("data", "")
+        try:
+            # Line breaks (MIME-style wrapped base64) are fine: send_email's decoder skips them
+            base64.b64decode("".join(encoded.split()), validate=True)
+        except (AttributeError, binascii.Error, ValueError):
+            return f"Attachment is not valid base64: {attachment['filename']}"
+    return None
+
+
+# === Email Queue ===
+
+def enqueue_email(data: dict) -> str:
+    """Store an email request as a queued job and return its id."""
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    with db.connection(QUEUE_FILE) as conn:
+        conn.execute(
+            "INSERT INTO email_jobs (id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, json.dumps(data), now, now)
+        )
+    return job_id
+
+
+def get_email_job(job_id: str) -> Optional[dict]:
+    with db.connection(QUEUE_FILE) as conn:
+        row = conn.execute(
+            "SELECT id, status, attempts, error, message, created_at, sent_at FROM email_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+    if not row:
+        return None
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "error": row["error"],
+        "message": row["message"],
+        "createdAt": row["created_at"],
+        "sentAt": row["sent_at"],
+    }
+
+
+def lease_next_email_job() -> Optional[tuple]:
+    """Take the oldest due job, pushing its next attempt out by LEASE_SECONDS. Returns (id, data, attempts)."""
+    now = datetime.utcnow()
+    with db.transaction(QUEUE_FILE) as conn:
+        row = conn.execute("""
+            SELECT id, payload, attempts FROM email_jobs
+            WHERE status IN ('queued', 'sending') AND next_attempt_at <= ?
+            ORDER BY next_attempt_at LIMIT 1
+        """, (now.isoformat(),)).fetchone()
+        if not row:
+            return None
+        conn.execute(
+            "UPDATE email_jobs SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+            ((now + timedelta(seconds=LEASE_SECONDS)).isoformat(), row["id"])
+        )
+    return row["id"], json.loads(row["payload"]), row["attempts"]
+
+
+def finish_email_job(job_id: str, attempts: int, success: bool, message: str):
+    now = datetime.utcnow()
+    with db.connection(QUEUE_FILE) as conn:
+        if success:
+            conn.execute(
+                "UPDATE email_jobs SET status = 'sent', attempts = ?, message = ?, error = NULL, sent_at = ? WHERE id = ?",
+                (attempts, message, now.isoformat(), job_id)
+            )
+        elif attempts < MAX_ATTEMPTS:
+            retry_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            conn.execute(
+                "UPDATE email_jobs SET status = 'queued', attempts = ?, error = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, message, retry_at.isoformat(), job_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE email_jobs SET status = 'failed', attempts = ?, error = ? WHERE id = ?",
+                (attempts, message, job_id)
+            )
+
+
+class EmailWorkers:
+    """Threads that send queued email jobs; jobs survive restarts in QUEUE_FILE."""
+    
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"email-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+    
+    def notify(self):
+        self._wakeup.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = lease_next_email_job()
+            except Exception as e:
+                print(f"❌ Email queue error: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            
+            job_id, data, attempts = job
+            success, message = send_email(data)
+            print(f"{'✅' if success else '❌'} [{job_id[:8]}] {message}")
+            finish_email_job(job_id, attempts + 1, success, message)
+
+
+email_workers = EmailWorkers()
+
+
+class EmailHandler(KeepAliveHandler):
+    def _send_json(self, status: int, data: dict):
+        self.send_body(status, json.dumps(data).encode())
+    
     def do_POST(self):
         if self.path == "/send-email":
-            content_length = int(self.headers["Content-Length"])
-            post_data = self.rfile.read(content_length)
-            
             try:
+                post_data = self.read_body()
                 data = json.loads(post_data.decode("utf-8"))
                 print(f"\n📨 Received email request:")
                 print(f"   To: {data.get('to')}")
                 print(f"   Subject: {data.get('subject')}")
                 
-                success, message = send_email(data)
+                error = validate_email_request(data)
+                if error:
+                    print(f"❌ {error}")
+                    self._send_json(400, {"success": False, "error": error})
+                    return
                 
-                if success:
-                    print(f"✅ {message}")
-                    self.send_response(200)
-                    self.send_header("Content-Type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"success": True, "message": message}).encode())
-                else:
-                    print(f"❌ {message}")
-                    self.send_response(500)
-                    self.send_header("Content-Type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"success": False, "error": message}).encode())
-                    
+                job_id = enqueue_email(data)
+                email_workers.notify()
+                print(f"📥 Queued as {job_id}")
+                self._send_json(202, {
+                    "success": True,
+                    "id": job_id,
+                    "status": "queued",
+                    "statusUrl": f"/send-email/{job_id}",
+                })
+            
             except Exception as e:
                 print(f"❌ Error: {e}")
-                self.send_response(400)
-                self.send_header("Content-Type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
+                self._send_json(400, {"success": False, "error": str(e)})
         else:
-            self.send_response(404)
-            self.end_headers()
+            self._send_json(404, {"success": False, "error": "Not found"})
     
     def do_GET(self):
         if self.path == "/health":
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "ok"}).encode())
+            self._send_json(200, {"status": "ok"})
+        elif self.path.startswith("/send-email/"):
+            job = get_email_job(self.path.split("/")[-1])
+            if job:
+                self._send_json(200, job)
+            else:
+                self._send_json(404, {"success": False, "error": "Unknown email id"})
         else:
-            self.send_response(404)
-            self.end_headers()
+            self._send_json(404, {"success": False, "error": "Not found"})
     
     def log_message(self, format, *args):
         # Suppress default logging
@@ -128,7 +304,8 @@ def main():
     print(f"📡 Listening on: http://localhost:{PORT}")
     print(f"📧 Sending from: {GMAIL_ADDRESS or '(not configured)'}")
     print("\nEndpoints:")
-    print(f"  POST http://localhost:{PORT}/send-email")
+    print(f"  POST http://localhost:{PORT}/send-email       (202 + id, sent in the background)")
+    print(f"  GET  http://localhost:{PORT}/send-email/{{id}}  (status: queued, sending, sent, failed)")
     print(f"  GET  http://localhost:{PORT}/health")
     print("\nPress Ctrl+C to stop.\n")
     
@@ -139,12 +316,19 @@ def main():
         print("   export GMAIL_APP_PASSWORD='your_app_password'")
         print()
     
-    server = HTTPServer(("", PORT), EmailHandler)
+    db.migrate(QUEUE_FILE, MIGRATIONS)
+    email_workers.start()
+    
+    # Threaded: an idle keep-alive client must not block everyone else
+    server = ThreadingHTTPServer(("", PORT), EmailHandler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n\n👋 Shutting down server.")
         server.shutdown()
+    finally:
+        email_workers.stop()
+        smtp_pool.close_pools()
 
 
 if __name__ == "__main__":
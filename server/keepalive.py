@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP/1.1 Keep-Alive Handler
+==================================
+Base request handler for payout_server.py and email_server.py.
+
+BaseHTTPRequestHandler speaks HTTP/1.0 by default and the handlers sent no
+Content-Length, so every request paid for a new TCP connection. This base
+class keeps connections open between requests:
+
+    class PayoutHandler(KeepAliveHandler):
+        def do_GET(self):
+            self.send_body(200, json.dumps(data).encode())
+
+- every response carries Content-Length and an explicit Connection header
+- a connection idle for KEEPALIVE_TIMEOUT seconds is closed
+- a connection is closed after KEEPALIVE_MAX_REQUESTS responses
+- a request body the handler didn't read is drained (or the connection
+  closed) so it can't be mistaken for the next request
+- headers and body go out in one send with Nagle disabled, so a client
+  reusing the connection never waits on a delayed ACK
+- a server with keep_alive = False (one that serves a connection at a
+  time) gets one request per connection; a server with a
+  connection_idle(sock, idle) method is told when a connection is waiting
+  for its next request, so it can close it to make room for a new one
+"""
+
+import os
+from http.server import BaseHTTPRequestHandler
+
+# === Configuration ===
+KEEPALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "5"))  # Idle seconds before closing
+KEEPALIVE_MAX_REQUESTS = int(os.environ.get("HTTP_KEEPALIVE_MAX_REQUESTS", "100"))  # Per connection
+MAX_DRAIN_BYTES = 64 * 1024  # Larger unread bodies close the connection instead
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT  # Socket timeout, i.e. how long we wait for the next request
+    max_requests = KEEPALIVE_MAX_REQUESTS
+    wbufsize = -1  # Buffer headers + body; handle_one_request() flushes after each request
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self._set_idle(True)
+            self.handle_one_request()
+
+    def _set_idle(self, idle: bool):
+        notify = getattr(self.server, "connection_idle", None)
+        if notify:
+            notify(self.connection, idle)
+
+    def parse_request(self) -> bool:
+        self._set_idle(False)
+        self._body_read = False
+        return super().parse_request()
+
+    def read_body(self) -> bytes:
+        """Read the request body (Content-Length delimited)."""
+        self._body_read = True
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _discard_unread_body(self):
+        if self._body_read:
+            return
+        self._body_read = True
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_DRAIN_BYTES:
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json"):
+        """Send a complete response, keeping the connection open unless it's time to close it."""
+        self._discard_unread_body()
+        self.requests_handled += 1
+        if self.requests_handled >= self.max_requests or not getattr(self.server, "keep_alive", True):
+            self.close_connection = True
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close" if self.close_connection else "keep-alive")
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style Metrics
+========================
+In-process counters and histograms for payout_server.py, rendered in the
+Prometheus text exposition format (served on GET /metrics):
+
+    REQUESTS = metrics.counter("http_requests_total", "HTTP requests", ["route", "status"])
+    REQUESTS.labels("/health", "200").inc()
+
+    LATENCY = metrics.histogram("db_query_duration_seconds", "DB helper time", ["helper"])
+    LATENCY.labels("get_payout_by_id").observe(0.0004)
+
+    @metrics.timed(LATENCY)          # labels each observation with the function name
+    def get_payout_by_id(...): ...
+
+Each label combination is a series created on first use; after that an
+update is a dict lookup, a bisect over the buckets and a few additions
+under the series' own lock - cheap enough to leave on in the hot path.
+Keep label values bounded (route templates, not raw paths).
+"""
+
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# === Configuration ===
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _CounterSeries:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{{{labels}}} {_format(self.value)}" if labels else f"{name} {_format(self.value)}"]
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self._buckets) + [float("inf")], counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{_format(bound)}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {_format(total)}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, series: _HistogramSeries):
+        self._series = series
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(time.perf_counter() - self._start)
+
+
+class Metric:
+    """A named metric family; labels(...) returns the series for one label combination."""
+
+    def __init__(self, kind: str, name: str, help_text: str, label_names: Sequence[str],
+                 new_series: Callable[[], object]):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._new_series = new_series
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for values, series in items:
+            labels = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(self.label_names, values))
+            lines.extend(series.samples(self.name, labels))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, label_names: Sequence[str] = (),
+            registry: Optional[Registry] = None) -> Metric:
+    return (registry or REGISTRY).register(Metric("counter", name, help_text, label_names, _CounterSeries))
+
+
+def histogram(name: str, help_text: str, label_names: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = None) -> Metric:
+    buckets = tuple(sorted(buckets))
+    return (registry or REGISTRY).register(
+        Metric("histogram", name, help_text, label_names, lambda: _HistogramSeries(buckets))
+    )
+
+
+def timed(metric: Metric):
+    """Decorator observing each call's duration in `metric`, labelled with the function's name."""
+    def decorate(fn):
+        series = metric.labels(fn.__name__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                series.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def render() -> str:
+    """Every registered metric in the text exposition format."""
+    return REGISTRY.render()
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -10,81 +10,172 @@ Features:
 - dLocal API integration
 - Webhook handling for payout status updates
 - Bank reconciliation for incoming AESA funds
+- Prometheus-style metrics on GET /metrics
 
 Run:
-    python3 payout_server.py
+    python3 payout_server.py [--workers N]
 """
 
 import os
+import base64
 import json
+from collections import OrderedDict
+import copy
 import uuid
 import hmac
 import hashlib
+import http.client
+import queue
+import random
+import socket
 import sqlite3
+import ssl
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer
 from urllib.parse import urlparse, parse_qs
-from typing import Optional, Dict, Any, List
+from typing import Optional, Callable, Dict, Any, List, Tuple, Union
 import threading
 import time
 
+import db
+import metrics
+from keepalive import KeepAliveHandler
+
 # === Configuration ===
 PORT = 8080
 DATABASE_FILE = "payouts.db"
 
+# Number of worker threads serving requests (1 = legacy single-threaded mode)
+SERVER_WORKERS = int(os.environ.get("PAYOUT_SERVER_WORKERS", "16"))
+
 # dLocal API Configuration
 DLOCAL_API_URL = os.environ.get("DLOCAL_API_URL", "https://sandbox.dlocal.com")
 DLOCAL_API_KEY = os.environ.get("DLOCAL_API_KEY", "")
 DLOCAL_SECRET_KEY = os.environ.get("DLOCAL_SECRET_KEY", "")
 DLOCAL_WEBHOOK_SECRET = os.environ.get("DLOCAL_WEBHOOK_SECRET", "")
+DLOCAL_POOL_SIZE = int(os.environ.get("DLOCAL_POOL_SIZE", "10"))  # Keep-alive connections (= max concurrent calls)
+DLOCAL_TIMEOUT = float(os.environ.get("DLOCAL_TIMEOUT", "30"))  # Seconds, per connect/read
+DLOCAL_RATE_LIMIT = float(os.environ.get("DLOCAL_RATE_LIMIT", "10"))  # Payout submissions/sec (0 = unlimited)
+DLOCAL_RATE_BURST = int(os.environ.get("DLOCAL_RATE_BURST", "20"))
+DLOCAL_FAILED_STATUSES = {"REJECTED", "CANCELLED", "FAILED"}  # dLocal payout statuses that will never pay out
+
+# Payout submission queue (payouts with status 'queued')
+PAYOUT_QUEUE_WORKERS = int(os.environ.get("PAYOUT_QUEUE_WORKERS", "4"))  # 0 = don't submit from this process
+PAYOUT_LEASE_SECONDS = 120  # A worker's claim on a queued payout expires after this (keep well above DLOCAL_TIMEOUT)
+PAYOUT_QUEUE_POLL_SECONDS = 1.0  # Idle workers re-check for rows queued by other processes
+
+# Automatic retries of failed payouts (exponential backoff with jitter)
+PAYOUT_MAX_RETRIES = int(os.environ.get("PAYOUT_MAX_RETRIES", "5"))  # Then the payout is dead-lettered
+PAYOUT_RETRY_BASE_SECONDS = 300  # First retry after 2.5-5 minutes
+PAYOUT_RETRY_MAX_SECONDS = 6 * 3600  # Backoff ceiling
+PAYOUT_RETRY_BATCH_SIZE = 50  # Due retries resubmitted per dLocal batch
+PAYOUT_RETRY_POLL_SECONDS = 5.0  # Longest the scheduler sleeps between checks
+
+# Webhook inbox processing
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "16"))  # More workers = bigger group commits
+WEBHOOK_DISPATCH_BATCH = 500  # Inbox rows read per dispatcher query
+WEBHOOK_MAX_ATTEMPTS = 3  # Per event, then it is marked processed with the error
+WEBHOOK_POLL_SECONDS = 1.0
+WEBHOOK_DEDUP_CACHE_SIZE = int(os.environ.get("WEBHOOK_DEDUP_CACHE_SIZE", "10000"))  # Recent event keys kept in memory
+
+# Group commit for status updates and webhook event rows
+STATUS_WRITER_BATCH = int(os.environ.get("STATUS_WRITER_BATCH", "64"))  # Flush after this many writes...
+STATUS_WRITER_MAX_DELAY_MS = float(os.environ.get("STATUS_WRITER_MAX_DELAY_MS", "0"))  # ...or this long (0 = don't linger)
+
+# Batch lookups (POST /api/payouts/lookup, POST /api/recipients/lookup)
+LOOKUP_MAX_CLAIMS = int(os.environ.get("LOOKUP_MAX_CLAIMS", "500"))  # Claim IDs per request, all in one IN (...) query
+
+# Listing endpoints (GET /api/payouts, /api/reconciliations, /api/webhook-events)
+LIST_PAGE_SIZE = 50  # Rows per page unless ?limit= says otherwise
+LIST_MAX_PAGE_SIZE = 500
+
+# Read-through cache of Recipient / Payout objects (invalidated by this process's writes)
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", "10000"))  # Objects per cache (0 = no caching)
+MODEL_CACHE_TTL_SECONDS = float(os.environ.get("MODEL_CACHE_TTL_SECONDS", "30"))  # Bounds staleness from other processes' writes
+
+# Notification outbox (customer emails sent through EMAIL_SERVER_URL)
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", "4"))  # Concurrent sends
+NOTIFICATION_BATCH_SIZE = 50
+NOTIFICATION_MAX_ATTEMPTS = 8  # Then the email is marked 'failed'
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+NOTIFICATION_RETRY_MAX_SECONDS = 3600
+NOTIFICATION_LEASE_SECONDS = 120  # A batch being sent is retried after this if the process dies
+NOTIFICATION_TIMEOUT = 10
+NOTIFICATION_POLL_SECONDS = 2.0
 
 # Email notification (reuse from email_server)
 EMAIL_SERVER_URL = "http://localhost:8080/send-email"
 
 
+# === Metrics ===
+# Served on GET /metrics (Prometheus text format)
+
+HTTP_REQUESTS = metrics.counter(
+    "payout_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "payout_http_request_duration_seconds", "Time from request line to response", ["method", "route", "status"]
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "payout_db_query_duration_seconds", "Time spent in each database helper (cache hits included)", ["helper"]
+)
+DLOCAL_REQUEST_SECONDS = metrics.histogram(
+    "payout_dlocal_request_duration_seconds", "dLocal API call latency", ["method", "endpoint"]
+)
+DLOCAL_ERRORS = metrics.counter(
+    "payout_dlocal_errors_total", "Failed dLocal API calls (HTTP status or exception)", ["method", "endpoint", "reason"]
+)
+WEBHOOK_PROCESSING_SECONDS = metrics.histogram(
+    "payout_webhook_processing_duration_seconds", "Time to apply one webhook event", ["event_type", "outcome"]
+)
+
+
 # === Database Setup ===
 
-def init_database():
-    """Initialize SQLite database with required tables."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    # Recipients table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recipients (
-            id TEXT PRIMARY KEY,
-            claim_id TEXT NOT NULL UNIQUE,
-            customer_id TEXT NOT NULL,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            phone TEXT,
-            country TEXT NOT NULL,
-            address_street TEXT NOT NULL,
-            address_city TEXT NOT NULL,
-            address_postal TEXT NOT NULL,
-            date_of_birth TEXT,
-            document_type TEXT NOT NULL,
-            document_number TEXT NOT NULL,
-            payout_method TEXT NOT NULL DEFAULT 'bank',
-            iban TEXT,
-            bic TEXT,
-            account_holder_name TEXT,
-            bank_name TEXT,
-            card_token TEXT,
-            card_last4 TEXT,
-            card_brand TEXT,
-            currency_preferred TEXT NOT NULL DEFAULT 'EUR',
-            status TEXT NOT NULL DEFAULT 'pending',
-            validation_errors TEXT,
-            kyc_screening_result TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-    """)
-    
-    # Payouts table
-    cursor.execute("""
+# Versioned schema, applied in order by db.migrate(). Never edit a released
+# migration - append a new one instead.
+MIGRATIONS: List[db.Migration] = [
+    (
+        1,
+        "base tables",
+        [
+            # Recipients table
+            """
+            CREATE TABLE IF NOT EXISTS recipients (
+                id TEXT PRIMARY KEY,
+                claim_id TEXT NOT NULL UNIQUE,
+                customer_id TEXT NOT NULL,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                phone TEXT,
+                country TEXT NOT NULL,
+                address_street TEXT NOT NULL,
+                address_city TEXT NOT NULL,
+                address_postal TEXT NOT NULL,
+                date_of_birth TEXT,
+                document_type TEXT NOT NULL,
+                document_number TEXT NOT NULL,
+                payout_method TEXT NOT NULL DEFAULT 'bank',
+                iban TEXT,
+                bic TEXT,
+                account_holder_name TEXT,
+                bank_name TEXT,
+                card_token TEXT,
+                card_last4 TEXT,
+                card_brand TEXT,
+                currency_preferred TEXT NOT NULL DEFAULT 'EUR',
+                status TEXT NOT NULL DEFAULT 'pending',
+                validation_errors TEXT,
+                kyc_screening_result TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+                """,
+                # Payouts table
+            """
         CREATE TABLE IF NOT EXISTS payouts (
             id TEXT PRIMARY KEY,
             claim_id TEXT NOT NULL,
@@ -108,25 +199,23 @@ def init_database():
             webhook_last_event_at TEXT,
             FOREIGN KEY (recipient_id) REFERENCES recipients(id)
         )
-    """)
-    
-    # Bank reconciliation table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS bank_reconciliations (
-            id TEXT PRIMARY KEY,
-            bank_ref TEXT NOT NULL,
-            amount_eur REAL NOT NULL,
-            received_at TEXT NOT NULL,
-            matched_claim_id TEXT,
-            matched_at TEXT,
-            status TEXT NOT NULL DEFAULT 'pending_match',
-            notes TEXT,
-            created_at TEXT NOT NULL
-        )
-    """)
-    
-    # Webhook events log
-    cursor.execute("""
+            """,
+            # Bank reconciliation table
+            """
+            CREATE TABLE IF NOT EXISTS bank_reconciliations (
+                id TEXT PRIMARY KEY,
+                bank_ref TEXT NOT NULL,
+                amount_eur REAL NOT NULL,
+                received_at TEXT NOT NULL,
+                matched_claim_id TEXT,
+                matched_at TEXT,
+                status TEXT NOT NULL DEFAULT 'pending_match',
+                notes TEXT,
+                created_at TEXT NOT NULL
+            )
+                """,
+                # Webhook events log
+            """
         CREATE TABLE IF NOT EXISTS webhook_events (
             id TEXT PRIMARY KEY,
             event_type TEXT NOT NULL,
@@ -135,11 +224,137 @@ def init_database():
             payload TEXT NOT NULL,
             processed_at TEXT NOT NULL
         )
-    """)
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized")
+            """,
+        ],
+    ),
+    (
+        2,
+        "indexes for webhook, status poll and reconciliation lookups",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_payouts_provider_payout_id ON payouts (provider_payout_id)",
+            "CREATE INDEX IF NOT EXISTS idx_payouts_claim_created ON payouts (claim_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_bank_ref ON bank_reconciliations (bank_ref)",
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_status_received ON bank_reconciliations (status, received_at)",
+        ],
+    ),
+    (
+        3,
+        "expected compensations for amount/date matching",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS expected_compensations (
+                claim_id TEXT PRIMARY KEY,
+                amount_eur REAL NOT NULL,
+                expected_at TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_matched_claim ON bank_reconciliations (matched_claim_id)",
+        ],
+    ),
+    (
+        4,
+        "payout submission queue leases",
+        [
+            "ALTER TABLE payouts ADD COLUMN leased_until TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_payouts_status_queued ON payouts (status, queued_at)",
+        ],
+    ),
+    (
+        5,
+        "payout retry schedule index",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_payouts_status_next_retry ON payouts (status, next_retry_at)",
+        ],
+    ),
+    (
+        6,
+        "webhook inbox",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS webhook_inbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type TEXT NOT NULL,
+                provider_payout_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                received_at TEXT NOT NULL,
+                processed_at TEXT,
+                error TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_webhook_inbox_pending ON webhook_inbox (seq) WHERE processed_at IS NULL",
+        ],
+    ),
+    (
+        7,
+        "webhook event deduplication key",
+        [
+            "ALTER TABLE webhook_events ADD COLUMN event_key TEXT",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_webhook_events_event_key ON webhook_events (event_key)",
+        ],
+    ),
+    (
+        8,
+        "notification outbox",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id TEXT PRIMARY KEY,
+                payout_id TEXT,
+                email_to TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                last_error TEXT,
+                created_at TEXT NOT NULL,
+                sent_at TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox (status, next_attempt_at)",
+        ],
+    ),
+    (
+        9,
+        "keyset pagination indexes for listing endpoints",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_payouts_created ON payouts (created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_payouts_status_created ON payouts (status, created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_created ON bank_reconciliations (created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_status_created ON bank_reconciliations (status, created_at, id)",
+            # webhook_events has no created_at; processed_at is when the row was written
+            "CREATE INDEX IF NOT EXISTS idx_webhook_events_processed ON webhook_events (processed_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_webhook_events_payout_processed ON webhook_events (payout_id, processed_at, id)",
+        ],
+    ),
+    (
+        10,
+        "payout lease owner and unrecorded submissions",
+        [
+            # Which lease holder may record the outcome of a submission
+            "ALTER TABLE payouts ADD COLUMN lease_token TEXT",
+            # Set when a payout is sent to dLocal, cleared once the outcome is recorded
+            "ALTER TABLE payouts ADD COLUMN submission_started_at TEXT",
+        ],
+    ),
+    (
+        11,
+        "statement import batches",
+        [
+            # Set on the rows of a statement file while it is being imported
+            "ALTER TABLE bank_reconciliations ADD COLUMN ingest_batch TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_reconciliations_ingest_batch ON bank_reconciliations (ingest_batch) "
+            "WHERE ingest_batch IS NOT NULL",
+        ],
+    ),
+]
+
+
+def init_database():
+    """Create or upgrade the SQLite database by applying pending migrations."""
+    version = db.migrate(DATABASE_FILE, MIGRATIONS)
+    print(f"✅ Database initialized (schema v{version})")
 
 
 # === Models ===
@@ -288,275 +503,583 @@ class Payout:
 
 # === Database Operations ===
 
+def _recipient_from_row(row: sqlite3.Row) -> Recipient:
+    return Recipient({
+        "id": row["id"],
+        "claimId": row["claim_id"],
+        "customerId": row["customer_id"],
+        "firstName": row["first_name"],
+        "lastName": row["last_name"],
+        "email": row["email"],
+        "phone": row["phone"],
+        "country": row["country"],
+        "addressStreet": row["address_street"],
+        "addressCity": row["address_city"],
+        "addressPostal": row["address_postal"],
+        "dateOfBirth": row["date_of_birth"],
+        "documentType": row["document_type"],
+        "documentNumber": row["document_number"],
+        "payoutMethod": row["payout_method"],
+        "iban": row["iban"],
+        "bic": row["bic"],
+        "accountHolderName": row["account_holder_name"],
+        "bankName": row["bank_name"],
+        "cardToken": row["card_token"],
+        "cardLast4": row["card_last4"],
+        "cardBrand": row["card_brand"],
+        "currencyPreferred": row["currency_preferred"],
+        "status": row["status"],
+        "validationErrors": json.loads(row["validation_errors"]) if row["validation_errors"] else None,
+        "kycScreeningResult": row["kyc_screening_result"],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"]
+    })
+
+
+def _payout_from_row(row: sqlite3.Row) -> Payout:
+    return Payout({
+        "id": row["id"],
+        "claimId": row["claim_id"],
+        "recipientId": row["recipient_id"],
+        "amountEUR": row["amount_eur"],
+        "currencyDestination": row["currency_destination"],
+        "fxRate": row["fx_rate"],
+        "amountDestination": row["amount_destination"],
+        "provider": row["provider"],
+        "providerPayoutId": row["provider_payout_id"],
+        "status": row["status"],
+        "failureReason": row["failure_reason"],
+        "failureCode": row["failure_code"],
+        "createdAt": row["created_at"],
+        "queuedAt": row["queued_at"],
+        "sentAt": row["sent_at"],
+        "settledAt": row["settled_at"],
+        "retryCount": row["retry_count"],
+        "nextRetryAt": row["next_retry_at"],
+        "webhookLastEvent": row["webhook_last_event"],
+        "webhookLastEventAt": row["webhook_last_event_at"]
+    })
+
+
+class ModelCache:
+    """
+    Read-through LRU cache of Recipient or Payout objects keyed by id, at
+    most `size` of them, each kept for `ttl` seconds. An entry can also be
+    found by an alias (the claim ID) that is dropped along with it.
+    
+    Writes call invalidate() once their transaction has committed (see
+    db.after_commit). Every invalidation bumps a generation counter, and an
+    object loaded after a miss is only stored if the counter hasn't moved
+    meanwhile - otherwise it may be the row as it was before a concurrent
+    write. Callers get copies, so mutating a result never touches the cache.
+    The TTL bounds how stale an entry can get through writes made by other
+    processes (reconciliation_job.py inserting payouts).
+    """
+    
+    def __init__(self, size: int = MODEL_CACHE_SIZE, ttl: float = MODEL_CACHE_TTL_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any, Optional[str]]]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: str, load: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """The object with this id; load() reads it from the database on a miss."""
+        return self._read_through(lambda: self._lookup(key), load, None)
+    
+    def get_by_alias(self, alias: str, load: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """The object for this alias; load() reads it from the database on a miss."""
+        return self._read_through(lambda: self._lookup(self._aliases.get(alias)), load, alias)
+    
+    def get_many_by_alias(self, aliases: List[str],
+                          load: Callable[[List[str]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        {alias: object} for the aliases that exist. load(missing) reads all
+        the misses from the database at once and returns them the same way.
+        """
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        with self._lock:
+            for alias in aliases:
+                obj = self._lookup(self._aliases.get(alias))
+                if obj is not None:
+                    found[alias] = copy.copy(obj)
+                else:
+                    missing.append(alias)
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self._generation
+        
+        if missing:
+            loaded = load(missing)
+            if loaded and self.size > 0 and self.ttl > 0:
+                with self._lock:
+                    if generation == self._generation:
+                        for alias, obj in loaded.items():
+                            self._store(copy.copy(obj), alias)
+            found.update(loaded)
+        return found
+    
+    def invalidate(self, key: str, alias: Optional[str] = None):
+        """Drop the object with this id and whatever the alias points at."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._drop(key)
+            if alias is not None:
+                self._drop(self._aliases.get(alias))
+    
+    def _read_through(self, find: Callable[[], Optional[Any]], load: Callable[[], Optional[Any]],
+                      alias: Optional[str]) -> Optional[Any]:
+        with self._lock:
+            obj = find()
+            if obj is not None:
+                self.hits += 1
+                return copy.copy(obj)
+            self.misses += 1
+            generation = self._generation
+        
+        obj = load()
+        if obj is not None and self.size > 0 and self.ttl > 0:
+            with self._lock:
+                if generation == self._generation:
+                    self._store(copy.copy(obj), alias)
+        return obj
+    
+    def _lookup(self, key: Optional[str]) -> Optional[Any]:
+        entry = self._entries.get(key) if key is not None else None
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def _store(self, obj: Any, alias: Optional[str]):
+        self._drop(obj.id)
+        self._entries[obj.id] = (time.monotonic() + self.ttl, obj, alias)
+        if alias is not None:
+            self._aliases[alias] = obj.id
+        while len(self._entries) > self.size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def _drop(self, key: Optional[str]):
+        entry = self._entries.pop(key, None) if key is not None else None
+        if entry and entry[2] is not None and self._aliases.get(entry[2]) == key:
+            del self._aliases[entry[2]]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+recipient_cache = ModelCache()
+payout_cache = ModelCache()
+
+
+def _invalidate_payout_on_commit(payout_id: str, claim_id: Optional[str] = None):
+    """Drop a payout from payout_cache once the current transaction commits."""
+    db.after_commit(DATABASE_FILE, lambda: payout_cache.invalidate(payout_id, claim_id))
+
+
+@metrics.timed(DB_QUERY_SECONDS)
 def save_recipient(recipient: Recipient) -> Recipient:
     """Save or update a recipient in the database."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
     recipient.updated_at = datetime.utcnow().isoformat()
     
-    cursor.execute("""
-        INSERT OR REPLACE INTO recipients 
-        (id, claim_id, customer_id, first_name, last_name, email, phone, country,
-         address_street, address_city, address_postal, date_of_birth, document_type,
-         document_number, payout_method, iban, bic, account_holder_name, bank_name,
-         card_token, card_last4, card_brand, currency_preferred, status,
-         validation_errors, kyc_screening_result, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        recipient.id, recipient.claim_id, recipient.customer_id, recipient.first_name,
-        recipient.last_name, recipient.email, recipient.phone, recipient.country,
-        recipient.address_street, recipient.address_city, recipient.address_postal,
-        recipient.date_of_birth, recipient.document_type, recipient.document_number,
-        recipient.payout_method, recipient.iban, recipient.bic, recipient.account_holder_name,
-        recipient.bank_name, recipient.card_token, recipient.card_last4, recipient.card_brand,
-        recipient.currency_preferred, recipient.status,
-        json.dumps(recipient.validation_errors) if recipient.validation_errors else None,
-        recipient.kyc_screening_result, recipient.created_at, recipient.updated_at
-    ))
-    
-    conn.commit()
-    conn.close()
+    with db.transaction(DATABASE_FILE) as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO recipients 
+            (id, claim_id, customer_id, first_name, last_name, email, phone, country,
+             address_street, address_city, address_postal, date_of_birth, document_type,
+             document_number, payout_method, iban, bic, account_holder_name, bank_name,
+             card_token, card_last4, card_brand, currency_preferred, status,
+             validation_errors, kyc_screening_result, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            recipient.id, recipient.claim_id, recipient.customer_id, recipient.first_name,
+            recipient.last_name, recipient.email, recipient.phone, recipient.country,
+            recipient.address_street, recipient.address_city, recipient.address_postal,
+            recipient.date_of_birth, recipient.document_type, recipient.document_number,
+            recipient.payout_method, recipient.iban, recipient.bic, recipient.account_holder_name,
+            recipient.bank_name, recipient.card_token, recipient.card_last4, recipient.card_brand,
+            recipient.currency_preferred, recipient.status,
+            json.dumps(recipient.validation_errors) if recipient.validation_errors else None,
+            recipient.kyc_screening_result, recipient.created_at, recipient.updated_at
+        ))
+        db.after_commit(DATABASE_FILE, lambda: recipient_cache.invalidate(recipient.id, recipient.claim_id))
+    
     return recipient
 
 
+@metrics.timed(DB_QUERY_SECONDS)
 def get_recipient_by_claim_id(claim_id: str) -> Optional[Recipient]:
-    """Get recipient by claim ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM recipients WHERE claim_id = ?", (claim_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return Recipient({
-            "id": row["id"],
-            "claimId": row["claim_id"],
-            "customerId": row["customer_id"],
-            "firstName": row["first_name"],
-            "lastName": row["last_name"],
-            "email": row["email"],
-            "phone": row["phone"],
-            "country": row["country"],
-            "addressStreet": row["address_street"],
-            "addressCity": row["address_city"],
-            "addressPostal": row["address_postal"],
-            "dateOfBirth": row["date_of_birth"],
-            "documentType": row["document_type"],
-            "documentNumber": row["document_number"],
-            "payoutMethod": row["payout_method"],
-            "iban": row["iban"],
-            "bic": row["bic"],
-            "accountHolderName": row["account_holder_name"],
-            "bankName": row["bank_name"],
-            "cardToken": row["card_token"],
-            "cardLast4": row["card_last4"],
-            "cardBrand": row["card_brand"],
-            "currencyPreferred": row["currency_preferred"],
-            "status": row["status"],
-            "validationErrors": json.loads(row["validation_errors"]) if row["validation_errors"] else None,
-            "kycScreeningResult": row["kyc_screening_result"],
-            "createdAt": row["created_at"],
-            "updatedAt": row["updated_at"]
-        })
-    return None
+    """Get recipient by claim ID (cached)."""
+    def load() -> Optional[Recipient]:
+        with db.connection(DATABASE_FILE) as conn:
+            row = conn.execute("SELECT * FROM recipients WHERE claim_id = ?", (claim_id,)).fetchone()
+        return _recipient_from_row(row) if row else None
+    
+    return recipient_cache.get_by_alias(claim_id, load)
 
 
+@metrics.timed(DB_QUERY_SECONDS)
 def get_recipient_by_id(recipient_id: str) -> Optional[Recipient]:
-    """Get recipient by ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM recipients WHERE id = ?", (recipient_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return Recipient({
-            "id": row["id"],
-            "claimId": row["claim_id"],
-            "customerId": row["customer_id"],
-            "firstName": row["first_name"],
-            "lastName": row["last_name"],
-            "email": row["email"],
-            "phone": row["phone"],
-            "country": row["country"],
-            "addressStreet": row["address_street"],
-            "addressCity": row["address_city"],
-            "addressPostal": row["address_postal"],
-            "dateOfBirth": row["date_of_birth"],
-            "documentType": row["document_type"],
-            "documentNumber": row["document_number"],
-            "payoutMethod": row["payout_method"],
-            "iban": row["iban"],
-            "bic": row["bic"],
-            "accountHolderName": row["account_holder_name"],
-            "bankName": row["bank_name"],
-            "cardToken": row["card_token"],
-            "cardLast4": row["card_last4"],
-            "cardBrand": row["card_brand"],
-            "currencyPreferred": row["currency_preferred"],
-            "status": row["status"],
-            "validationErrors": json.loads(row["validation_errors"]) if row["validation_errors"] else None,
-            "kycScreeningResult": row["kyc_screening_result"],
-            "createdAt": row["created_at"],
-            "updatedAt": row["updated_at"]
-        })
-    return None
+    """Get recipient by ID (cached)."""
+    def load() -> Optional[Recipient]:
+        with db.connection(DATABASE_FILE) as conn:
+            row = conn.execute("SELECT * FROM recipients WHERE id = ?", (recipient_id,)).fetchone()
+        return _recipient_from_row(row) if row else None
+    
+    return recipient_cache.get(recipient_id, load)
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def get_recipients_by_claim_ids(claim_ids: List[str]) -> Dict[str, Recipient]:
+    """Recipients for many claims, {claim_id: recipient}, with one query for the cache misses."""
+    def load(missing: List[str]) -> Dict[str, Recipient]:
+        placeholders = ", ".join("?" * len(missing))
+        with db.connection(DATABASE_FILE) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM recipients WHERE claim_id IN ({placeholders})", missing
+            ).fetchall()
+        return {row["claim_id"]: _recipient_from_row(row) for row in rows}
+    
+    return recipient_cache.get_many_by_alias(claim_ids, load)
 
 
+@metrics.timed(DB_QUERY_SECONDS)
 def save_payout(payout: Payout) -> Payout:
-    """Save or update a payout in the database."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT OR REPLACE INTO payouts 
-        (id, claim_id, recipient_id, amount_eur, currency_destination, fx_rate,
-         amount_destination, provider, provider_payout_id, status, failure_reason,
-         failure_code, created_at, queued_at, sent_at, settled_at, retry_count,
-         next_retry_at, webhook_last_event, webhook_last_event_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        payout.id, payout.claim_id, payout.recipient_id, payout.amount_eur,
-        payout.currency_destination, payout.fx_rate, payout.amount_destination,
-        payout.provider, payout.provider_payout_id, payout.status, payout.failure_reason,
-        payout.failure_code, payout.created_at, payout.queued_at, payout.sent_at,
-        payout.settled_at, payout.retry_count, payout.next_retry_at,
-        payout.webhook_last_event, payout.webhook_last_event_at
-    ))
-    
-    conn.commit()
-    conn.close()
+    """
+    Save or update a payout in the database. The queue's own columns
+    (leased_until, lease_token, submission_started_at) are left as they are.
+    """
+    with db.transaction(DATABASE_FILE) as conn:
+        conn.execute("""
+            INSERT INTO payouts 
+            (id, claim_id, recipient_id, amount_eur, currency_destination, fx_rate,
+             amount_destination, provider, provider_payout_id, status, failure_reason,
+             failure_code, created_at, queued_at, sent_at, settled_at, retry_count,
+             next_retry_at, webhook_last_event, webhook_last_event_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                claim_id = excluded.claim_id, recipient_id = excluded.recipient_id,
+                amount_eur = excluded.amount_eur, currency_destination = excluded.currency_destination,
+                fx_rate = excluded.fx_rate, amount_destination = excluded.amount_destination,
+                provider = excluded.provider, provider_payout_id = excluded.provider_payout_id,
+                status = excluded.status, failure_reason = excluded.failure_reason,
+                failure_code = excluded.failure_code, created_at = excluded.created_at,
+                queued_at = excluded.queued_at, sent_at = excluded.sent_at, settled_at = excluded.settled_at,
+                retry_count = excluded.retry_count, next_retry_at = excluded.next_retry_at,
+                webhook_last_event = excluded.webhook_last_event,
+                webhook_last_event_at = excluded.webhook_last_event_at
+        """, (
+            payout.id, payout.claim_id, payout.recipient_id, payout.amount_eur,
+            payout.currency_destination, payout.fx_rate, payout.amount_destination,
+            payout.provider, payout.provider_payout_id, payout.status, payout.failure_reason,
+            payout.failure_code, payout.created_at, payout.queued_at, payout.sent_at,
+            payout.settled_at, payout.retry_count, payout.next_retry_at,
+            payout.webhook_last_event, payout.webhook_last_event_at
+        ))
+        _invalidate_payout_on_commit(payout.id, payout.claim_id)
+    
     return payout
 
 
+@metrics.timed(DB_QUERY_SECONDS)
 def get_payout_by_claim_id(claim_id: str) -> Optional[Payout]:
-    """Get payout by claim ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM payouts WHERE claim_id = ? ORDER BY created_at DESC LIMIT 1", (claim_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return Payout({
-            "id": row["id"],
-            "claimId": row["claim_id"],
-            "recipientId": row["recipient_id"],
-            "amountEUR": row["amount_eur"],
-            "currencyDestination": row["currency_destination"],
-            "fxRate": row["fx_rate"],
-            "amountDestination": row["amount_destination"],
-            "provider": row["provider"],
-            "providerPayoutId": row["provider_payout_id"],
-            "status": row["status"],
-            "failureReason": row["failure_reason"],
-            "failureCode": row["failure_code"],
-            "createdAt": row["created_at"],
-            "queuedAt": row["queued_at"],
-            "sentAt": row["sent_at"],
-            "settledAt": row["settled_at"],
-            "retryCount": row["retry_count"],
-            "nextRetryAt": row["next_retry_at"],
-            "webhookLastEvent": row["webhook_last_event"],
-            "webhookLastEventAt": row["webhook_last_event_at"]
-        })
-    return None
+    """Get the latest payout for a claim (cached)."""
+    def load() -> Optional[Payout]:
+        with db.connection(DATABASE_FILE) as conn:
+            row = conn.execute(
+                "SELECT * FROM payouts WHERE claim_id = ? ORDER BY created_at DESC LIMIT 1", (claim_id,)
+            ).fetchone()
+        return _payout_from_row(row) if row else None
+    
+    return payout_cache.get_by_alias(claim_id, load)
 
 
-def get_payout_by_id(payout_id: str) -> Optional[Payout]:
-    """Get payout by ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM payouts WHERE id = ?", (payout_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return Payout({
-            "id": row["id"],
-            "claimId": row["claim_id"],
-            "recipientId": row["recipient_id"],
-            "amountEUR": row["amount_eur"],
-            "currencyDestination": row["currency_destination"],
-            "fxRate": row["fx_rate"],
-            "amountDestination": row["amount_destination"],
-            "provider": row["provider"],
-            "providerPayoutId": row["provider_payout_id"],
-            "status": row["status"],
-            "failureReason": row["failure_reason"],
-            "failureCode": row["failure_code"],
-            "createdAt": row["created_at"],
-            "queuedAt": row["queued_at"],
-            "sentAt": row["sent_at"],
-            "settledAt": row["settled_at"],
-            "retryCount": row["retry_count"],
-            "nextRetryAt": row["next_retry_at"],
-            "webhookLastEvent": row["webhook_last_event"],
-            "webhookLastEventAt": row["webhook_last_event_at"]
-        })
-    return None
+@metrics.timed(DB_QUERY_SECONDS)
+def get_payouts_by_claim_ids(claim_ids: List[str]) -> Dict[str, Payout]:
+    """Latest payout for many claims, {claim_id: payout}, with one query for the cache misses."""
+    def load(missing: List[str]) -> Dict[str, Payout]:
+        placeholders = ", ".join("?" * len(missing))
+        with db.connection(DATABASE_FILE) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM payouts WHERE claim_id IN ({placeholders}) ORDER BY claim_id, created_at",
+                missing
+            ).fetchall()
+        # Rows come oldest first per claim (idx_payouts_claim_created), so the latest one wins
+        return {row["claim_id"]: _payout_from_row(row) for row in rows}
+    
+    return payout_cache.get_many_by_alias(claim_ids, load)
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def get_payout_by_id(payout_id: str, use_cache: bool = True) -> Optional[Payout]:
+    """
+    Get payout by ID. Code that decides a status change from the result
+    passes use_cache=False to read the committed row.
+    """
+    def load() -> Optional[Payout]:
+        with db.connection(DATABASE_FILE) as conn:
+            row = conn.execute("SELECT * FROM payouts WHERE id = ?", (payout_id,)).fetchone()
+        return _payout_from_row(row) if row else None
+    
+    return payout_cache.get(payout_id, load) if use_cache else load()
 
 
+@metrics.timed(DB_QUERY_SECONDS)
 def get_payout_by_provider_id(provider_payout_id: str) -> Optional[Payout]:
     """Get payout by dLocal payout ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM payouts WHERE provider_payout_id = ?", (provider_payout_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return Payout({
-            "id": row["id"],
-            "claimId": row["claim_id"],
-            "recipientId": row["recipient_id"],
-            "amountEUR": row["amount_eur"],
-            "currencyDestination": row["currency_destination"],
-            "fxRate": row["fx_rate"],
-            "amountDestination": row["amount_destination"],
-            "provider": row["provider"],
-            "providerPayoutId": row["provider_payout_id"],
-            "status": row["status"],
-            "failureReason": row["failure_reason"],
-            "failureCode": row["failure_code"],
-            "createdAt": row["created_at"],
-            "queuedAt": row["queued_at"],
-            "sentAt": row["sent_at"],
-            "settledAt": row["settled_at"],
-            "retryCount": row["retry_count"],
-            "nextRetryAt": row["next_retry_at"],
-            "webhookLastEvent": row["webhook_last_event"],
-            "webhookLastEventAt": row["webhook_last_event_at"]
-        })
+    with db.connection(DATABASE_FILE) as conn:
+        row = conn.execute(
+            "SELECT * FROM payouts WHERE provider_payout_id = ?", (provider_payout_id,)
+        ).fetchone()
+    
+    return _payout_from_row(row) if row else None
+
+
+def encode_cursor(timestamp: str, row_id: str) -> str:
+    """Opaque page cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(timestamp, str) and isinstance(row_id, str):
+            return timestamp, row_id
+    except (ValueError, TypeError):
+        pass
+    raise ValueError("Invalid cursor")
+
+
+def _keyset_page(table: str, time_column: str, conditions: List[Tuple[str, Any]],
+                 cursor: Optional[str], limit: int) -> Tuple[List[sqlite3.Row], Optional[str]]:
+    """
+    One page of `table`, newest first by (time_column, id). The cursor is
+    the last row's pair, so the next page is an index seek past it rather
+    than an OFFSET that reads and discards every earlier row - page 10,000
+    costs the same as page 1. Needs an index on (<equality columns>,
+    time_column, id). Returns (rows, cursor of the next page or None).
+    """
+    where = [sql for sql, _ in conditions]
+    params = [value for _, value in conditions]
+    if cursor:
+        where.append(f"({time_column}, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    
+    with db.connection(DATABASE_FILE) as conn:
+        rows = conn.execute(f"""
+            SELECT * FROM {table}
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY {time_column} DESC, id DESC LIMIT ?
+        """, params + [limit + 1]).fetchall()
+    
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last[time_column], last["id"])
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def list_payouts(status: Optional[str] = None, since: Optional[str] = None, cursor: Optional[str] = None,
+                 limit: int = LIST_PAGE_SIZE) -> Tuple[List[Payout], Optional[str]]:
+    """Payouts newest first, optionally with a status and created at or after `since` (ISO 8601)."""
+    conditions: List[Tuple[str, Any]] = []
+    if status:
+        conditions.append(("status = ?", status))
+    if since:
+        conditions.append(("created_at >= ?", datetime.fromisoformat(since).isoformat()))
+    rows, next_cursor = _keyset_page("payouts", "created_at", conditions, cursor, limit)
+    return [_payout_from_row(row) for row in rows], next_cursor
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def list_reconciliations(status: Optional[str] = None, cursor: Optional[str] = None,
+                         limit: int = LIST_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Bank reconciliations newest first, optionally with a status (e.g. pending_match)."""
+    conditions = [("status = ?", status)] if status else []
+    rows, next_cursor = _keyset_page("bank_reconciliations", "created_at", conditions, cursor, limit)
+    return [{
+        "id": row["id"],
+        "bankRef": row["bank_ref"],
+        "amountEUR": row["amount_eur"],
+        "receivedAt": row["received_at"],
+        "matchedClaimId": row["matched_claim_id"],
+        "matchedAt": row["matched_at"],
+        "status": row["status"],
+        "notes": row["notes"],
+        "createdAt": row["created_at"]
+    } for row in rows], next_cursor
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def list_webhook_events(payout_id: Optional[str] = None, cursor: Optional[str] = None,
+                        limit: int = LIST_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Logged webhook events newest first, optionally for one payout."""
+    conditions = [("payout_id = ?", payout_id)] if payout_id else []
+    rows, next_cursor = _keyset_page("webhook_events", "processed_at", conditions, cursor, limit)
+    return [{
+        "id": row["id"],
+        "eventType": row["event_type"],
+        "payoutId": row["payout_id"],
+        "providerPayoutId": row["provider_payout_id"],
+        "payload": json.loads(row["payload"]),
+        "processedAt": row["processed_at"]
+    } for row in rows], next_cursor
+
+
+# Started by main(); until then (scripts, one-off calls) writes run inline
+status_writer = db.GroupCommitWriter(STATUS_WRITER_BATCH, STATUS_WRITER_MAX_DELAY_MS)
+
+
+def write_status(fn, wait: bool = True) -> Any:
+    """
+    Run fn(conn) through the group-commit writer and, with `wait`, block
+    until it is committed and return its result. Without `wait` the write
+    is fire-and-forget (for bookkeeping that is safe to lose on a crash).
+    fn re-reads and updates conditionally (see db.GroupCommitWriter); never
+    pass it save_payout() or another full-row write of an object read earlier.
+    """
+    if not status_writer.running:
+        with db.transaction(DATABASE_FILE) as conn:
+            return fn(conn)
+    
+    future = status_writer.submit(fn)
+    if wait:
+        return future.result()
+    future.add_done_callback(_report_write_failure)
     return None
 
 
+def _report_write_failure(future):
+    if future.exception():
+        print(f"❌ Background status write failed: {future.exception()}")
+
+
 # === dLocal API Client ===
 
+class DLocalAPIError(Exception):
+    """dLocal answered with an HTTP error status."""
+    
+    def __init__(self, status: int):
+        super().__init__(f"dLocal API error: {status}")
+        self.status = status
+
+
+class HTTPConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections to a single host.
+    At most `size` requests are in flight at once; idle connections are
+    reused, so only the first request on each one pays for the TCP/TLS
+    handshake.
+    """
+    
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    
+    def __init__(self, base_url: str, size: int = DLOCAL_POOL_SIZE, timeout: float = DLOCAL_TIMEOUT):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path_prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self._ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+    
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """Send a request and return (status, body), reusing an idle connection if any."""
+        with self._slots:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._new_connection(), False
+            
+            sent = False
+            try:
+                self._send(conn, method, path, body, headers)
+                sent = True
+                response = self._read(conn)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # A stale keep-alive connection: resend on a fresh one, but a
+                # POST only if it never got out - once sent, dLocal may have
+                # acted on it and a resend could pay out twice.
+                if not reused or (sent and method not in self.IDEMPOTENT_METHODS):
+                    raise
+                conn = self._new_connection()
+                try:
+                    self._send(conn, method, path, body, headers)
+                    response = self._read(conn)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            
+            status, data, will_close = response
+            if will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return status, data
+    
+    def _send(self, conn, method, path, body, headers):
+        conn.request(method, self.path_prefix + path, body=body, headers=headers or {})
+    
+    def _read(self, conn) -> Tuple[int, bytes, bool]:
+        response = conn.getresponse()
+        return response.status, response.read(), response.will_close
+    
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
 class DLocalClient:
     """Client for dLocal Payouts API."""
     
-    def __init__(self):
-        self.base_url = DLOCAL_API_URL
-        self.api_key = DLOCAL_API_KEY
-        self.secret_key = DLOCAL_SECRET_KEY
+    def __init__(self, base_url: str = DLOCAL_API_URL, api_key: str = DLOCAL_API_KEY,
+                 secret_key: str = DLOCAL_SECRET_KEY, pool_size: int = DLOCAL_POOL_SIZE,
+                 timeout: float = DLOCAL_TIMEOUT):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.pool_size = pool_size
+        self.pool = HTTPConnectionPool(base_url, pool_size, timeout)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
     def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
         """Make authenticated request to dLocal API."""
-        import urllib.request
-        
-        url = f"{self.base_url}{endpoint}"
         headers = {
             "X-Login": self.api_key,
             "X-Trans-Key": self.secret_key,
@@ -564,15 +1087,50 @@ class DLocalClient:
         }
         
         body = json.dumps(data).encode() if data else None
-        req = urllib.request.Request(url, data=body, headers=headers, method=method)
-        
+        resource = "/" + endpoint.strip("/").split("/")[0]  # /payouts/{id} -> /payouts
+        start = time.perf_counter()
         try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                return json.loads(response.read().decode())
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode()
-            print(f"❌ dLocal API error: {e.code} - {error_body}")
-            raise Exception(f"dLocal API error: {e.code}")
+            status, response_body = self.pool.request(method, endpoint, body, headers)
+        except Exception as e:
+            DLOCAL_ERRORS.labels(method, resource, type(e).__name__).inc()
+            raise
+        finally:
+            DLOCAL_REQUEST_SECONDS.labels(method, resource).observe(time.perf_counter() - start)
+        
+        if status >= 400:
+            DLOCAL_ERRORS.labels(method, resource, str(status)).inc()
+            print(f"❌ dLocal API error: {status} - {response_body.decode(errors='replace')}")
+            raise DLocalAPIError(status)
+        return json.loads(response_body.decode())
+    
+    def _run_concurrently(self, fn, items: List) -> List[Union[Dict, Exception]]:
+        """Run fn over items on the client's thread pool; failures are returned, not raised."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="dlocal")
+        
+        def call(item):
+            try:
+                return fn(*item) if isinstance(item, tuple) else fn(item)
+            except Exception as e:
+                return e
+        
+        return list(self._executor.map(call, items))
+    
+    def create_payouts(self, payouts: List[Tuple[Recipient, float, str, str]]) -> List[Union[Dict, Exception]]:
+        """
+        Submit many payouts concurrently, each given as (recipient, amount,
+        currency, reference). Results come back in input order; a failed
+        submission yields its exception instead of a response.
+        """
+        return self._run_concurrently(self.create_payout, payouts)
+    
+    def get_payout_statuses(self, payout_ids: List[str]) -> List[Union[Dict, Exception]]:
+        """
+        Query many payout statuses concurrently, in input order. dLocal finds
+        a payout by its own ID or by our external_id (the payout ID).
+        """
+        return self._run_concurrently(self.get_payout_status, payout_ids)
     
     def create_payout(self, recipient: Recipient, amount: float, currency: str, reference: str) -> Dict:
         """Create a payout via dLocal API."""
@@ -648,15 +1206,472 @@ class DLocalClient:
 dlocal_client = DLocalClient()
 
 
+# === Payout Submission Queue ===
+
+class TokenBucket:
+    """Blocking token bucket: refills at `rate` tokens/second, holds at most `capacity`."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """Take one token, waiting for a refill if needed. False if `stop` was set while waiting."""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def new_lease_token() -> str:
+    """A token naming this worker (host, process, thread) and the lease it took."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:12]}"
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def lease_queued_payout(lease_seconds: int = PAYOUT_LEASE_SECONDS) -> Optional[Tuple[str, str]]:
+    """
+    Claim the oldest queued payout that isn't leased by another worker
+    (in this or any other process) and return (payout ID, lease token).
+    Only the holder of the token can record the submission's outcome.
+    """
+    now = datetime.utcnow()
+    lease_token = new_lease_token()
+    with db.transaction(DATABASE_FILE) as conn:
+        row = conn.execute("""
+            SELECT id FROM payouts
+            WHERE status = 'queued' AND (leased_until IS NULL OR leased_until < ?)
+            ORDER BY queued_at ASC LIMIT 1
+        """, (now.isoformat(),)).fetchone()
+        if not row:
+            return None
+        conn.execute(
+            "UPDATE payouts SET leased_until = ?, lease_token = ? WHERE id = ?",
+            ((now + timedelta(seconds=lease_seconds)).isoformat(), lease_token, row["id"])
+        )
+    return row["id"], lease_token
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def start_submissions(payout_ids: List[str], lease_token: str,
+                      lease_seconds: int = PAYOUT_LEASE_SECONDS) -> Tuple[List[str], List[str]]:
+    """
+    Renew the lease on payouts about to go to dLocal and note that their
+    submission started. Returns (new, unrecorded): payouts never sent, and
+    payouts an earlier attempt sent without recording the outcome (a crash,
+    a failed write, an expired lease), which must be reconciled with
+    dLocal first. Payouts no longer leased with `lease_token` are in neither.
+    """
+    def apply(conn) -> Tuple[List[str], List[str]]:
+        now = datetime.utcnow()
+        new, unrecorded = [], []
+        for payout_id in payout_ids:
+            row = conn.execute(
+                "SELECT submission_started_at FROM payouts WHERE id = ? AND status = 'queued' AND lease_token = ?",
+                (payout_id, lease_token)
+            ).fetchone()
+            if not row:
+                continue
+            (unrecorded if row["submission_started_at"] else new).append(payout_id)
+            conn.execute("""
+                UPDATE payouts SET leased_until = ?, submission_started_at = COALESCE(submission_started_at, ?)
+                WHERE id = ?
+            """, ((now + timedelta(seconds=lease_seconds)).isoformat(), now.isoformat(), payout_id))
+        return new, unrecorded
+    
+    return write_status(apply)
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def mark_payout_submitted(payout_id: str, provider_payout_id: Optional[str], lease_token: str) -> bool:
+    """
+    Record a successful dLocal submission. Returns False if the payout moved
+    on or its lease passed to another worker meanwhile.
+    """
+    def apply(conn) -> bool:
+        cursor = conn.execute("""
+            UPDATE payouts SET status = 'processing', provider_payout_id = ?, sent_at = ?,
+                leased_until = NULL, lease_token = NULL, submission_started_at = NULL
+            WHERE id = ? AND status = 'queued' AND lease_token = ?
+        """, (provider_payout_id, datetime.utcnow().isoformat(), payout_id, lease_token))
+        _invalidate_payout_on_commit(payout_id)
+        return cursor.rowcount == 1
+    
+    return write_status(apply)
+
+
+def record_payout_submitted(payout_id: str, provider_payout_id: Optional[str], lease_token: str,
+                            attempts: int = 3) -> bool:
+    """
+    mark_payout_submitted() for a payout dLocal has accepted, retried on
+    errors (e.g. a locked database). It must never end in mark_payout_failed():
+    that schedules a retry, i.e. a second real payout. If every attempt
+    fails the payout stays 'queued' with its submission started; whoever
+    leases it next asks dLocal for it by our payout ID (reconcile_submissions)
+    and records that instead of submitting again.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            if mark_payout_submitted(payout_id, provider_payout_id, lease_token):
+                return True
+            print(f"⚠️ Payout {payout_id} accepted by dLocal as {provider_payout_id} after its lease moved on")
+            return False
+        except Exception as e:
+            print(f"❌ Could not record submission of {payout_id} (attempt {attempt}): {e}")
+            if attempt < attempts:
+                time.sleep(0.5 * attempt)
+    print(f"🚨 Payout {payout_id} accepted by dLocal as {provider_payout_id} but not recorded")
+    return False
+
+
+def reconcile_submissions(client: "DLocalClient", payout_ids: List[str], lease_token: str) -> List[str]:
+    """
+    Look up payouts from start_submissions()' `unrecorded` list at dLocal by
+    external_id (our payout ID). Ones dLocal has are recorded as submitted;
+    the IDs returned are safe to submit because dLocal doesn't know them (404)
+    or has rejected them. On any other error the payout stays leased and is
+    checked again once the lease expires.
+    """
+    to_submit = []
+    for payout_id, result in zip(payout_ids, client.get_payout_statuses(payout_ids)):
+        if isinstance(result, DLocalAPIError) and result.status == 404:
+            to_submit.append(payout_id)
+        elif isinstance(result, Exception):
+            print(f"⚠️ Could not check payout {payout_id} with dLocal, will retry: {result}")
+        elif str(result.get("status", "")).upper() in DLOCAL_FAILED_STATUSES:
+            to_submit.append(payout_id)
+        elif record_payout_submitted(payout_id, result.get("id"), lease_token):
+            print(f"🔎 Payout {payout_id} found at dLocal as {result.get('id')}, recorded without resubmitting")
+    return to_submit
+
+
+def next_retry_at(retry_count: int) -> Optional[str]:
+    """
+    When to retry a payout that has failed after `retry_count` retries, or
+    None once PAYOUT_MAX_RETRIES is used up. The delay doubles per retry up
+    to PAYOUT_RETRY_MAX_SECONDS; half of it is random ("equal jitter") so
+    payouts that failed together don't all come back at the same moment.
+    """
+    if retry_count >= PAYOUT_MAX_RETRIES:
+        return None
+    delay = backoff_seconds(retry_count, PAYOUT_RETRY_BASE_SECONDS, PAYOUT_RETRY_MAX_SECONDS)
+    return (datetime.utcnow() + timedelta(seconds=delay)).isoformat()
+
+
+def backoff_seconds(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with equal jitter: half of min(cap, base * 2^attempt) is random."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def mark_payout_failed(payout_id: str, reason: str, lease_token: str):
+    """
+    Record a failed dLocal submission and schedule its retry, unless the
+    payout moved on or its lease passed to another worker meanwhile.
+    submission_started_at is kept: a timeout may hide an accepted payout,
+    so the retry reconciles with dLocal before submitting again.
+    """
+    def apply(conn) -> Optional[int]:
+        row = conn.execute(
+            "SELECT retry_count FROM payouts WHERE id = ? AND status = 'queued' AND lease_token = ?",
+            (payout_id, lease_token)
+        ).fetchone()
+        if not row:
+            return None
+        retry_at = next_retry_at(row["retry_count"])
+        conn.execute("""
+            UPDATE payouts SET status = ?, failure_reason = ?, next_retry_at = ?, leased_until = NULL, lease_token = NULL
+            WHERE id = ?
+        """, ("failed" if retry_at else "dead_letter", reason, retry_at, payout_id))
+        _invalidate_payout_on_commit(payout_id)
+        return None if retry_at else row["retry_count"]
+    
+    dead_after = write_status(apply)
+    if dead_after is not None:
+        print(f"🪦 Payout dead-lettered after {dead_after} retries: {payout_id}")
+
+
+class PayoutSubmissionQueue:
+    """
+    Worker pool that drains payouts with status 'queued' into dLocal.
+    The payouts table is the queue, so nothing is lost on restart: rows are
+    leased for PAYOUT_LEASE_SECONDS, and a lease left by a crashed worker
+    simply expires. Submissions across all workers go through one token
+    bucket so we stay inside dLocal's rate limits.
+    """
+    
+    def __init__(self, client: DLocalClient, workers: int = PAYOUT_QUEUE_WORKERS,
+                 rate_limit: float = DLOCAL_RATE_LIMIT, burst: int = DLOCAL_RATE_BURST):
+        self.client = client
+        self.workers = workers
+        self.rate_limiter = TokenBucket(rate_limit, burst)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"payout-queue-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+    
+    def notify(self):
+        """Wake idle workers after a payout was queued."""
+        self._wakeup.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                lease = lease_queued_payout()
+            except Exception as e:
+                print(f"❌ Payout queue lease failed: {e}")
+                lease = None
+            
+            if lease is None:
+                self._wakeup.wait(PAYOUT_QUEUE_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            
+            if not self.rate_limiter.acquire(self._stop):
+                return  # Stopping - the lease expires and another worker picks it up
+            try:
+                self._submit(*lease)
+            except Exception as e:
+                print(f"❌ Payout queue error: {lease[0]}: {e}")  # The lease expires and the payout is retried
+    
+    def _submit(self, payout_id: str, lease_token: str):
+        payout = get_payout_by_id(payout_id, use_cache=False)
+        if not payout or payout.status != "queued":
+            return
+        
+        recipient = get_recipient_by_id(payout.recipient_id)
+        if not recipient:
+            mark_payout_failed(payout.id, "Recipient not found", lease_token)
+            print(f"❌ Payout submission failed: {payout.id}: Recipient not found")
+            return
+        
+        new, unrecorded = start_submissions([payout.id], lease_token)
+        if not new and not (unrecorded and reconcile_submissions(self.client, unrecorded, lease_token)):
+            return  # Lease lost, or the payout was found at dLocal and recorded
+        
+        try:
+            result = self.client.create_payout(
+                recipient=recipient,
+                amount=payout.amount_eur,
+                currency=payout.currency_destination,
+                reference=payout.id
+            )
+        except Exception as e:
+            mark_payout_failed(payout.id, str(e), lease_token)
+            print(f"❌ Payout submission failed: {payout.id}: {e}")
+            return
+        
+        # dLocal has the payout now - failing to record that is not a failed submission
+        if record_payout_submitted(payout.id, result.get("id"), lease_token):
+            print(f"✅ Payout submitted: {payout.id} -> {result.get('id')}")
+
+
+payout_queue = PayoutSubmissionQueue(dlocal_client)
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def lease_due_retries(limit: int = PAYOUT_RETRY_BATCH_SIZE,
+                      lease_seconds: int = PAYOUT_LEASE_SECONDS) -> Tuple[List[str], str]:
+    """
+    Move up to `limit` failed payouts whose next_retry_at has passed back to
+    'queued' (counting the retry) and lease them to the caller under one
+    token. Returns (payout IDs, lease token). Reads only the due range of
+    idx_payouts_status_next_retry, however many payouts wait.
+    """
+    now = datetime.utcnow()
+    lease_token = new_lease_token()
+    with db.transaction(DATABASE_FILE) as conn:
+        ids = [row["id"] for row in conn.execute("""
+            SELECT id FROM payouts
+            WHERE status = 'failed' AND next_retry_at <= ?
+            ORDER BY next_retry_at ASC LIMIT ?
+        """, (now.isoformat(), limit))]
+        conn.executemany("""
+            UPDATE payouts SET status = 'queued', retry_count = retry_count + 1, queued_at = ?,
+                next_retry_at = NULL, failure_reason = NULL, failure_code = NULL, leased_until = ?, lease_token = ?
+            WHERE id = ?
+        """, [(now.isoformat(), (now + timedelta(seconds=lease_seconds)).isoformat(), lease_token, payout_id)
+              for payout_id in ids])
+        for payout_id in ids:
+            _invalidate_payout_on_commit(payout_id)
+    return ids, lease_token
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def seconds_until_next_retry() -> Optional[float]:
+    """Seconds until the earliest scheduled retry (an index seek), or None if none is scheduled."""
+    with db.connection(DATABASE_FILE) as conn:
+        row = conn.execute(
+            "SELECT MIN(next_retry_at) FROM payouts WHERE status = 'failed'"
+        ).fetchone()
+    if not row[0]:
+        return None
+    return max(0.0, (datetime.fromisoformat(row[0]) - datetime.utcnow()).total_seconds())
+
+
+class PayoutRetryScheduler:
+    """
+    Background thread that resubmits failed payouts once their next_retry_at
+    is due, in batches through DLocalClient.create_payouts. Shares the
+    submission queue's token bucket, so retries and fresh payouts together
+    stay inside dLocal's rate limits. If the process dies mid-batch the
+    leases expire and the queue workers submit the payouts instead.
+    """
+    
+    def __init__(self, client: DLocalClient, rate_limiter: TokenBucket,
+                 batch_size: int = PAYOUT_RETRY_BATCH_SIZE):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="payout-retry-scheduler", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                submitted = self.run_once()
+                wait = 0 if submitted >= self.batch_size else seconds_until_next_retry()
+            except Exception as e:
+                print(f"❌ Payout retry scheduler error: {e}")
+                wait = None
+            
+            if wait is None or wait > PAYOUT_RETRY_POLL_SECONDS:
+                wait = PAYOUT_RETRY_POLL_SECONDS
+            if wait > 0:
+                self._stop.wait(wait)
+    
+    def run_once(self) -> int:
+        """Resubmit one batch of due retries. Returns how many payouts were taken."""
+        payout_ids, lease_token = lease_due_retries(self.batch_size)
+        if not payout_ids:
+            return 0
+        
+        items = {}
+        for payout_id in payout_ids:
+            payout = get_payout_by_id(payout_id, use_cache=False)
+            recipient = get_recipient_by_id(payout.recipient_id) if payout else None
+            if not recipient:
+                mark_payout_failed(payout_id, "Recipient not found", lease_token)
+                continue
+            items[payout_id] = (recipient, payout.amount_eur, payout.currency_destination, payout.id)
+        
+        for _ in items:
+            if not self.rate_limiter.acquire(self._stop):
+                return len(payout_ids)  # Stopping - the leases expire and the queue takes over
+        
+        new, unrecorded = start_submissions(list(items), lease_token)
+        if unrecorded:
+            new += reconcile_submissions(self.client, unrecorded, lease_token)
+        batch = [payout_id for payout_id in payout_ids if payout_id in new]
+        results = self.client.create_payouts([items[payout_id] for payout_id in batch])
+        for payout_id, result in zip(batch, results):
+            if isinstance(result, Exception):
+                mark_payout_failed(payout_id, str(result), lease_token)
+            else:
+                record_payout_submitted(payout_id, result.get("id"), lease_token)
+        
+        failed = sum(isinstance(result, Exception) for result in results)
+        print(f"🔁 Payout retries resubmitted: {len(batch) - failed} ok, {failed} failed")
+        return len(payout_ids)
+
+
+retry_scheduler = PayoutRetryScheduler(dlocal_client, payout_queue.rate_limiter)
+
+
+def enqueue_payout(payout: Payout) -> Payout:
+    """Put a payout (back) on the submission queue and wake the workers."""
+    payout.status = "queued"
+    payout.queued_at = datetime.utcnow().isoformat()
+    payout.next_retry_at = None
+    payout.failure_reason = None
+    payout.failure_code = None
+    save_payout(payout)
+    payout_queue.notify()
+    return payout
+
+
 # === HTTP Handler ===
 
-class PayoutHandler(BaseHTTPRequestHandler):
+class PayoutHandler(KeepAliveHandler):
+    
+    def parse_request(self) -> bool:
+        self.request_started = time.perf_counter()  # After the request line arrived, so keep-alive idle time isn't counted
+        return super().parse_request()
+    
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json"):
+        super().send_body(status, body, content_type)
+        route = self._route_template(urlparse(self.path).path)
+        HTTP_REQUESTS.labels(self.command, route, str(status)).inc()
+        HTTP_REQUEST_SECONDS.labels(self.command, route, str(status)).observe(
+            time.perf_counter() - self.request_started
+        )
+    
+    def _route_template(self, path: str) -> str:
+        """The route serving a path, with IDs as placeholders (metrics labels must stay few)."""
+        if self.command == "POST":
+            if path in ("/api/recipients", "/api/recipients/lookup", "/api/payouts/lookup",
+                        "/webhooks/dlocal", "/send-email"):
+                return path
+            if path.startswith("/api/payouts/") and path.endswith("/retry"):
+                return "/api/payouts/{payoutId}/retry"
+        elif self.command == "GET":
+            if path in ("/health", "/metrics", "/api/payouts", "/api/reconciliations", "/api/webhook-events"):
+                return path
+            if path.startswith("/api/recipients/claim/"):
+                return "/api/recipients/claim/{claimId}"
+            if path.startswith("/api/payouts/claim/"):
+                return "/api/payouts/claim/{claimId}"
+            if path.startswith("/api/payouts/"):
+                return "/api/payouts/{payoutId}"
+        return "other"
     
     def do_POST(self):
         path = urlparse(self.path).path
         
         if path == "/api/recipients":
             self._handle_save_recipient()
+        elif path == "/api/recipients/lookup":
+            self._handle_lookup("recipients", get_recipients_by_claim_ids)
+        elif path == "/api/payouts/lookup":
+            self._handle_lookup("payouts", get_payouts_by_claim_ids)
         elif path == "/webhooks/dlocal":
             self._handle_dlocal_webhook()
         elif path.startswith("/api/payouts/") and path.endswith("/retry"):
@@ -671,7 +1686,20 @@ class PayoutHandler(BaseHTTPRequestHandler):
         path = urlparse(self.path).path
         
         if path == "/health":
-            self._send_response(200, {"status": "ok"})
+            self._send_response(200, {
+                "status": "ok",
+                "webhookDedup": webhook_dedup.stats(),
+                "recipientCache": recipient_cache.stats(),
+                "payoutCache": payout_cache.stats(),
+            })
+        elif path == "/metrics":
+            self.send_body(200, metrics.render().encode(), metrics.CONTENT_TYPE)
+        elif path == "/api/payouts":
+            self._handle_list("payouts", list_payouts, {"status": "status", "since": "since"}, Payout.to_dict)
+        elif path == "/api/reconciliations":
+            self._handle_list("reconciliations", list_reconciliations, {"status": "status"})
+        elif path == "/api/webhook-events":
+            self._handle_list("webhookEvents", list_webhook_events, {"payoutId": "payout_id"})
         elif path.startswith("/api/recipients/claim/"):
             claim_id = path.split("/")[-1]
             self._handle_get_recipient_by_claim(claim_id)
@@ -687,8 +1715,7 @@ class PayoutHandler(BaseHTTPRequestHandler):
     def _handle_save_recipient(self):
         """Handle POST /api/recipients - Save or update recipient."""
         try:
-            content_length = int(self.headers["Content-Length"])
-            post_data = self.rfile.read(content_length)
+            post_data = self.read_body()
             data = json.loads(post_data.decode("utf-8"))
             
             print(f"\n📥 Received recipient data for claim: {data.get('claimId')}")
@@ -737,6 +1764,61 @@ class PayoutHandler(BaseHTTPRequestHandler):
         else:
             self._send_response(404, {"error": "Payout not found"})
     
+    def _handle_lookup(self, kind: str, lookup):
+        """
+        Handle POST /api/payouts/lookup and /api/recipients/lookup - Status
+        for many claims at once. Body: {"claimIds": [...]} (at most
+        LOOKUP_MAX_CLAIMS). Responds {kind: {claimId: object}, "notFound": [...]}.
+        """
+        try:
+            data = json.loads(self.read_body().decode("utf-8") or "{}")
+            claim_ids = data.get("claimIds") if isinstance(data, dict) else None
+            if not isinstance(claim_ids, list) or not all(isinstance(c, str) for c in claim_ids):
+                self._send_response(400, {"error": "claimIds must be a list of strings"})
+                return
+            
+            claim_ids = list(dict.fromkeys(claim_ids))  # Drop duplicates, keep order
+            if len(claim_ids) > LOOKUP_MAX_CLAIMS:
+                self._send_response(400, {"error": f"At most {LOOKUP_MAX_CLAIMS} claimIds per lookup"})
+                return
+            
+            found = lookup(claim_ids) if claim_ids else {}
+            self._send_response(200, {
+                kind: {claim_id: obj.to_dict() for claim_id, obj in found.items()},
+                "notFound": [claim_id for claim_id in claim_ids if claim_id not in found],
+            })
+        
+        except Exception as e:
+            print(f"❌ Error in {kind} lookup: {e}")
+            self._send_response(400 if isinstance(e, ValueError) else 500, {"error": str(e)})
+    
+    def _handle_list(self, kind: str, list_page, filters: Dict[str, str], serialize=None):
+        """
+        Handle GET /api/payouts, /api/reconciliations and /api/webhook-events -
+        newest first, ?limit= rows per page (default LIST_PAGE_SIZE). Responds
+        {kind: [...], "nextCursor": ...}; pass nextCursor back as ?cursor= for
+        the next page (null on the last one). `filters` maps query parameters
+        to list_page() arguments.
+        """
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            limit = int(query.get("limit", [LIST_PAGE_SIZE])[0])
+            if not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {LIST_MAX_PAGE_SIZE}")
+            arguments = {name: query[param][0] for param, name in filters.items() if query.get(param)}
+            items, next_cursor = list_page(cursor=query.get("cursor", [None])[0], limit=limit, **arguments)
+        except ValueError as e:
+            self._send_response(400, {"error": str(e)})
+            return
+        except Exception as e:
+            print(f"❌ Error listing {kind}: {e}")
+            self._send_response(500, {"error": str(e)})
+            return
+        
+        if serialize:
+            items = [serialize(item) for item in items]
+        self._send_response(200, {kind: items, "nextCursor": next_cursor})
+    
     def _handle_get_payout(self, payout_id: str):
         """Handle GET /api/payouts/{payoutId}."""
         payout = get_payout_by_id(payout_id)
@@ -746,14 +1828,18 @@ class PayoutHandler(BaseHTTPRequestHandler):
             self._send_response(404, {"error": "Payout not found"})
     
     def _handle_retry_payout(self, payout_id: str):
-        """Handle POST /api/payouts/{payoutId}/retry - Retry a failed payout."""
+        """
+        Handle POST /api/payouts/{payoutId}/retry - Retry a failed payout now.
+        Also revives dead-lettered payouts. The payout is re-queued and
+        submitted by the queue workers; responds 202.
+        """
         try:
-            payout = get_payout_by_id(payout_id)
+            payout = get_payout_by_id(payout_id, use_cache=False)
             if not payout:
                 self._send_response(404, {"error": "Payout not found"})
                 return
             
-            if payout.status not in ["failed"]:
+            if payout.status not in ["failed", "dead_letter"]:
                 self._send_response(400, {"error": f"Cannot retry payout with status: {payout.status}"})
                 return
             
@@ -762,52 +1848,27 @@ class PayoutHandler(BaseHTTPRequestHandler):
                 self._send_response(400, {"error": "Recipient not found"})
                 return
             
-            # Increment retry count
+            # Increment retry count and hand over to the submission queue
             payout.retry_count += 1
-            payout.status = "queued"
-            payout.queued_at = datetime.utcnow().isoformat()
-            payout.failure_reason = None
-            payout.failure_code = None
+            enqueue_payout(payout)
+            print(f"🔁 Payout retry queued: {payout.id}")
             
-            save_payout(payout)
-            
-            # Submit to dLocal
-            try:
-                result = dlocal_client.create_payout(
-                    recipient=recipient,
-                    amount=payout.amount_eur,
-                    currency=payout.currency_destination,
-                    reference=payout.id
-                )
-                
-                payout.provider_payout_id = result.get("id")
-                payout.status = "processing"
-                payout.sent_at = datetime.utcnow().isoformat()
-                save_payout(payout)
-                
-                print(f"✅ Payout retry submitted: {payout.id} -> {payout.provider_payout_id}")
-                
-            except Exception as e:
-                payout.status = "failed"
-                payout.failure_reason = str(e)
-                save_payout(payout)
-                print(f"❌ Payout retry failed: {e}")
-            
-            self._send_response(200, payout.to_dict())
+            self._send_response(202, payout.to_dict())
             
         except Exception as e:
             print(f"❌ Error retrying payout: {e}")
             self._send_response(500, {"error": str(e)})
     
     def _handle_dlocal_webhook(self):
-        """Handle POST /webhooks/dlocal - Process dLocal webhook events."""
+        """
+        Handle POST /webhooks/dlocal - Acknowledge dLocal webhook events.
+        The event is stored in the webhook inbox with one insert and
+        acknowledged at once; the webhook processor applies it afterwards.
+        """
         try:
-            content_length = int(self.headers["Content-Length"])
-            post_data = self.rfile.read(content_length)
+            post_data = self.read_body()
             payload = json.loads(post_data.decode("utf-8"))
             
-            print(f"\n📩 Received dLocal webhook: {payload.get('type')}")
-            
             # Verify webhook signature (in production)
             # signature = self.headers.get("X-DLocal-Signature")
             # if not self._verify_webhook_signature(post_data, signature):
@@ -822,68 +1883,403 @@ class PayoutHandler(BaseHTTPRequestHandler):
                 self._send_response(400, {"error": "Missing payout ID"})
                 return
             
-            # Find our payout record
-            payout = get_payout_by_provider_id(provider_payout_id)
-            if not payout:
-                # Try by external_id
-                external_id = payout_data.get("external_id")
-                if external_id:
-                    payout = get_payout_by_id(external_id)
-            
-            if not payout:
-                print(f"⚠️ Payout not found for webhook: {provider_payout_id}")
-                self._send_response(200, {"status": "ignored"})
+            # Redeliveries we've seen recently are acknowledged without touching the DB
+            event_key = webhook_event_key(payload)
+            if webhook_dedup.seen(event_key):
+                self._send_response(200, {"status": "duplicate"})
                 return
             
-            # Update payout status based on event
-            old_status = payout.status
-            
-            if event_type in ["payout.pending", "payout.created"]:
-                payout.status = "processing"
-            elif event_type == "payout.completed":
-                payout.status = "sent"
-                payout.sent_at = datetime.utcnow().isoformat()
-            elif event_type == "payout.paid":
-                payout.status = "settled"
-                payout.settled_at = datetime.utcnow().isoformat()
-            elif event_type in ["payout.rejected", "payout.cancelled", "payout.failed"]:
-                payout.status = "failed"
-                payout.failure_reason = payout_data.get("status_detail") or payout_data.get("reject_reason")
-                payout.failure_code = payout_data.get("status_code")
-            
-            payout.webhook_last_event = event_type
-            payout.webhook_last_event_at = datetime.utcnow().isoformat()
-            
-            save_payout(payout)
-            
-            # Log webhook event
-            log_webhook_event(event_type, payout.id, provider_payout_id, payload)
-            
-            print(f"✅ Payout {payout.id} status: {old_status} -> {payout.status}")
-            
-            # Send notification email
-            if payout.status in ["sent", "settled", "failed"]:
-                self._send_payout_notification(payout)
+            try:
+                store_inbox_webhook(event_type, provider_payout_id, post_data.decode("utf-8"))
+            except Exception:
+                webhook_dedup.forget(event_key)  # Not stored - let dLocal's redelivery through
+                raise
+            webhook_processor.notify()
             
             self._send_response(200, {"status": "ok"})
             
         except Exception as e:
-            print(f"❌ Error processing webhook: {e}")
+            print(f"❌ Error receiving webhook: {e}")
             self._send_response(500, {"error": str(e)})
     
-    def _send_payout_notification(self, payout: Payout):
-        """Send email notification about payout status change."""
-        recipient = get_recipient_by_id(payout.recipient_id)
-        if not recipient:
-            return
+    def _forward_to_email_server(self):
+        """Forward email requests to the email sending logic."""
+        # This is a simplified version - in production, reuse email_server.py logic
+        self._send_response(200, {"status": "ok", "message": "Email queued"})
+    
+    def _verify_webhook_signature(self, payload: bytes, signature: str) -> bool:
+        """Verify dLocal webhook signature."""
+        if not DLOCAL_WEBHOOK_SECRET or not signature:
+            return True  # Skip verification in development
         
-        if payout.status == "sent":
-            subject = "Your compensation payment is on the way!"
-            body = f"""Dear {recipient.first_name},
+        expected = hmac.new(
+            DLOCAL_WEBHOOK_SECRET.encode(),
+            payload,
+            hashlib.sha256
+        ).hexdigest()
+        
+        return hmac.compare_digest(expected, signature)
+    
+    def _send_response(self, status: int, data: Dict):
+        """Send JSON response (with Content-Length, so the connection can be reused)."""
+        self.send_body(status, json.dumps(data).encode())
+    
+    def log_message(self, format, *args):
+        # Suppress default logging
+        pass
+
 
-Great news! Your compensation payment of €{payout.amount_eur:.2f} has been sent to your bank account.
+@metrics.timed(DB_QUERY_SECONDS)
+def log_webhook_event(event_type: str, payout_id: str, provider_payout_id: str, payload: Dict,
+                      event_key: Optional[str] = None) -> bool:
+    """
+    Log webhook event to database. Returns False, without logging, if an
+    event with the same event_key was logged before.
+    """
+    with db.transaction(DATABASE_FILE) as conn:
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO webhook_events
+            (id, event_type, payout_id, provider_payout_id, payload, processed_at, event_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            str(uuid.uuid4()),
+            event_type,
+            payout_id,
+            provider_payout_id,
+            json.dumps(payload),
+            datetime.utcnow().isoformat(),
+            event_key
+        ))
+    return cursor.rowcount == 1
 
-Bank Account: {recipient.iban[:4]}...{recipient.iban[-4:] if recipient.iban else 'N/A'}
+
+# === Webhook Processing ===
+
+# Event types process_webhook_event acts on (anything else is "other" in metrics)
+WEBHOOK_EVENT_TYPES = {
+    "payout.pending", "payout.created", "payout.completed", "payout.paid",
+    "payout.rejected", "payout.cancelled", "payout.failed",
+}
+
+# Payout status each event moves a payout to, and the statuses it may move it from.
+# Anything else (a queued retry, a settled payout) means the event is stale.
+WEBHOOK_EVENT_STATUS = {
+    "payout.pending": "processing", "payout.created": "processing",
+    "payout.completed": "sent", "payout.paid": "settled",
+    "payout.rejected": "failed", "payout.cancelled": "failed", "payout.failed": "failed",
+}
+WEBHOOK_ALLOWED_FROM = {
+    "processing": ("processing",),
+    "sent": ("processing",),
+    "settled": ("processing", "sent"),
+    "failed": ("processing", "sent"),
+}
+
+# Fields that identify one delivery attempt's event, in order of preference
+WEBHOOK_EVENT_ID_FIELDS = ("event_id", "id", "created_date", "timestamp")
+WEBHOOK_EVENT_DATA_FIELDS = ("event_id", "status_date", "updated_date", "created_date")
+
+
+def webhook_event_key(payload: Dict) -> str:
+    """
+    Identity of a dLocal event: provider payout ID, event type and the
+    event's ID or timestamp. Redeliveries of one event share the key. If
+    the payload carries neither, a hash of its content is used instead.
+    """
+    data = payload.get("data", {})
+    ident = next((str(payload[f]) for f in WEBHOOK_EVENT_ID_FIELDS if payload.get(f)), None)
+    if ident is None:
+        ident = next((str(data[f]) for f in WEBHOOK_EVENT_DATA_FIELDS if data.get(f)), None)
+    if ident is None:
+        ident = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+    return f"{data.get('id')}:{payload.get('type', 'unknown')}:{ident}"
+
+
+class WebhookDeduplicator:
+    """
+    Bounded LRU set of recently seen webhook event keys, with hit counters.
+    Only a fast path: the unique index on webhook_events.event_key catches
+    duplicates that have fallen out of the cache or arrive after a restart.
+    """
+    
+    def __init__(self, size: int = WEBHOOK_DEDUP_CACHE_SIZE):
+        self.size = size
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.events = 0
+        self.cache_hits = 0
+        self.db_hits = 0
+    
+    def seen(self, key: str) -> bool:
+        """Record an incoming event; True if it was seen recently."""
+        with self._lock:
+            self.events += 1
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.cache_hits += 1
+                return True
+            self._keys[key] = None
+            if len(self._keys) > self.size:
+                self._keys.popitem(last=False)
+            return False
+    
+    def forget(self, key: str):
+        with self._lock:
+            self._keys.pop(key, None)
+    
+    def record_db_duplicate(self):
+        with self._lock:
+            self.db_hits += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            duplicates = self.cache_hits + self.db_hits
+            return {
+                "events": self.events,
+                "duplicates": duplicates,
+                "cacheHits": self.cache_hits,
+                "dbHits": self.db_hits,
+                "hitRate": round(duplicates / self.events, 4) if self.events else 0.0,
+                "cacheSize": len(self._keys),
+            }
+
+
+webhook_dedup = WebhookDeduplicator()
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def store_inbox_webhook(event_type: str, provider_payout_id: str, payload: str):
+    """Append a received webhook to the inbox (a single autocommitted insert)."""
+    with db.connection(DATABASE_FILE) as conn:
+        conn.execute("""
+            INSERT INTO webhook_inbox (event_type, provider_payout_id, payload, received_at)
+            VALUES (?, ?, ?, ?)
+        """, (event_type, provider_payout_id, payload, datetime.utcnow().isoformat()))
+
+
+def mark_inbox_webhook_processed(seq: int, error: Optional[str] = None):
+    # Not awaited: if it's lost, the event is processed again and deduplicated
+    write_status(lambda conn: conn.execute(
+        "UPDATE webhook_inbox SET processed_at = ?, error = ? WHERE seq = ?",
+        (datetime.utcnow().isoformat(), error, seq)
+    ), wait=False)
+
+
+def process_webhook_event(event_type: str, payload: Dict):
+    """
+    Apply one dLocal webhook event to its payout and notify the customer.
+    The payout is re-read and updated inside the status write, and only if
+    the event is for its current provider payout ID and the change is
+    allowed from its current status (WEBHOOK_ALLOWED_FROM). A late event
+    for an earlier submission cannot undo a queued retry or a settlement.
+    """
+    print(f"\n📩 Processing dLocal webhook: {event_type}")
+    
+    payout_data = payload.get("data", {})
+    provider_payout_id = payout_data.get("id")
+    new_status = WEBHOOK_EVENT_STATUS.get(event_type)
+    
+    # Find our payout record
+    payout = get_payout_by_provider_id(provider_payout_id)
+    if not payout:
+        # Try by external_id
+        external_id = payout_data.get("external_id")
+        if external_id:
+            payout = get_payout_by_id(external_id, use_cache=False)
+    
+    if not payout:
+        print(f"⚠️ Payout not found for webhook: {provider_payout_id}")
+        return
+    
+    failure_reason = payout_data.get("status_detail") or payout_data.get("reject_reason")
+    
+    # Built up front, for the status the event asks for, so the writer thread
+    # only writes; apply() queues it only if that status is what gets written.
+    # A broken email must not cost us the status change, so it is skipped instead.
+    notification = None
+    if new_status:
+        draft = copy.copy(payout)
+        draft.status = new_status
+        draft.failure_reason = failure_reason
+        try:
+            notification = build_payout_notification(draft)
+        except Exception as e:
+            print(f"❌ Could not build notification for payout {payout.id}: {e}")
+    
+    def apply(conn) -> Optional[Tuple[str, Optional[str], int]]:
+        # Logging first: a redelivered event hits the unique key and changes nothing
+        if not log_webhook_event(event_type, payout.id, provider_payout_id, payload,
+                                 event_key=webhook_event_key(payload)):
+            return None
+        row = conn.execute(
+            "SELECT status, provider_payout_id, retry_count FROM payouts WHERE id = ?", (payout.id,)
+        ).fetchone()
+        if not new_status or row["provider_payout_id"] != provider_payout_id:
+            return row["status"], None, row["retry_count"]
+        
+        now = datetime.utcnow().isoformat()
+        changes = {"status": new_status, "webhook_last_event": event_type, "webhook_last_event_at": now}
+        if new_status == "sent":
+            changes["sent_at"] = now
+        elif new_status == "settled":
+            changes["settled_at"] = now
+        elif new_status == "failed":
+            changes["next_retry_at"] = next_retry_at(row["retry_count"])
+            if changes["next_retry_at"] is None:
+                changes["status"] = "dead_letter"
+            changes["failure_reason"] = failure_reason
+            changes["failure_code"] = payout_data.get("status_code")
+        
+        allowed = WEBHOOK_ALLOWED_FROM[new_status]
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        placeholders = ", ".join("?" * len(allowed))
+        cursor = conn.execute(f"""
+            UPDATE payouts SET {assignments}
+            WHERE id = ? AND provider_payout_id = ? AND status IN ({placeholders})
+        """, (*changes.values(), payout.id, provider_payout_id, *allowed))
+        if cursor.rowcount == 0:
+            return row["status"], None, row["retry_count"]
+        _invalidate_payout_on_commit(payout.id, payout.claim_id)
+        if notification and changes["status"] == new_status:
+            queue_notification(conn, payout.id, *notification)
+        return row["status"], changes["status"], row["retry_count"]
+    
+    # Waits for the commit: the next event for this payout reads this state
+    result = write_status(apply)
+    if result is None:
+        webhook_dedup.record_db_duplicate()
+        print(f"♻️ Duplicate webhook ignored: {event_type} for {payout.id}")
+        return
+    
+    old_status, status, retry_count = result
+    if status is None:
+        print(f"⏭️ Stale webhook ignored: {event_type} ({provider_payout_id}) for {payout.id}, now {old_status}")
+        return
+    if status == "dead_letter":
+        print(f"🪦 Payout dead-lettered after {retry_count} retries: {payout.id}")
+    print(f"✅ Payout {payout.id} status: {old_status} -> {status}")
+    
+    if notification and status == new_status:
+        notification_dispatcher.notify()
+
+
+class WebhookProcessor:
+    """
+    Applies webhooks from the inbox in arrival order per payout.
+    A dispatcher thread reads unprocessed inbox rows in sequence order and
+    routes each to a worker chosen by its provider payout ID, so all events
+    for one payout are handled by the same worker, one after another,
+    while different payouts are processed in parallel. Rows stay in the
+    inbox until processed, so events received before a restart are picked
+    up on the next start.
+    """
+    
+    def __init__(self, workers: int = WEBHOOK_WORKERS, batch_size: int = WEBHOOK_DISPATCH_BATCH):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+    
+    def start(self):
+        self._stop.clear()
+        self._queues = [queue.Queue() for _ in range(self.workers)]
+        for i, work in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(work,), name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        dispatcher = threading.Thread(target=self._dispatch, name="webhook-dispatcher", daemon=True)
+        dispatcher.start()
+        self._threads.append(dispatcher)
+    
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wakeup.set()
+        for work in self._queues:
+            work.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+    
+    def notify(self):
+        """Wake the dispatcher after a webhook was stored."""
+        self._wakeup.set()
+    
+    def _dispatch(self):
+        last_seq = 0
+        while not self._stop.is_set():
+            try:
+                with db.connection(DATABASE_FILE) as conn:
+                    rows = conn.execute("""
+                        SELECT seq, event_type, provider_payout_id, payload FROM webhook_inbox
+                        WHERE processed_at IS NULL AND seq > ?
+                        ORDER BY seq LIMIT ?
+                    """, (last_seq, self.batch_size)).fetchall()
+            except Exception as e:
+                print(f"❌ Webhook inbox read failed: {e}")
+                rows = []
+            
+            for row in rows:
+                self._queues[hash(row["provider_payout_id"]) % self.workers].put(row)
+                last_seq = row["seq"]
+            
+            if len(rows) < self.batch_size:
+                self._wakeup.wait(WEBHOOK_POLL_SECONDS)
+                self._wakeup.clear()
+    
+    def _work(self, work: queue.Queue):
+        while True:
+            row = work.get()
+            if row is None:
+                return
+            error = None
+            event_type = row["event_type"] if row["event_type"] in WEBHOOK_EVENT_TYPES else "other"
+            for attempt in range(1, WEBHOOK_MAX_ATTEMPTS + 1):
+                start = time.perf_counter()
+                try:
+                    process_webhook_event(row["event_type"], json.loads(row["payload"]))
+                    WEBHOOK_PROCESSING_SECONDS.labels(event_type, "ok").observe(time.perf_counter() - start)
+                    error = None
+                    break
+                except Exception as e:
+                    WEBHOOK_PROCESSING_SECONDS.labels(event_type, "error").observe(time.perf_counter() - start)
+                    error = str(e)
+                    print(f"❌ Error processing webhook {row['seq']} (attempt {attempt}): {e}")
+                    if self._stop.wait(0.1 * attempt):
+                        return  # Stopping - left unprocessed for the next start
+            try:
+                mark_inbox_webhook_processed(row["seq"], error)
+            except Exception as e:
+                print(f"❌ Failed to mark webhook {row['seq']} processed: {e}")
+
+
+webhook_processor = WebhookProcessor()
+
+
+# === Notification Outbox ===
+
+def build_payout_notification(payout: Payout) -> Optional[Tuple[str, str, str]]:
+    """(to, subject, body) of the email for a payout status change, or None if none is due."""
+    if payout.status not in ["sent", "settled", "failed"]:
+        return None
+    recipient = get_recipient_by_id(payout.recipient_id)
+    if not recipient:
+        return None
+    
+    if payout.status == "sent":
+        if recipient.iban:
+            account = f"Bank Account: {recipient.iban[:4]}...{recipient.iban[-4:]}"
+        elif recipient.card_last4:
+            account = f"Card: ending in {recipient.card_last4}"
+        else:
+            account = "Bank Account: N/A"
+        subject = "Your compensation payment is on the way!"
+        body = f"""Dear {recipient.first_name},
+
+Great news! Your compensation payment of €{payout.amount_eur:.2f} has been sent to your {'bank account' if recipient.iban or not recipient.card_last4 else 'card'}.
+
+{account}
 Expected Arrival: 1-3 business days
 
 You will receive another notification when the payment is confirmed in your account.
@@ -893,9 +2289,9 @@ Thank you for using FlightCompensation.
 Best regards,
 FlightCompensation Team
 """
-        elif payout.status == "settled":
-            subject = "Your compensation has been received!"
-            body = f"""Dear {recipient.first_name},
+    elif payout.status == "settled":
+        subject = "Your compensation has been received!"
+        body = f"""Dear {recipient.first_name},
 
 Your compensation payment of €{payout.amount_eur:.2f} has been successfully deposited into your bank account.
 
@@ -906,9 +2302,9 @@ Thank you for choosing FlightCompensation.
 Best regards,
 FlightCompensation Team
 """
-        elif payout.status == "failed":
-            subject = "Action needed: Payment issue"
-            body = f"""Dear {recipient.first_name},
+    elif payout.status == "failed":
+        subject = "Action needed: Payment issue"
+        body = f"""Dear {recipient.first_name},
 
 Unfortunately, we encountered an issue sending your compensation payment of €{payout.amount_eur:.2f}.
 
@@ -921,83 +2317,239 @@ If you need assistance, please contact our support team.
 Best regards,
 FlightCompensation Team
 """
-        else:
-            return
-        
-        # Send email via email server
-        try:
-            import urllib.request
-            email_data = {
-                "to": recipient.email,
-                "subject": subject,
-                "body": body
-            }
-            req = urllib.request.Request(
-                EMAIL_SERVER_URL,
-                data=json.dumps(email_data).encode(),
-                headers={"Content-Type": "application/json"},
-                method="POST"
-            )
-            urllib.request.urlopen(req, timeout=10)
-            print(f"📧 Notification sent to {recipient.email}")
-        except Exception as e:
-            print(f"⚠️ Failed to send notification: {e}")
     
-    def _forward_to_email_server(self):
-        """Forward email requests to the email sending logic."""
-        # This is a simplified version - in production, reuse email_server.py logic
-        self._send_response(200, {"status": "ok", "message": "Email queued"})
+    return recipient.email, subject, body
+
+
+def queue_notification(conn: sqlite3.Connection, payout_id: str, to: str, subject: str, body: str):
+    """Add an email to the outbox, inside the caller's transaction."""
+    now = datetime.utcnow().isoformat()
+    conn.execute("""
+        INSERT INTO notification_outbox (id, payout_id, email_to, subject, body, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (str(uuid.uuid4()), payout_id, to, subject, body, now, now))
+
+
+@metrics.timed(DB_QUERY_SECONDS)
+def lease_due_notifications(limit: int = NOTIFICATION_BATCH_SIZE) -> List[sqlite3.Row]:
+    """Take up to `limit` due outbox emails, pushing their next attempt out by the lease time."""
+    now = datetime.utcnow()
+    with db.transaction(DATABASE_FILE) as conn:
+        rows = conn.execute("""
+            SELECT id, email_to, subject, body, attempts FROM notification_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at LIMIT ?
+        """, (now.isoformat(), limit)).fetchall()
+        lease_until = (now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)).isoformat()
+        conn.executemany(
+            "UPDATE notification_outbox SET next_attempt_at = ? WHERE id = ?",
+            [(lease_until, row["id"]) for row in rows]
+        )
+    return rows
+
+
+class NotificationDispatcher:
+    """
+    Background thread that drains the notification outbox into the email
+    server. Due emails are taken in batches and sent concurrently over
+    keep-alive connections. A failed send is retried with exponential
+    backoff; after NOTIFICATION_MAX_ATTEMPTS, or when the email server
+    rejects the request (4xx), the email is marked 'failed'.
+    """
     
-    def _verify_webhook_signature(self, payload: bytes, signature: str) -> bool:
-        """Verify dLocal webhook signature."""
-        if not DLOCAL_WEBHOOK_SECRET or not signature:
-            return True  # Skip verification in development
-        
-        expected = hmac.new(
-            DLOCAL_WEBHOOK_SECRET.encode(),
-            payload,
-            hashlib.sha256
-        ).hexdigest()
-        
-        return hmac.compare_digest(expected, signature)
+    def __init__(self, workers: int = NOTIFICATION_WORKERS, batch_size: int = NOTIFICATION_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool: Optional[HTTPConnectionPool] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
     
-    def _send_response(self, status: int, data: Dict):
-        """Send JSON response."""
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+    def start(self):
+        self._stop.clear()
+        self._pool = HTTPConnectionPool(EMAIL_SERVER_URL, size=self.workers, timeout=NOTIFICATION_TIMEOUT)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notification")
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
     
-    def log_message(self, format, *args):
-        # Suppress default logging
-        pass
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        if self._pool:
+            self._pool.close()
+    
+    def notify(self):
+        """Wake the dispatcher after an email was queued."""
+        self._wakeup.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except Exception as e:
+                print(f"❌ Notification dispatcher error: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                self._wakeup.wait(NOTIFICATION_POLL_SECONDS)
+                self._wakeup.clear()
+    
+    def run_once(self) -> int:
+        """Send one batch of due emails. Returns how many were attempted."""
+        rows = lease_due_notifications(self.batch_size)
+        if rows:
+            results = list(self._executor.map(self._send, rows))
+            write_status(lambda conn: self._record_results(conn, rows, results))
+        return len(rows)
+    
+    def _send(self, row: sqlite3.Row) -> Tuple[bool, Optional[str]]:
+        """Returns (retryable, error); error is None on success."""
+        body = json.dumps({"to": row["email_to"], "subject": row["subject"], "body": row["body"]})
+        try:
+            status, _ = self._pool.request("POST", "", body.encode(), {"Content-Type": "application/json"})
+        except Exception as e:
+            return True, str(e)
+        if status >= 500:
+            return True, f"Email server error: {status}"
+        if status >= 400:
+            return False, f"Email rejected: {status}"
+        return False, None
+    
+    def _record_results(self, conn: sqlite3.Connection, rows: List[sqlite3.Row],
+                        results: List[Tuple[bool, Optional[str]]]):
+        now = datetime.utcnow()
+        for row, (retryable, error) in zip(rows, results):
+            # Re-read: the lease may have expired and another dispatcher recorded this email first
+            current = conn.execute(
+                "SELECT attempts FROM notification_outbox WHERE id = ? AND status = 'pending'", (row["id"],)
+            ).fetchone()
+            if not current:
+                continue
+            attempts = current["attempts"] + 1
+            if error is None:
+                conn.execute(
+                    "UPDATE notification_outbox SET status = 'sent', attempts = ?, sent_at = ? WHERE id = ?",
+                    (attempts, now.isoformat(), row["id"])
+                )
+                print(f"📧 Notification sent to {row['email_to']}")
+            elif retryable and attempts < NOTIFICATION_MAX_ATTEMPTS:
+                delay = backoff_seconds(attempts - 1, NOTIFICATION_RETRY_BASE_SECONDS, NOTIFICATION_RETRY_MAX_SECONDS)
+                conn.execute(
+                    "UPDATE notification_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, (now + timedelta(seconds=delay)).isoformat(), error, row["id"])
+                )
+                print(f"⚠️ Failed to send notification (attempt {attempts}), retrying: {error}")
+            else:
+                conn.execute(
+                    "UPDATE notification_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, row["id"])
+                )
+                print(f"❌ Notification to {row['email_to']} given up: {error}")
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+# === Server ===
+
+class SerialHTTPServer(HTTPServer):
+    """
+    HTTPServer for --workers 1: serves one connection at a time, so keep-alive
+    is off - an idle connection would hold up the accept loop for
+    KEEPALIVE_TIMEOUT seconds.
+    """
+    
+    keep_alive = False
 
 
-def log_webhook_event(event_type: str, payout_id: str, provider_payout_id: str, payload: Dict):
-    """Log webhook event to database."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer that hands each connection to a bounded pool of worker threads.
+    A slow dLocal call or notification POST only ties up one worker instead of
+    blocking every other request. When all workers are busy the accept loop
+    waits, so excess connections queue in the listen backlog.
+    
+    A keep-alive connection keeps its worker while it waits for the next
+    request. When a new connection finds every worker taken, the connection
+    that has been idle longest is closed to free its worker, so idle clients
+    can't hold off webhook deliveries.
+    """
+    
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, workers: int):
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payout-worker")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._idle: "OrderedDict[Any, None]" = OrderedDict()  # Idle keep-alive sockets, longest idle first
+        self._idle_lock = threading.Lock()
+    
+    def connection_idle(self, request, idle: bool):
+        """Called by KeepAliveHandler while a connection waits for its next request."""
+        with self._idle_lock:
+            if idle:
+                self._idle[request] = None
+            else:
+                self._idle.pop(request, None)
+    
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._close_idle_connection()
+            self._slots.acquire()
+        self._executor.submit(self._process_request_in_worker, request, client_address)
     
-    cursor.execute("""
-        INSERT INTO webhook_events (id, event_type, payout_id, provider_payout_id, payload, processed_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        str(uuid.uuid4()),
-        event_type,
-        payout_id,
-        provider_payout_id,
-        json.dumps(payload),
-        datetime.utcnow().isoformat()
-    ))
+    def _close_idle_connection(self):
+        with self._idle_lock:
+            if not self._idle:
+                return  # Every worker is busy with a request - wait for one
+            request, _ = self._idle.popitem(last=False)
+        try:
+            request.shutdown(socket.SHUT_RDWR)  # Its handler's readline() returns EOF and the worker frees up
+        except OSError:
+            pass
+    
+    def _process_request_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.connection_idle(request, False)
+            self.shutdown_request(request)
+            self._slots.release()
     
-    conn.commit()
-    conn.close()
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def create_server(port: int = PORT, workers: int = SERVER_WORKERS) -> HTTPServer:
+    """Create the payout HTTP server, pooled unless workers <= 1."""
+    if workers <= 1:
+        return SerialHTTPServer(("", port), PayoutHandler)
+    return PooledHTTPServer(("", port), PayoutHandler, workers)
 
 
 # === Main ===
 
 def main():
+    workers = SERVER_WORKERS
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    
     init_database()
+    status_writer.start(DATABASE_FILE)
+    webhook_processor.start()
+    notification_dispatcher.start()
+    payout_queue.start()
+    if PAYOUT_QUEUE_WORKERS > 0:
+        retry_scheduler.start()
     
     print("=" * 50)
     print("🚀 Flighty Compensation Payout Server")
@@ -1005,21 +2557,38 @@ def main():
     print(f"📡 Listening on: http://localhost:{PORT}")
     print(f"💳 dLocal API: {DLOCAL_API_URL}")
     print(f"🔑 dLocal configured: {'Yes' if DLOCAL_API_KEY else 'No (sandbox mode)'}")
+    print(f"🧵 Workers: {workers if workers > 1 else '1 (single-threaded)'}")
+    rate = f"{DLOCAL_RATE_LIMIT:g}/s" if DLOCAL_RATE_LIMIT > 0 else "unlimited"
+    print(f"📤 Payout queue: {PAYOUT_QUEUE_WORKERS} workers, dLocal rate {rate}")
+    print(f"🔁 Automatic retries: up to {PAYOUT_MAX_RETRIES} per payout")
+    print(f"🗃️  Object cache: {MODEL_CACHE_SIZE} recipients/payouts each, {MODEL_CACHE_TTL_SECONDS:g}s TTL")
     print("\nEndpoints:")
     print(f"  POST http://localhost:{PORT}/api/recipients")
     print(f"  GET  http://localhost:{PORT}/api/recipients/claim/{{claimId}}")
     print(f"  GET  http://localhost:{PORT}/api/payouts/claim/{{claimId}}")
+    print(f"  POST http://localhost:{PORT}/api/recipients/lookup  (claimIds, max {LOOKUP_MAX_CLAIMS})")
+    print(f"  POST http://localhost:{PORT}/api/payouts/lookup     (claimIds, max {LOOKUP_MAX_CLAIMS})")
+    print(f"  GET  http://localhost:{PORT}/api/payouts?status=&since=&cursor=")
+    print(f"  GET  http://localhost:{PORT}/api/reconciliations?status=&cursor=")
+    print(f"  GET  http://localhost:{PORT}/api/webhook-events?payoutId=&cursor=")
     print(f"  POST http://localhost:{PORT}/api/payouts/{{payoutId}}/retry")
     print(f"  POST http://localhost:{PORT}/webhooks/dlocal")
     print(f"  GET  http://localhost:{PORT}/health")
+    print(f"  GET  http://localhost:{PORT}/metrics")
     print("\nPress Ctrl+C to stop.\n")
     
-    server = HTTPServer(("", PORT), PayoutHandler)
+    server = create_server(PORT, workers)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n\n👋 Shutting down server.")
-        server.shutdown()
+    finally:
+        retry_scheduler.stop()
+        payout_queue.stop()
+        webhook_processor.stop()
+        notification_dispatcher.stop()
+        status_writer.stop()
+        server.server_close()
 
 
 if __name__ == "__main__":
@@ -15,26 +15,36 @@ Or via cron (daily at 9 AM):
 """
 
 import os
-import json
 import csv
 import uuid
 import re
-import sqlite3
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Set, Tuple
+
+import db
 
 DATABASE_FILE = "payouts.db"
 STATEMENTS_DIR = "bank_statements"
 PAYOUT_DELAY_HOURS = 48  # Wait 48 hours after receiving funds before payout
+INGEST_WORKERS = 1  # Parser processes for statement ingestion (--workers N)
+INGEST_COMMIT_ROWS = 10_000  # Rows per write transaction, so a big statement doesn't lock out the payout server
 
-# Payout server URL
-PAYOUT_SERVER_URL = "http://localhost:8080"
+# Amount/date second-pass matching
+AUTO_MATCH_WINDOW_DAYS = 14  # Match credits arriving within ± this many days of the expected date
+AUTO_MATCH_MIN_MARGIN = 0.2  # Best candidate must beat the runner-up's score by this much
 
 
 # === Database Operations ===
 
-def get_db_connection():
-    return sqlite3.connect(DATABASE_FILE)
+def ensure_schema():
+    """Apply any pending payouts.db migrations (shared with the payout server)."""
+    from payout_server import MIGRATIONS
+    db.migrate(DATABASE_FILE, MIGRATIONS)
 
 
 def save_reconciliation(
@@ -45,91 +55,143 @@ def save_reconciliation(
     status: str = "pending_match"
 ) -> str:
     """Save a bank reconciliation record."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     rec_id = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
     
-    cursor.execute("""
-        INSERT INTO bank_reconciliations 
-        (id, bank_ref, amount_eur, received_at, matched_claim_id, matched_at, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        rec_id, bank_ref, amount_eur, received_at,
-        matched_claim_id,
-        now if matched_claim_id else None,
-        status, now
-    ))
-    
-    conn.commit()
-    conn.close()
+    with db.transaction(DATABASE_FILE) as conn:
+        conn.execute("""
+            INSERT INTO bank_reconciliations 
+            (id, bank_ref, amount_eur, received_at, matched_claim_id, matched_at, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            rec_id, bank_ref, amount_eur, received_at,
+            matched_claim_id,
+            now if matched_claim_id else None,
+            status, now
+        ))
+    
     return rec_id
 
 
+def save_reconciliations(rows: Iterable[Tuple], ingest_batch: Optional[str] = None) -> int:
+    """
+    Bulk-insert reconciliation rows in a single transaction.
+    Each row is (id, bank_ref, amount_eur, received_at, matched_claim_id,
+    matched_at, status, notes, created_at). With an ingest_batch the rows are
+    stored as 'importing' under it until publish_ingest_batch(). Returns the
+    number of rows inserted.
+    """
+    if ingest_batch:
+        rows = ((*row[:6], 'importing', *row[7:]) for row in rows)
+    with db.transaction(DATABASE_FILE) as conn:
+        cursor = conn.executemany("""
+            INSERT INTO bank_reconciliations 
+            (id, bank_ref, amount_eur, received_at, matched_claim_id, matched_at, status, notes, created_at,
+             ingest_batch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ((*row, ingest_batch) for row in rows))
+        return cursor.rowcount
+
+
+def publish_ingest_batch(ingest_batch: str):
+    """
+    Make an imported file's rows live: 'importing' becomes 'matched' or
+    'pending_match' (as reconcile_transactions decided, by matched_claim_id)
+    and the batch marker is cleared, INGEST_COMMIT_ROWS rows per transaction.
+    """
+    while True:
+        with db.transaction(DATABASE_FILE) as conn:
+            cursor = conn.execute("""
+                UPDATE bank_reconciliations
+                SET status = CASE WHEN matched_claim_id IS NULL THEN 'pending_match' ELSE 'matched' END,
+                    ingest_batch = NULL
+                WHERE rowid IN (SELECT rowid FROM bank_reconciliations WHERE ingest_batch = ? LIMIT ?)
+            """, (ingest_batch, INGEST_COMMIT_ROWS))
+        if cursor.rowcount < INGEST_COMMIT_ROWS:
+            return
+
+
+def discard_ingest_batches(ingest_batch: Optional[str] = None) -> int:
+    """
+    Delete the rows of a failed import, or with no batch given those of every
+    import a crash left unfinished (only one ingestion job runs at a time),
+    INGEST_COMMIT_ROWS rows per transaction. Returns how many were deleted.
+    """
+    condition = "ingest_batch = ?" if ingest_batch else "ingest_batch IS NOT NULL"
+    params = (ingest_batch,) if ingest_batch else ()
+    deleted = 0
+    while True:
+        with db.transaction(DATABASE_FILE) as conn:
+            cursor = conn.execute(f"""
+                DELETE FROM bank_reconciliations
+                WHERE rowid IN (SELECT rowid FROM bank_reconciliations WHERE {condition} LIMIT ?)
+            """, (*params, INGEST_COMMIT_ROWS))
+        deleted += cursor.rowcount
+        if cursor.rowcount < INGEST_COMMIT_ROWS:
+            return deleted
+
+
+def load_known_bank_refs() -> Set[str]:
+    """All bank references already recorded, for in-memory dedup during ingestion."""
+    with db.connection(DATABASE_FILE) as conn:
+        return {row[0] for row in conn.execute("SELECT bank_ref FROM bank_reconciliations")}
+
+
+def load_verified_claim_ids() -> Set[str]:
+    """Claim IDs that have a verified recipient, for in-memory matching during ingestion."""
+    with db.connection(DATABASE_FILE) as conn:
+        return {row[0] for row in conn.execute("SELECT claim_id FROM recipients WHERE status = 'verified'")}
+
+
+def save_expected_compensation(claim_id: str, amount_eur: float, expected_at: str):
+    """Record the compensation we expect AESA to transfer for a claim, and roughly when."""
+    with db.transaction(DATABASE_FILE) as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO expected_compensations (claim_id, amount_eur, expected_at, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (claim_id, amount_eur, expected_at, datetime.utcnow().isoformat()))
+
+
+def load_expected_compensations() -> List[Tuple[str, float, str]]:
+    """
+    Expected compensations still waiting for funds: (claim_id, amount_eur,
+    expected_at) for claims with a verified recipient and no matched transfer.
+    """
+    with db.connection(DATABASE_FILE) as conn:
+        return [tuple(row) for row in conn.execute("""
+            SELECT e.claim_id, e.amount_eur, e.expected_at
+            FROM expected_compensations e
+            JOIN recipients r ON r.claim_id = e.claim_id AND r.status = 'verified'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bank_reconciliations b
+                WHERE b.matched_claim_id = e.claim_id AND b.status NOT IN ('pending_match', 'importing')
+            )
+        """)]
+
+
 def get_pending_reconciliations() -> List[Dict]:
     """Get reconciliations that haven't been paid out yet."""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM bank_reconciliations 
-        WHERE status = 'matched' AND matched_claim_id IS NOT NULL
-        ORDER BY received_at ASC
-    """)
-    
-    rows = cursor.fetchall()
-    conn.close()
+    with db.connection(DATABASE_FILE) as conn:
+        rows = conn.execute("""
+            SELECT * FROM bank_reconciliations 
+            WHERE status = 'matched' AND matched_claim_id IS NOT NULL
+            ORDER BY received_at ASC
+        """).fetchall()
     
     return [dict(row) for row in rows]
 
 
 def update_reconciliation_status(rec_id: str, status: str, notes: Optional[str] = None):
     """Update reconciliation status."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    if notes:
-        cursor.execute("""
-            UPDATE bank_reconciliations SET status = ?, notes = ? WHERE id = ?
-        """, (status, notes, rec_id))
-    else:
-        cursor.execute("""
-            UPDATE bank_reconciliations SET status = ? WHERE id = ?
-        """, (status, rec_id))
-    
-    conn.commit()
-    conn.close()
-
-
-def get_claim_by_reference(reference: str) -> Optional[Dict]:
-    """
-    Look up claim by AESA reference number.
-    In production, this would query Firebase/Firestore.
-    For now, we simulate by extracting claim ID from reference pattern.
-    """
-    # Expected patterns:
-    # - AESA-2024-CLAIM123
-    # - FC-CLAIM123-COMPENSATION
-    # - Direct claim ID: CLAIM123
-    
-    patterns = [
-        r'FC-([A-Z0-9]+)-COMPENSATION',
-        r'AESA-\d{4}-([A-Z0-9]+)',
-        r'CLAIM([A-Z0-9]+)',
-        r'([A-F0-9]{8})',  # UUID prefix
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, reference.upper())
-        if match:
-            return {
-                "id": match.group(1) if match.group(1) else match.group(0),
-                "reference": reference
-            }
-    
-    return None
+    with db.transaction(DATABASE_FILE) as conn:
+        if notes:
+            conn.execute("""
+                UPDATE bank_reconciliations SET status = ?, notes = ? WHERE id = ?
+            """, (status, notes, rec_id))
+        else:
+            conn.execute("""
+                UPDATE bank_reconciliations SET status = ? WHERE id = ?
+            """, (status, rec_id))
 
 
 def get_claim_compensation_amount(claim_id: str) -> Optional[float]:
@@ -139,17 +201,11 @@ def get_claim_compensation_amount(claim_id: str) -> Optional[float]:
     """
     # Simulated - in production, fetch from claims database
     # Standard EU261 amounts: 250, 400, 600 EUR
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
     # Check if we have a recipient for this claim (they submitted bank details)
-    cursor.execute("""
-        SELECT * FROM recipients WHERE claim_id = ? AND status = 'verified'
-    """, (claim_id,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    with db.connection(DATABASE_FILE) as conn:
+        row = conn.execute("""
+            SELECT * FROM recipients WHERE claim_id = ? AND status = 'verified'
+        """, (claim_id,)).fetchone()
     
     if row:
         # For now, accept any EU261 standard amount
@@ -160,107 +216,544 @@ def get_claim_compensation_amount(claim_id: str) -> Optional[float]:
 
 def recipient_exists_for_claim(claim_id: str) -> bool:
     """Check if a verified recipient exists for this claim."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM recipients WHERE claim_id = ? AND status = 'verified'
-    """, (claim_id,))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with db.connection(DATABASE_FILE) as conn:
+        count = conn.execute("""
+            SELECT COUNT(*) FROM recipients WHERE claim_id = ? AND status = 'verified'
+        """, (claim_id,)).fetchone()[0]
     
     return count > 0
 
 
 def payout_exists_for_claim(claim_id: str) -> bool:
     """Check if a payout already exists for this claim."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM payouts WHERE claim_id = ? AND status NOT IN ('failed', 'cancelled')
-    """, (claim_id,))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with db.connection(DATABASE_FILE) as conn:
+        count = conn.execute("""
+            SELECT COUNT(*) FROM payouts WHERE claim_id = ? AND status NOT IN ('failed', 'cancelled')
+        """, (claim_id,)).fetchone()[0]
     
     return count > 0
 
 
-# === Bank Statement Parsing ===
+# === Claim Reference Matching ===
+
+# Claim reference formats in priority order: (name, regex, confidence).
+# Expected patterns:
+# - FC-CLAIM123-COMPENSATION
+# - AESA-2024-CLAIM123
+# - Direct claim ID: CLAIM123
+# - UUID prefix: 1A2B3C4D (only as a whole word, to avoid hits inside dates/IBANs)
+CLAIM_REFERENCE_PATTERNS = [
+    ("fc", r'FC-(?P<fc>[A-Z0-9]+)-COMPENSATION', 0.95),
+    ("aesa", r'AESA-\d{4}-(?P<aesa>[A-Z0-9]+)', 0.9),
+    ("claim", r'CLAIM(?P<claim>[A-Z0-9]+)', 0.7),
+    ("uuid_prefix", r'\b(?P<uuid_prefix>[A-F0-9]{8})\b', 0.4),
+]
 
-def parse_csv_statement(filepath: str) -> List[Dict]:
+
+class ClaimReferenceMatcher:
     """
-    Parse a CSV bank statement.
-    Expected columns: Date, Description, Credit, Debit, Reference
+    Extracts claim IDs from free-text bank references.
+    All patterns are compiled once into a single alternation with named
+    groups, so a reference is scanned in one pass. Candidates are ranked by
+    pattern priority and carry that pattern's confidence score.
+    
+    When built with known claim IDs, candidates are verified against an
+    in-memory index (case-insensitive; UUID prefixes resolve to the full ID)
+    and unverified candidates are discarded.
     """
-    transactions = []
     
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Only process credits (incoming transfers)
-                credit = row.get('Credit', row.get('credit', row.get('CREDIT', '')))
-                if credit and float(credit.replace(',', '').replace(' ', '') or 0) > 0:
-                    transactions.append({
-                        'date': row.get('Date', row.get('date', row.get('DATE', ''))),
-                        'description': row.get('Description', row.get('description', row.get('DESCRIPTION', ''))),
-                        'amount': float(credit.replace(',', '').replace(' ', '')),
-                        'reference': row.get('Reference', row.get('reference', row.get('REFERENCE', '')))
-                    })
-    except Exception as e:
-        print(f"❌ Error parsing CSV {filepath}: {e}")
+    _regex = re.compile('|'.join(f'(?:{pattern})' for _, pattern, _ in CLAIM_REFERENCE_PATTERNS))
+    _priority = {name: i for i, (name, _, _) in enumerate(CLAIM_REFERENCE_PATTERNS)}
+    _confidence = {name: confidence for name, _, confidence in CLAIM_REFERENCE_PATTERNS}
+    
+    def __init__(self, known_claim_ids: Optional[Iterable[str]] = None):
+        self.index: Optional[Dict[str, str]] = None
+        self.prefix_index: Dict[str, str] = {}
+        if known_claim_ids is not None:
+            self.index = {}
+            ambiguous = set()
+            for claim_id in known_claim_ids:
+                self.index[claim_id.upper()] = claim_id
+                prefix = claim_id[:8].upper()
+                if prefix in self.prefix_index and self.prefix_index[prefix] != claim_id:
+                    ambiguous.add(prefix)
+                self.prefix_index[prefix] = claim_id
+            for prefix in ambiguous:
+                del self.prefix_index[prefix]
+    
+    def _scan(self, reference: str) -> Iterator[Tuple[int, str, str]]:
+        """Yield (priority, pattern name, claim ID) for each verified candidate."""
+        index = self.index
+        for match in self._regex.finditer(reference.upper()):
+            name = match.lastgroup
+            claim_id = match.group(name)
+            
+            if index is not None:
+                # The whole match also counts, e.g. "CLAIM123" as well as "123"
+                verified = index.get(claim_id) or index.get(match.group(0))
+                if verified is None and name == "uuid_prefix":
+                    verified = self.prefix_index.get(claim_id)
+                if verified is None:
+                    continue
+                claim_id = verified
+            
+            yield self._priority[name], name, claim_id
+    
+    def _candidate(self, reference: str, name: str, claim_id: str) -> Dict:
+        return {
+            "id": claim_id,
+            "reference": reference,
+            "pattern": name,
+            "confidence": self._confidence[name]
+        }
     
-    return transactions
+    def candidates(self, reference: str) -> List[Dict]:
+        """All claim candidates in the reference, best first."""
+        found = sorted(self._scan(reference), key=lambda c: c[0])
+        return [self._candidate(reference, name, claim_id) for _, name, claim_id in found]
+    
+    def match(self, reference: str) -> Optional[Dict]:
+        """Best claim candidate in the reference, or None."""
+        if not reference:
+            return None
+        best = None
+        for candidate in self._scan(reference):
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+                if best[0] == 0:
+                    break
+        return self._candidate(reference, best[1], best[2]) if best else None
+
 
+_unverified_matcher = ClaimReferenceMatcher()
 
-def parse_mt940_statement(filepath: str) -> List[Dict]:
+
+def get_claim_by_reference(reference: str) -> Optional[Dict]:
     """
-    Parse an MT940 SWIFT statement file.
-    This is a simplified parser - production would use a library like mt940.
+    Look up claim by AESA reference number.
+    In production, this would query Firebase/Firestore.
+    For now, we simulate by extracting claim ID from reference pattern.
+    Returns the best unverified candidate; use ClaimReferenceMatcher with
+    known claim IDs to verify matches.
+    """
+    return _unverified_matcher.match(reference)
+
+
+# === Amount/Date Matching ===
+
+def _to_days(timestamp: str) -> float:
+    """ISO date or timestamp as fractional days, for window arithmetic."""
+    return datetime.fromisoformat(timestamp[:19]).timestamp() / 86400
+
+
+class ExpectedCompensationIndex:
+    """
+    Expected compensations keyed by amount in cents (the EU261 250/400/600
+    EUR bands in practice). Each bucket is sorted by expected arrival date,
+    so a lookup is a dict hit plus a bisect: O(log n).
+    Claims handed out with claim() are skipped by later lookups.
     """
-    transactions = []
     
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+    def __init__(self, expected: Iterable[Tuple[str, float, str]], window_days: float = AUTO_MATCH_WINDOW_DAYS):
+        self.window_days = window_days
+        self.claimed: Set[str] = set()
+        self._days: Dict[int, List[float]] = {}
+        self._claim_ids: Dict[int, List[str]] = {}
         
-        # Find transaction blocks (tag :61:)
-        # Format: :61:YYMMDD[MMDD]C{amount}NTRF{reference}
-        pattern = r':61:(\d{6})\d*C([\d,\.]+)N[A-Z]{3,4}([^\n]+)'
-        matches = re.findall(pattern, content)
+        buckets: Dict[int, List[Tuple[float, str]]] = {}
+        for claim_id, amount_eur, expected_at in expected:
+            buckets.setdefault(round(amount_eur * 100), []).append((_to_days(expected_at), claim_id))
+        for cents, entries in buckets.items():
+            entries.sort()
+            self._days[cents] = [days for days, _ in entries]
+            self._claim_ids[cents] = [claim_id for _, claim_id in entries]
+    
+    def __len__(self) -> int:
+        return sum(len(days) for days in self._days.values())
+    
+    def candidates(self, amount_eur: float, received_at: str, limit: int = 5) -> List[Dict]:
+        """
+        Up to `limit` unclaimed claims expecting this amount within the date
+        window, closest expected date (highest score) first. Walks outwards
+        from the bisect point, so the cost is O(log n + limit).
+        """
+        cents = round(amount_eur * 100)
+        days = self._days.get(cents)
+        if not days:
+            return []
         
-        for match in matches:
-            date_str, amount_str, reference = match
+        received = _to_days(received_at)
+        claim_ids = self._claim_ids[cents]
+        right = bisect_left(days, received)
+        left = right - 1
+        
+        found = []
+        while len(found) < limit:
+            left_off = received - days[left] if left >= 0 else None
+            right_off = days[right] - received if right < len(days) else None
+            if right_off is None or (left_off is not None and left_off <= right_off):
+                i, days_off = left, left_off
+                left -= 1
+            else:
+                i, days_off = right, right_off
+                right += 1
             
-            # Parse date (YYMMDD)
+            if days_off is None or days_off > self.window_days:
+                break
+            if claim_ids[i] in self.claimed:
+                continue
+            found.append({
+                "claim_id": claim_ids[i],
+                "days_off": days_off,
+                "score": 1 - days_off / self.window_days if self.window_days else 1.0
+            })
+        
+        return found
+    
+    def claim(self, claim_id: str):
+        self.claimed.add(claim_id)
+
+
+# === Bank Statement Parsing ===
+
+# Bank-specific CSV layouts. A file named "<profile>_....csv" uses that
+# profile, anything else uses "default". Column names are matched
+# case-insensitively against the header row, first candidate found wins.
+CSV_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "delimiter": ",",
+        "decimal": ".",
+        "date_format": "%Y-%m-%d",
+        "columns": {
+            "date": ["Date"],
+            "description": ["Description"],
+            "credit": ["Credit"],
+            "reference": ["Reference"],
+        },
+    },
+    "es": {
+        "delimiter": ";",
+        "decimal": ",",
+        "date_format": "%d/%m/%Y",
+        "columns": {
+            "date": ["Fecha", "Fecha valor", "Fecha operacion"],
+            "description": ["Concepto", "Descripcion"],
+            "credit": ["Abono", "Haber", "Importe"],
+            "reference": ["Referencia", "Referencia 1"],
+        },
+    },
+}
+
+
+def csv_profile_for(filepath: str) -> Dict[str, Any]:
+    """Pick the CSV profile from the statement's filename prefix."""
+    prefix = os.path.basename(filepath).split('_', 1)[0].lower()
+    return CSV_PROFILES.get(prefix, CSV_PROFILES["default"])
+
+
+@lru_cache(maxsize=4096)
+def _csv_date(value: str, date_format: str) -> Any:
+    """Parse a statement date with the profile's format (cached - dates repeat)."""
+    try:
+        return datetime.strptime(value, date_format)
+    except ValueError:
+        return value  # Left for _parse_received_at's fallback formats
+
+
+def parse_csv_statement(filepath: str, profile: Optional[Dict[str, Any]] = None) -> Iterator[Dict]:
+    """
+    Parse a CSV bank statement, yielding credit transactions as they are read.
+    The header is resolved to column indexes once; rows are then read by
+    position with csv.reader. Amounts are floats and dates are datetimes
+    when they match the profile's date format.
+    Expected columns (default profile): Date, Description, Credit, Debit, Reference
+    """
+    profile = profile or csv_profile_for(filepath)
+    date_format = profile["date_format"]
+    # Characters to strip from amounts: thousands separators and spaces
+    strip_chars = str.maketrans('', '', ('.' if profile["decimal"] == ',' else ',') + ' ')
+    
+    # Errors propagate: the caller leaves a file it couldn't fully parse in place
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=profile["delimiter"])
+        header = next(reader, None)
+        if not header:
+            return
+        
+        positions = {name.strip().lower(): i for i, name in enumerate(header)}
+        columns = {}
+        for field, candidates in profile["columns"].items():
+            columns[field] = next(
+                (positions[c.lower()] for c in candidates if c.lower() in positions), None
+            )
+        
+        credit_i = columns["credit"]
+        if credit_i is None:
+            raise ValueError(f"no credit column in header {header}")
+        date_i, description_i, reference_i = columns["date"], columns["description"], columns["reference"]
+        
+        for row in reader:
+            # Only process credits (incoming transfers)
+            if credit_i >= len(row):
+                continue
+            credit = row[credit_i].translate(strip_chars)
+            if not credit:
+                continue
+            if profile["decimal"] == ',':
+                credit = credit.replace(',', '.')
             try:
-                date = datetime.strptime(date_str, '%y%m%d').strftime('%Y-%m-%d')
-            except:
-                date = date_str
-            
-            # Parse amount
-            amount = float(amount_str.replace(',', '.'))
+                amount = float(credit)
+            except ValueError:
+                raise ValueError(f"line {reader.line_num}: invalid credit amount {row[credit_i]!r}") from None
+            if amount <= 0:
+                continue
             
-            transactions.append({
-                'date': date,
-                'description': reference.strip(),
+            date = row[date_i] if date_i is not None and date_i < len(row) else ''
+            yield {
+                'date': _csv_date(date, date_format) if date else '',
+                'description': row[description_i] if description_i is not None and description_i < len(row) else '',
                 'amount': amount,
-                'reference': reference.strip()[:50]
-            })
-    
-    except Exception as e:
-        print(f"❌ Error parsing MT940 {filepath}: {e}")
+                'reference': row[reference_i] if reference_i is not None and reference_i < len(row) else ''
+            }
+
+
+# MT940 field tag at the start of a line, e.g. ":61:" or ":60F:"
+MT940_TAG = re.compile(r':(\d{2}[A-Z]?):(.*)')
+
+# :61: statement line: YYMMDD[MMDD] mark [funds code] amount N type reference
+MT940_STATEMENT_LINE = re.compile(r'(\d{6})\d{0,4}(C|D|RC|RD)[A-Z]?([\d,\.]+)N[A-Z0-9]{3}(.*)')
+
+
+@lru_cache(maxsize=4096)
+def _mt940_date(date_str: str) -> str:
+    """Convert an MT940 YYMMDD date to YYYY-MM-DD (cached - statements repeat dates)."""
+    try:
+        return datetime.strptime(date_str, '%y%m%d').strftime('%Y-%m-%d')
+    except:
+        return date_str
+
+
+def _mt940_amount(amount_str: str, line_number: int) -> float:
+    try:
+        return float(amount_str.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"line {line_number}: invalid amount {amount_str!r}") from None
+
+
+def parse_mt940_statement(filepath: str) -> Iterator[Dict]:
+    """
+    Parse an MT940 SWIFT statement file, yielding credit transactions as they
+    are read. The file is read line by line, so memory stays constant however
+    large the statement is. Multi-line :86: narratives are joined into the
+    transaction's description, and files holding several statements (each
+    starting at :20:, optionally in {4:...-} blocks) are supported.
+    This is a simplified parser - production would use a library like mt940.
+    """
+    account = None
+    pending = None   # :61: transaction waiting for its optional :86: narrative
+    tag = None       # tag that continuation lines belong to
     
-    return transactions
+    # Errors propagate: the caller leaves a file it couldn't fully parse in place
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_number, raw_line in enumerate(f, 1):
+            line = raw_line.rstrip('\r\n')
+            match = MT940_TAG.match(line)
+            
+            if not match:
+                if line.startswith(('{', '-')):
+                    # SWIFT block boundary - ends the current statement
+                    if pending is not None and pending.pop('credit'):
+                        yield pending
+                    pending = tag = None
+                elif tag == '86' and pending is not None and line.strip():
+                    pending['description'] += ' ' + line.strip()
+                continue
+            
+            tag, value = match.groups()
+            
+            if tag == '86':
+                if pending is not None:
+                    pending['description'] = value.strip()
+                continue
+            
+            # Any other tag closes the previous transaction
+            if pending is not None and pending.pop('credit'):
+                yield pending
+            pending = None
+            
+            if tag == '20':
+                account = None
+            elif tag == '25':
+                account = value.strip()
+            elif tag == '61':
+                line_match = MT940_STATEMENT_LINE.match(value)
+                if not line_match:
+                    continue
+                date_str, mark, amount_str, reference = line_match.groups()
+                reference = reference.strip()
+                if reference.upper().startswith('NONREF'):
+                    reference = ''
+                
+                pending = {
+                    'credit': mark == 'C',
+                    'date': _mt940_date(date_str),
+                    'description': reference,
+                    'amount': _mt940_amount(amount_str, line_number),
+                    'reference': reference[:50],
+                    'account': account
+                }
+        
+        if pending is not None and pending.pop('credit'):
+            yield pending
 
 
 # === Reconciliation Logic ===
 
-def ingest_bank_statements():
-    """Process new bank statements from the statements directory."""
+def _parse_received_at(date: Any) -> str:
+    """Normalise a statement date to an ISO timestamp, falling back to now."""
+    try:
+        if isinstance(date, str):
+            # Try common formats
+            for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d']:
+                try:
+                    return datetime.strptime(date, fmt).isoformat()
+                except:
+                    continue
+            return datetime.utcnow().isoformat()
+        return date.isoformat()
+    except:
+        return datetime.utcnow().isoformat()
+
+
+def parse_statement(filepath: str) -> Optional[Iterable[Dict]]:
+    """Parse a statement file based on its extension (None if unsupported)."""
+    if filepath.endswith('.csv'):
+        return parse_csv_statement(filepath)
+    if filepath.endswith(('.mt940', '.sta')):
+        return parse_mt940_statement(filepath)
+    return None
+
+
+def reconcile_transactions(
+    transactions: Iterable[Dict],
+    known_refs: Set[str],
+    matcher: ClaimReferenceMatcher,
+    stats: Dict[str, int],
+    new_refs: Set[str]
+) -> Iterator[Tuple]:
+    """
+    Resolve statement transactions into bank_reconciliations rows in memory.
+    Skips small amounts and references already in known_refs or new_refs;
+    references of emitted rows are added to new_refs. Counts are accumulated
+    in stats['found'], stats['imported'] and stats['matched'].
+    """
+    now = datetime.utcnow().isoformat()
+    
+    for txn in transactions:
+        stats['found'] += 1
+        
+        # Skip small amounts (likely fees refunds, not AESA payments)
+        if txn['amount'] < 50:
+            continue
+        
+        reference = txn['reference'] or txn['description']
+        
+        # Check if already reconciled
+        if reference in known_refs or reference in new_refs:
+            continue
+        new_refs.add(reference)
+        
+        # Match to a verified claim, falling back to the narrative (MT940 :86:)
+        claim = matcher.match(reference)
+        if not claim and txn['description'] != reference:
+            claim = matcher.match(txn['description'])
+        
+        matched_claim_id = None
+        status = "pending_match"
+        notes = None
+        
+        if claim:
+            matched_claim_id = claim['id']
+            status = "matched"
+            notes = f"Matched by {claim['pattern']} reference (confidence {claim['confidence']:.2f})"
+            stats['matched'] += 1
+            print(f"   ✅ Matched €{txn['amount']:.2f} to claim {claim['id']}")
+        else:
+            print(f"   ⚠️ Unmatched €{txn['amount']:.2f} - {reference[:40]}...")
+        
+        stats['imported'] += 1
+        yield (
+            str(uuid.uuid4()), reference, txn['amount'], _parse_received_at(txn['date']),
+            matched_claim_id, now if matched_claim_id else None, status, notes, now
+        )
+
+
+def parse_statement_to_list(filepath: str) -> Optional[List[Dict]]:
+    """Fully parse a statement file. Process-pool entry point for parallel ingestion."""
+    transactions = parse_statement(filepath)
+    return None if transactions is None else list(transactions)
+
+
+def ingest_statement_file(
+    filepath: str,
+    processed_dir: str,
+    known_refs: Set[str],
+    matcher: ClaimReferenceMatcher,
+    transactions: Optional[Iterable[Dict]] = None
+) -> Tuple[int, int]:
+    """
+    Ingest one statement file, then move it to processed_dir. Transactions
+    already parsed elsewhere (e.g. by a worker process) can be passed in;
+    otherwise the file is streamed from disk. Returns (imported, matched).
+    
+    Rows are committed INGEST_COMMIT_ROWS at a time, so the write lock is
+    never held for the whole file. Until the file is done they are
+    'importing' under its ingest batch, which nothing else acts on. If the
+    file fails they are deleted again and the error propagates.
+    """
+    filename = os.path.basename(filepath)
+    print(f"\n📄 Processing: {filename}")
+    
+    if transactions is None:
+        transactions = parse_statement(filepath)
+    if transactions is None:
+        return 0, 0
+    
+    # Transactions are streamed from the parser in chunks. This file's
+    # references only join known_refs once all of it is committed.
+    ingest_batch = str(uuid.uuid4())
+    new_refs: Set[str] = set()
+    stats = {'found': 0, 'imported': 0, 'matched': 0}
+    rows = reconcile_transactions(transactions, known_refs, matcher, stats, new_refs)
+    try:
+        while True:
+            chunk = list(islice(rows, INGEST_COMMIT_ROWS))
+            if not chunk:
+                break
+            save_reconciliations(chunk, ingest_batch)
+        publish_ingest_batch(ingest_batch)
+    except Exception:
+        discard_ingest_batches(ingest_batch)
+        raise
+    known_refs |= new_refs
+    
+    print(f"   Found {stats['found']} credit transactions")
+    
+    # Move processed file
+    new_path = os.path.join(processed_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}")
+    os.rename(filepath, new_path)
+    print(f"   📦 Moved to processed: {new_path}")
+    
+    return stats['imported'], stats['matched']
+
+
+def ingest_bank_statements(workers: int = INGEST_WORKERS):
+    """
+    Process new bank statements from the statements directory.
+    With workers > 1, files are parsed in a process pool and handed to this
+    process as they finish; dedup, matching and commits stay here, one file
+    at a time. A file that fails is reported and left in place for the next run.
+    """
     if not os.path.exists(STATEMENTS_DIR):
         os.makedirs(STATEMENTS_DIR)
         print(f"📁 Created statements directory: {STATEMENTS_DIR}")
@@ -279,215 +772,225 @@ def ingest_bank_statements():
         print(f"📄 No new statement files in {STATEMENTS_DIR}")
         return
     
-    total_imported = 0
-    total_matched = 0
+    # Rows of a file whose import died with the process; the file is still here
+    leftover = discard_ingest_batches()
+    if leftover:
+        print(f"🧹 Removed {leftover} rows of an unfinished import")
     
-    for filename in statement_files:
-        filepath = os.path.join(STATEMENTS_DIR, filename)
-        print(f"\n📄 Processing: {filename}")
-        
-        # Parse based on file type
-        if filename.endswith('.csv'):
-            transactions = parse_csv_statement(filepath)
-        elif filename.endswith(('.mt940', '.sta')):
-            transactions = parse_mt940_statement(filepath)
-        else:
-            continue
-        
-        print(f"   Found {len(transactions)} credit transactions")
-        
-        for txn in transactions:
-            # Skip small amounts (likely fees refunds, not AESA payments)
-            if txn['amount'] < 50:
-                continue
-            
-            # Try to match to a claim
-            reference = txn['reference'] or txn['description']
-            claim = get_claim_by_reference(reference)
+    # Prefetch dedup and matching state once instead of querying per transaction
+    known_refs = load_known_bank_refs()
+    matcher = ClaimReferenceMatcher(load_verified_claim_ids())
+    
+    totals = {'imported': 0, 'matched': 0, 'failed': 0}
+    
+    def ingest(filename: str, transactions: Optional[List[Dict]] = None):
+        try:
+            imported, matched = ingest_statement_file(
+                os.path.join(STATEMENTS_DIR, filename), processed_dir,
+                known_refs, matcher, transactions
+            )
+            totals['imported'] += imported
+            totals['matched'] += matched
+        except Exception as e:
+            totals['failed'] += 1
+            print(f"❌ Failed to ingest {filename}, left in place: {e}")
+    
+    if workers > 1 and len(statement_files) > 1:
+        print(f"⚙️  Parsing {len(statement_files)} files with {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(parse_statement_to_list, os.path.join(STATEMENTS_DIR, filename)): filename
+                for filename in statement_files
+            }
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    transactions = future.result()
+                except Exception as e:
+                    totals['failed'] += 1
+                    print(f"❌ Failed to parse {filename}, left in place: {e}")
+                    continue
+                ingest(filename, transactions)
+    else:
+        for filename in statement_files:
+            ingest(filename)
+    
+    print(f"\n📊 Summary: {totals['imported']} imported, {totals['matched']} matched"
+          + (f", {totals['failed']} files failed" if totals['failed'] else ""))
+
+
+def trigger_due_payouts():
+    """
+    Find reconciled funds older than 48 hours and trigger payouts.
+    This implements the business rule: pay customer within 48h of receiving AESA funds.
+    
+    Works set-based: one query selects the due rows (48h cutoff applied in
+    SQL) joined with their verified recipient and any existing payout, and
+    all payouts and reconciliation updates are written in the same
+    transaction.
+    Payouts are created as 'queued' for the payout server to submit.
+    """
+    cutoff = (datetime.utcnow() - timedelta(hours=PAYOUT_DELAY_HOURS)).isoformat()
+    
+    # The check and the inserts share one write transaction, so a concurrent
+    # run can't create a payout for the same claim in between
+    try:
+        with db.transaction(DATABASE_FILE) as conn:
+            due = conn.execute("""
+                SELECT b.id, b.matched_claim_id, b.amount_eur,
+                       r.id AS recipient_id, r.currency_preferred,
+                       EXISTS (
+                           SELECT 1 FROM payouts p
+                           WHERE p.claim_id = b.matched_claim_id AND p.status NOT IN ('failed', 'cancelled')
+                       ) AS has_payout
+                FROM bank_reconciliations b
+                LEFT JOIN recipients r ON r.claim_id = b.matched_claim_id AND r.status = 'verified'
+                WHERE b.status = 'matched' AND b.matched_claim_id IS NOT NULL AND b.received_at <= ?
+                ORDER BY b.received_at ASC
+            """, (cutoff,)).fetchall()
             
-            # Check if already reconciled
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM bank_reconciliations WHERE bank_ref = ?
-            """, (reference,))
-            exists = cursor.fetchone()[0] > 0
-            conn.close()
+            waiting = conn.execute("""
+                SELECT COUNT(*), MIN(received_at) FROM bank_reconciliations
+                WHERE status = 'matched' AND matched_claim_id IS NOT NULL AND received_at > ?
+            """, (cutoff,)).fetchone()
             
-            if exists:
-                continue
+            if waiting[0]:
+                next_due = datetime.fromisoformat(waiting[1][:19]) + timedelta(hours=PAYOUT_DELAY_HOURS)
+                hours_remaining = (next_due - datetime.utcnow()).total_seconds() / 3600
+                print(f"⏳ {waiting[0]} reconciliations inside the 48h window, next payout in {hours_remaining:.1f}h")
             
-            matched_claim_id = None
-            status = "pending_match"
+            if not due:
+                print("📭 No pending reconciliations ready for payout")
+                return
             
-            if claim and recipient_exists_for_claim(claim['id']):
-                matched_claim_id = claim['id']
-                status = "matched"
-                total_matched += 1
-                print(f"   ✅ Matched €{txn['amount']:.2f} to claim {claim['id']}")
-            else:
-                print(f"   ⚠️ Unmatched €{txn['amount']:.2f} - {reference[:40]}...")
+            now = datetime.utcnow().isoformat()
+            new_payouts = []
+            created_updates = []
+            skipped_ids = []
+            claims_paid = set()
             
-            # Parse date
-            try:
-                if isinstance(txn['date'], str):
-                    # Try common formats
-                    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d']:
-                        try:
-                            received_at = datetime.strptime(txn['date'], fmt).isoformat()
-                            break
-                        except:
-                            continue
-                    else:
-                        received_at = datetime.utcnow().isoformat()
-                else:
-                    received_at = txn['date'].isoformat()
-            except:
-                received_at = datetime.utcnow().isoformat()
+            for rec in due:
+                claim_id = rec['matched_claim_id']
+                
+                # Check if payout already exists (in the DB or earlier in this batch)
+                if rec['has_payout'] or claim_id in claims_paid:
+                    print(f"⏭️ Claim {claim_id}: Payout already exists, skipping")
+                    skipped_ids.append((rec['id'],))
+                    continue
+                
+                # Check recipient exists
+                if rec['recipient_id'] is None:
+                    print(f"⚠️ Claim {claim_id}: No verified recipient, cannot payout")
+                    continue
+                
+                payout_id = str(uuid.uuid4())
+                print(f"💸 Creating payout {payout_id} for claim {claim_id}, €{rec['amount_eur']:.2f}")
+                new_payouts.append((
+                    payout_id, claim_id, rec['recipient_id'], rec['amount_eur'],
+                    rec['currency_preferred'] or 'EUR', 'dlocal', 'queued', now, now
+                ))
+                created_updates.append((f'Payout ID: {payout_id}', rec['id']))
+                claims_paid.add(claim_id)
             
-            # Save reconciliation record
-            save_reconciliation(
-                bank_ref=reference,
-                amount_eur=txn['amount'],
-                received_at=received_at,
-                matched_claim_id=matched_claim_id,
-                status=status
-            )
-            total_imported += 1
-        
-        # Move processed file
-        new_path = os.path.join(processed_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}")
-        os.rename(filepath, new_path)
-        print(f"   📦 Moved to processed: {new_path}")
+            conn.executemany("""
+                INSERT INTO payouts 
+                (id, claim_id, recipient_id, amount_eur, currency_destination, 
+                 provider, status, created_at, queued_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, new_payouts)
+            conn.executemany("""
+                UPDATE bank_reconciliations SET status = 'payout_created', notes = ? WHERE id = ?
+            """, created_updates)
+            conn.executemany("""
+                UPDATE bank_reconciliations SET status = 'payout_created' WHERE id = ?
+            """, skipped_ids)
+    except Exception as e:
+        print(f"❌ Failed to create payouts, nothing was written: {e}")
+        return
     
-    print(f"\n📊 Summary: {total_imported} imported, {total_matched} matched")
+    print(f"\n💰 Payouts triggered: {len(new_payouts)}")
 
 
-def trigger_due_payouts():
+def auto_match_reconciliations():
     """
-    Find reconciled funds older than 48 hours and trigger payouts.
-    This implements the business rule: pay customer within 48h of receiving AESA funds.
+    Second pass over unmatched credits: match them to expected compensations
+    by amount and arrival date. Only unambiguous matches are applied - when
+    the runner-up scores within AUTO_MATCH_MIN_MARGIN the credit is left for
+    manual review with its ranked candidates printed.
     """
-    import urllib.request
+    started = time.perf_counter()
     
-    reconciliations = get_pending_reconciliations()
+    with db.connection(DATABASE_FILE) as conn:
+        pending = conn.execute("""
+            SELECT id, bank_ref, amount_eur, received_at FROM bank_reconciliations
+            WHERE status = 'pending_match'
+            ORDER BY received_at ASC
+        """).fetchall()
     
-    if not reconciliations:
-        print("📭 No pending reconciliations ready for payout")
+    if not pending:
+        print("📭 No unmatched reconciliations")
         return
     
-    cutoff_time = datetime.utcnow() - timedelta(hours=PAYOUT_DELAY_HOURS)
-    payouts_triggered = 0
+    index = ExpectedCompensationIndex(load_expected_compensations())
+    now = datetime.utcnow().isoformat()
+    updates = []
+    ambiguous = 0
     
-    for rec in reconciliations:
-        received_at = datetime.fromisoformat(rec['received_at'].replace('Z', '+00:00').replace('+00:00', ''))
-        
-        # Check if 48h have passed
-        if received_at > cutoff_time:
-            hours_remaining = (received_at + timedelta(hours=PAYOUT_DELAY_HOURS) - datetime.utcnow()).total_seconds() / 3600
-            print(f"⏳ Claim {rec['matched_claim_id']}: {hours_remaining:.1f}h until payout")
-            continue
-        
-        claim_id = rec['matched_claim_id']
-        
-        # Check if payout already exists
-        if payout_exists_for_claim(claim_id):
-            print(f"⏭️ Claim {claim_id}: Payout already exists, skipping")
-            update_reconciliation_status(rec['id'], 'payout_created')
+    for row in pending:
+        candidates = index.candidates(row['amount_eur'], row['received_at'])
+        if not candidates:
             continue
         
-        # Check recipient exists
-        if not recipient_exists_for_claim(claim_id):
-            print(f"⚠️ Claim {claim_id}: No verified recipient, cannot payout")
+        best = candidates[0]
+        if len(candidates) > 1 and best['score'] - candidates[1]['score'] < AUTO_MATCH_MIN_MARGIN:
+            ambiguous += 1
+            ranked = ", ".join(f"{c['claim_id']} ({c['score']:.2f})" for c in candidates[:3])
+            print(f"   ❓ €{row['amount_eur']:.2f} {row['bank_ref'][:30]}: ambiguous - {ranked}")
             continue
         
-        # Create payout via payout server
-        print(f"💸 Creating payout for claim {claim_id}, €{rec['amount_eur']:.2f}")
-        
-        try:
-            payout_data = {
-                "claimId": claim_id,
-                "amountEUR": rec['amount_eur']
-            }
-            
-            # Get recipient details first
-            req = urllib.request.Request(
-                f"{PAYOUT_SERVER_URL}/api/recipients/claim/{claim_id}",
-                method="GET"
-            )
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                recipient = json.loads(resp.read().decode())
-            
-            # Now create the payout directly in DB and submit to dLocal
-            # (The payout server handles dLocal submission)
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            payout_id = str(uuid.uuid4())
-            now = datetime.utcnow().isoformat()
-            
-            cursor.execute("""
-                INSERT INTO payouts 
-                (id, claim_id, recipient_id, amount_eur, currency_destination, 
-                 provider, status, created_at, queued_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                payout_id, claim_id, recipient['id'], rec['amount_eur'],
-                recipient.get('currencyPreferred', 'EUR'),
-                'dlocal', 'queued', now, now
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            # Trigger dLocal submission via payout server
-            # In production, this would call the dLocal API directly
-            print(f"✅ Payout {payout_id} created for claim {claim_id}")
-            
-            # Update reconciliation status
-            update_reconciliation_status(rec['id'], 'payout_created', f'Payout ID: {payout_id}')
-            payouts_triggered += 1
-            
-        except Exception as e:
-            print(f"❌ Failed to create payout for claim {claim_id}: {e}")
-            update_reconciliation_status(rec['id'], 'payout_failed', str(e))
+        index.claim(best['claim_id'])
+        updates.append((
+            best['claim_id'], now,
+            f"Auto-matched by amount/date ({best['days_off']:.1f} days off, score {best['score']:.2f})",
+            row['id']
+        ))
+        print(f"   ✅ Matched €{row['amount_eur']:.2f} to claim {best['claim_id']} (score {best['score']:.2f})")
+    
+    with db.transaction(DATABASE_FILE) as conn:
+        conn.executemany("""
+            UPDATE bank_reconciliations 
+            SET matched_claim_id = ?, matched_at = ?, status = 'matched', notes = ?
+            WHERE id = ? AND status = 'pending_match'
+        """, updates)
     
-    print(f"\n💰 Payouts triggered: {payouts_triggered}")
+    elapsed = time.perf_counter() - started
+    rate = 100 * len(updates) / len(pending)
+    print(f"\n📊 Auto-match: {len(updates)}/{len(pending)} matched ({rate:.1f}%), "
+          f"{ambiguous} ambiguous, {len(index)} expected claims indexed, {elapsed:.2f}s")
 
 
 def manual_match_reconciliation(rec_id: str, claim_id: str):
     """Manually match an unmatched reconciliation to a claim."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        UPDATE bank_reconciliations 
-        SET matched_claim_id = ?, matched_at = ?, status = 'matched'
-        WHERE id = ? AND status = 'pending_match'
-    """, (claim_id, datetime.utcnow().isoformat(), rec_id))
+    with db.transaction(DATABASE_FILE) as conn:
+        cursor = conn.execute("""
+            UPDATE bank_reconciliations 
+            SET matched_claim_id = ?, matched_at = ?, status = 'matched'
+            WHERE id = ? AND status = 'pending_match'
+        """, (claim_id, datetime.utcnow().isoformat(), rec_id))
     
     if cursor.rowcount > 0:
         print(f"✅ Matched reconciliation {rec_id} to claim {claim_id}")
     else:
         print(f"❌ Failed to match - reconciliation not found or already matched")
-    
-    conn.commit()
-    conn.close()
 
 
 def list_pending_matches():
     """List unmatched reconciliations for manual review."""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM bank_reconciliations WHERE status = 'pending_match'
-        ORDER BY received_at DESC
-    """)
-    
-    rows = cursor.fetchall()
-    conn.close()
+    with db.connection(DATABASE_FILE) as conn:
+        rows = conn.execute("""
+            SELECT * FROM bank_reconciliations WHERE status = 'pending_match'
+            ORDER BY received_at DESC
+        """).fetchall()
     
     if not rows:
         print("📭 No unmatched reconciliations")
@@ -503,7 +1006,7 @@ def list_pending_matches():
         print()
 
 
-def run_full_reconciliation():
+def run_full_reconciliation(workers: int = INGEST_WORKERS):
     """Run the complete reconciliation process."""
     print("=" * 50)
     print("🏦 Bank Reconciliation Job")
@@ -512,7 +1015,11 @@ def run_full_reconciliation():
     
     # Step 1: Ingest new bank statements
     print("\n📥 Step 1: Ingesting bank statements...")
-    ingest_bank_statements()
+    ingest_bank_statements(workers)
+    
+    # Step 1b: Match leftovers by amount and date
+    print("\n🔎 Step 1b: Matching unmatched credits by amount/date...")
+    auto_match_reconciliations()
     
     # Step 2: Trigger due payouts
     print("\n💸 Step 2: Triggering due payouts (48h rule)...")
@@ -530,14 +1037,23 @@ def run_full_reconciliation():
 def main():
     import sys
     
-    if len(sys.argv) < 2:
-        run_full_reconciliation()
+    args = sys.argv[1:]
+    workers = INGEST_WORKERS
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    
+    ensure_schema()
+    
+    if not args:
+        run_full_reconciliation(workers)
         return
     
-    command = sys.argv[1]
+    command = args[0]
     
     if command == "ingest":
-        ingest_bank_statements()
+        ingest_bank_statements(workers)
     
     elif command == "payouts":
         trigger_due_payouts()
@@ -545,9 +1061,16 @@ def main():
     elif command == "unmatched":
         list_pending_matches()
     
-    elif command == "match" and len(sys.argv) >= 4:
-        rec_id = sys.argv[2]
-        claim_id = sys.argv[3]
+    elif command == "automatch":
+        auto_match_reconciliations()
+    
+    elif command == "expect" and len(args) >= 4:
+        save_expected_compensation(args[1], float(args[2]), args[3])
+        print(f"✅ Expecting €{float(args[2]):.2f} for claim {args[1]} around {args[3]}")
+    
+    elif command == "match" and len(args) >= 3:
+        rec_id = args[1]
+        claim_id = args[2]
         manual_match_reconciliation(rec_id, claim_id)
     
     elif command == "help":
@@ -560,7 +1083,13 @@ Usage:
     python3 reconciliation_job.py ingest    Only ingest new statements
     python3 reconciliation_job.py payouts   Only trigger due payouts
     python3 reconciliation_job.py unmatched List unmatched transactions
+    python3 reconciliation_job.py automatch Match unmatched credits by amount/date
     python3 reconciliation_job.py match <rec_id> <claim_id>  Manual match
+    python3 reconciliation_job.py expect <claim_id> <amount_eur> <YYYY-MM-DD>
+                                            Register an expected AESA transfer
+
+Options:
+    --workers N    Parse statement files in N processes (default 1)
 
 Statement Import:
     Place CSV or MT940 files in ./bank_statements/ directory.
@@ -569,6 +1098,9 @@ CSV Format:
     Date,Description,Credit,Debit,Reference
     2024-01-15,AESA COMPENSATION FC-CLAIM123,400.00,,AESA-2024-CLAIM123
     
+    Files named <profile>_*.csv use a bank-specific layout from CSV_PROFILES
+    (e.g. es_santander.csv: semicolon-separated, 1.234,56 amounts, DD/MM/YYYY).
+    
 MT940 Format:
     Standard SWIFT MT940 format (.mt940 or .sta extension)
 """)
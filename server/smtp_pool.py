@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Shared SMTP Session Pool
+========================
+Persistent, authenticated SMTP sessions for email_server.py and email_bot.py.
+
+Opening a session costs a TCP connect, EHLO, STARTTLS (a TLS handshake),
+a second EHLO and AUTH - several round trips before the first byte of mail.
+The pool does that once per session and then sends many messages over it:
+
+    pool = SMTPSessionPool(SMTP_SERVER, SMTP_PORT, GMAIL_ADDRESS, GMAIL_APP_PASSWORD)
+    pool.send(GMAIL_ADDRESS, recipients, msg.as_string())
+
+An idle session is checked with NOOP before it is reused, so one the server
+dropped (idle timeout, per-connection limits) is replaced before any mail is
+sent on it. A message is never resent by the pool: once MAIL FROM is out,
+the server may already have accepted it, so a failure is raised to the
+caller's own retry. Sessions are also retired after
+SMTP_MAX_MESSAGES_PER_SESSION messages or SMTP_IDLE_TIMEOUT seconds unused,
+before the server drops them.
+"""
+
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# === Configuration ===
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "2"))  # Concurrent sessions
+SMTP_MAX_MESSAGES_PER_SESSION = int(os.environ.get("SMTP_MAX_MESSAGES_PER_SESSION", "100"))
+SMTP_IDLE_TIMEOUT = float(os.environ.get("SMTP_IDLE_TIMEOUT", "240"))  # Seconds; Gmail drops idle sessions after ~5 min
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "30"))
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1") != "0"
+
+
+class _Session:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPSessionPool:
+    """
+    Thread-safe pool of logged-in SMTP sessions to one server. At most
+    `size` sessions exist at once; callers beyond that wait for a free one.
+    """
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 size: int = SMTP_POOL_SIZE, starttls: bool = SMTP_STARTTLS,
+                 max_messages: int = SMTP_MAX_MESSAGES_PER_SESSION,
+                 idle_timeout: float = SMTP_IDLE_TIMEOUT, timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._context = ssl.create_default_context() if starttls else None
+        self._idle: "queue.LifoQueue[_Session]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.sessions_opened = 0
+
+    def _connect(self) -> _Session:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls(context=self._context)
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.sessions_opened += 1
+        return _Session(smtp)
+
+    def _retire(self, session: _Session):
+        try:
+            session.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            session.smtp.close()
+
+    def _checkout(self) -> _Session:
+        """An idle session that still answers NOOP, or a new one."""
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - session.last_used < self.idle_timeout and self._alive(session):
+                return session
+            self._retire(session)
+
+    def _alive(self, session: _Session) -> bool:
+        try:
+            return session.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, from_addr: str, recipients: List[str], message: str) -> dict:
+        """
+        Send one message, reusing a pooled session. Returns sendmail()'s
+        refused-recipients dict; raises like smtplib.SMTP.sendmail, including
+        SMTPServerDisconnected if the session drops mid-message (the message
+        may or may not have been delivered).
+        """
+        with self._slots:
+            session = self._checkout()
+            refused = self._send_on(session, from_addr, recipients, message)
+            self._release(session)
+            return refused
+
+    def _send_on(self, session: _Session, from_addr: str, recipients: List[str], message: str) -> dict:
+        try:
+            refused = session.smtp.sendmail(from_addr, recipients, message)
+        except smtplib.SMTPRecipientsRefused:
+            self._release(session)  # smtplib reset the transaction; the session is still good
+            raise
+        except Exception:
+            session.smtp.close()
+            raise
+        session.messages += 1
+        session.last_used = time.monotonic()
+        return refused
+
+    def _release(self, session: _Session):
+        if session.messages >= self.max_messages:
+            self._retire(session)
+        else:
+            self._idle.put(session)
+
+    def close(self):
+        """Log out of every idle session."""
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pools: Dict[Tuple[str, int, str, str], SMTPSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, port: int, username: str = "", password: str = "") -> SMTPSessionPool:
+    """The process-wide pool for a server and login, created on first use."""
+    key = (host, port, username, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPSessionPool(host, port, username, password)
+        return pool
+
+
+def close_pools():
+    """Log out of the idle sessions of every pool (on shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()